@@ -15,6 +15,7 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
+import recomputeProfiler as Profiler
 
 
 
@@ -179,7 +180,8 @@ class animateVariable():
 
     def setVarValue(self,name,value):
         setattr( self.Variables, name, value )
-        App.ActiveDocument.Model.recompute('True')
+        with Profiler.section('setVarValue'):
+            Profiler.recompute( App.ActiveDocument.Model, 'True' )
         Gui.updateGui()
 
 
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# asm4Benchmark.py
+#
+# generates synthetic Assembly4 assemblies and times the library paths used by
+# the commands. Runs headless:
+#
+#   FreeCADCmd Benchmarks/asm4Benchmark.py
+#
+# configured by environment variables:
+#
+#   ASM4_BENCH_SIZES    number of links in the top assembly, comma separated (default: 100,1000)
+#   ASM4_BENCH_DEPTH    nesting depth, 1 for a flat assembly of parts (default: 1)
+#   ASM4_BENCH_FANOUT   number of different part documents (default: 4)
+#   ASM4_BENCH_SUBLINKS number of links in each nested sub-assembly (default: 10)
+#   ASM4_BENCH_SAMPLES  number of single placements timed (default: 20)
+#   ASM4_BENCH_OUTPUT   JSON result file (default: asm4_benchmark.json)
+#
+# the show/hide LCS and configuration cases need the GUI, they are skipped
+# by FreeCADCmd, run the script from the FreeCAD Python console to time them
+#
+# two result files can be compared with any Python 3:
+#
+#   python3 Benchmarks/asm4Benchmark.py --compare old.json new.json
+
+
+
+import os, sys, json, time, shutil, tempfile, platform
+
+try:
+    wbPath = os.path.dirname( os.path.dirname( os.path.abspath(__file__) ) )
+except NameError:
+    wbPath = os.environ.get( 'ASM4_WB_PATH', os.getcwd() )
+if wbPath not in sys.path:
+    sys.path.append( wbPath )
+
+
+
+"""
+    +-----------------------------------------------+
+    |         generate the synthetic assemblies     |
+    +-----------------------------------------------+
+"""
+# an empty Assembly4 Model, as created by newModelCmd
+def makeModel( doc ):
+    import libAsm4 as Asm4
+    model = doc.addObject( 'App::Part', 'Model' )
+    model.Type = 'Assembly4 Model'
+    model.newObject( 'PartDesign::CoordinateSystem', 'LCS_Origin' )
+    model.newObject( 'App::DocumentObjectGroup', 'Constraints' )
+    model.addObject( Asm4.createVariables() )
+    return model
+
+
+# the 2 LCS of a linked Model, LCS_0 to be attached by and LCS_1 to attach to
+def makeLinkLCS( App, model, length ):
+    model.newObject( 'PartDesign::CoordinateSystem', 'LCS_0' )
+    lcs = model.newObject( 'PartDesign::CoordinateSystem', 'LCS_1' )
+    lcs.Placement = App.Placement( App.Vector(length,0,0), App.Rotation( App.Vector(0,0,1), 15 ) )
+
+
+# a part with a box and 2 LCS, one to be attached by and one to attach to
+def makePart( App, folder, index ):
+    doc = App.newDocument( 'Part_'+str(index) )
+    model = makeModel( doc )
+    box = model.newObject( 'Part::Box', 'Box' )
+    box.Length = 10 + index
+    makeLinkLCS( App, model, 10+index )
+    doc.recompute()
+    doc.saveAs( os.path.join( folder, doc.Name+'.FCStd' ) )
+    return doc
+
+
+# inserts a link to the Model of linkedDoc, as insertLinkCmd does
+def insertLink( model, linkedDoc, name ):
+    import libAsm4 as Asm4
+    link = model.newObject( 'App::Link', name )
+    link.LinkedObject = linkedDoc.Model
+    Asm4.makeAsmProperties( link )
+    link.recompute()
+    return link
+
+
+# attaches a link, as placeLinkCmd does
+def placeLink( link, parent, recompute=True ):
+    import libAsm4 as Asm4
+    import recomputeProfiler as Profiler
+    linkedDoc = link.LinkedObject.Document.Name
+    if parent is None:
+        expr = Asm4.makeExpressionPart( 'Parent Assembly', None, 'LCS_Origin', linkedDoc, 'LCS_0' )
+        attachedTo = 'Parent Assembly#LCS_Origin'
+    else:
+        parentDoc = parent.LinkedObject.Document.Name
+        expr = Asm4.makeExpressionPart( parent.Name, parentDoc, 'LCS_1', linkedDoc, 'LCS_0' )
+        attachedTo = parent.Name+'#LCS_1'
+    link.AssemblyType = 'Asm4EE'
+    link.AttachedBy = '#LCS_0'
+    link.AttachedTo = attachedTo
+    link.setExpression( 'Placement', expr )
+    if recompute:
+        Profiler.recompute( link )
+        Profiler.recompute( link.getParentGeoFeatureGroup(), True )
+
+
+# an assembly of nbLinks links to the linked documents, each link attached to
+# an earlier one so that the attachments form a tree of depth log(nbLinks)
+# a sub-assembly has the 2 LCS of a part, to be linked in the next level
+def makeAssembly( App, folder, name, linkedDocs, nbLinks, timings=None, subAssembly=False ):
+    doc = App.newDocument( name )
+    model = makeModel( doc )
+    if subAssembly:
+        makeLinkLCS( App, model, 10 )
+    start = time.perf_counter()
+    links = []
+    for i in range( nbLinks ):
+        links.append( insertLink( model, linkedDocs[ i % len(linkedDocs) ], 'Link_'+str(i) ) )
+    if timings is not None:
+        timings['insertLink'] = ( time.perf_counter() - start, nbLinks )
+    start = time.perf_counter()
+    for i, link in enumerate( links ):
+        placeLink( link, links[(i-1)//2] if i > 0 else None, recompute=False )
+    if timings is not None:
+        timings['setExpressions'] = ( time.perf_counter() - start, nbLinks )
+    start = time.perf_counter()
+    doc.recompute()
+    if timings is not None:
+        timings['firstRecompute'] = ( time.perf_counter() - start, 1 )
+    doc.saveAs( os.path.join( folder, name+'.FCStd' ) )
+    return doc
+
+
+# the part documents, the nested sub-assemblies and the top assembly
+def makeDocuments( App, folder, size, depth, fanout, subLinks, timings ):
+    docs = [ makePart( App, folder, i ) for i in range( fanout ) ]
+    for level in range( 1, depth ):
+        docs = [ makeAssembly( App, folder, 'Asm_'+str(level)+'_'+str(i), docs, subLinks, subAssembly=True ) for i in range( fanout ) ]
+    return makeAssembly( App, folder, 'Top', docs, size, timings )
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 the timed cases               |
+    +-----------------------------------------------+
+"""
+def timeIt( function, *args ):
+    start = time.perf_counter()
+    function( *args )
+    return time.perf_counter() - start
+
+
+def placeLinkCase( doc, samples ):
+    model = doc.Model
+    links = [ o for o in model.Group if o.TypeId == 'App::Link' ]
+    samples = min( samples, len(links)-1 )
+    elapsed = 0.0
+    for i in range( 1, samples+1 ):
+        link = links[ -i ]
+        elapsed += timeIt( placeLink, link, links[0] )
+    return ( elapsed, samples )
+
+
+def updateCases( doc ):
+    import solverEngine
+    results = {}
+    results['updateAssembly.full'] = ( timeIt( solverEngine.updateAssembly, doc, None, True ), 1 )
+    # move the first link, everything attached to it must follow
+    link = doc.getObject('Link_1')
+    if link:
+        link.AttachmentOffset = App.Placement( App.Vector(0,0,5), App.Rotation() )
+        results['updateAssembly.incremental'] = ( timeIt( solverEngine.updateAssembly, doc ), 1 )
+    results['updateNested'] = ( timeIt( solverEngine.updateNested, doc ), 1 )
+    return results
+
+
+def bomCase( doc ):
+    import bomEngine
+    return ( timeIt( lambda model: list( bomEngine.bomRows(model) ), doc.Model ), 1 )
+
+
+def showHideCase( doc ):
+    import showHideLcsCmd
+    def showHide( show ):
+        showHideLcsCmd.showChildLCSs( doc.Model, show )
+    return ( timeIt( showHide, True ) + timeIt( showHide, False ), 2 )
+
+
+def configurationCases( doc ):
+    import FreeCADGui as Gui
+    import configurationEngine
+    App.setActiveDocument( doc.Name )
+    Gui.Selection.clearSelection()
+    # the task panel isn't needed to save the configuration
+    ui = configurationEngine.saveConfigurationUI.__new__( configurationEngine.saveConfigurationUI )
+    results = {}
+    results['configuration.save']    = ( timeIt( ui.SaveConfiguration, 'Benchmark', '' ), 1 )
+    results['configuration.restore'] = ( timeIt( configurationEngine.RestoreConfiguration, 'Benchmark' ), 1 )
+    return results
+
+
+
+"""
+    +-----------------------------------------------+
+    |                   run them all                |
+    +-----------------------------------------------+
+"""
+def envInt( name, default ):
+    return int( os.environ.get( name, default ) )
+
+
+def addResult( results, size, case, value ):
+    ( elapsed, count ) = value
+    results.append( { 'size':size, 'case':case, 'time':round(elapsed,6), 'count':count,
+                      'perItem':round(elapsed/count,6) if count else None } )
+    print( '{:>7}  {:<28} {:>10.3f} s  ({} x {:.6f} s)'.format( size, case, elapsed, count, elapsed/count if count else 0 ) )
+
+
+def runBenchmark():
+    sizes    = [ int(s) for s in os.environ.get( 'ASM4_BENCH_SIZES', '100,1000' ).split(',') if s ]
+    depth    = envInt( 'ASM4_BENCH_DEPTH', 1 )
+    fanout   = envInt( 'ASM4_BENCH_FANOUT', 4 )
+    subLinks = envInt( 'ASM4_BENCH_SUBLINKS', 10 )
+    samples  = envInt( 'ASM4_BENCH_SAMPLES', 20 )
+    output   = os.environ.get( 'ASM4_BENCH_OUTPUT', 'asm4_benchmark.json' )
+    results = []
+    for size in sizes:
+        folder = tempfile.mkdtemp( prefix='asm4bench_' )
+        try:
+            timings = {}
+            doc = makeDocuments( App, folder, size, depth, fanout, subLinks, timings )
+            for case, value in timings.items():
+                addResult( results, size, case, value )
+            addResult( results, size, 'placeLink', placeLinkCase( doc, samples ) )
+            for case, value in updateCases( doc ).items():
+                addResult( results, size, case, value )
+            addResult( results, size, 'bom', bomCase( doc ) )
+            if App.GuiUp:
+                addResult( results, size, 'showHideLCS', showHideCase( doc ) )
+                for case, value in configurationCases( doc ).items():
+                    addResult( results, size, case, value )
+            else:
+                print( '{:>7}  showHideLCS and configuration skipped, they need the GUI'.format(size) )
+        finally:
+            for docName in list( App.listDocuments().keys() ):
+                App.closeDocument( docName )
+            shutil.rmtree( folder, ignore_errors=True )
+    report = {  'freecad'  : '.'.join( App.Version()[0:3] ),
+                'python'   : platform.python_version(),
+                'platform' : platform.platform(),
+                'date'     : time.strftime('%Y-%m-%d %H:%M:%S'),
+                'config'   : { 'sizes':sizes, 'depth':depth, 'fanout':fanout,
+                               'subLinks':subLinks, 'samples':samples },
+                'results'  : results }
+    with open( output, 'w' ) as f:
+        json.dump( report, f, indent=2 )
+    print( 'Results written to '+output )
+
+
+# prints the ratio new/old of the time per item of each case
+def compare( oldFile, newFile ):
+    with open( oldFile ) as f:
+        old = json.load( f )
+    with open( newFile ) as f:
+        new = json.load( f )
+    oldResults = {}
+    for r in old['results']:
+        oldResults[ (r['size'],r['case']) ] = r
+    print( '{:>7}  {:<28} {:>12} {:>12} {:>8}'.format( 'size', 'case', 'old (s)', 'new (s)', 'ratio' ) )
+    for r in new['results']:
+        o = oldResults.get( (r['size'],r['case']) )
+        if o and o['perItem']:
+            print( '{:>7}  {:<28} {:>12.6f} {:>12.6f} {:>8.2f}'.format(
+                    r['size'], r['case'], o['perItem'], r['perItem'], r['perItem']/o['perItem'] ) )
+
+
+
+try:
+    import FreeCAD as App
+except ImportError:
+    App = None
+
+if len(sys.argv) > 3 and sys.argv[1] == '--compare':
+    compare( sys.argv[2], sys.argv[3] )
+elif App is not None:
+    runBenchmark()
+else:
+    print( 'Run with FreeCADCmd, or use --compare old.json new.json' )
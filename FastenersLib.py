@@ -16,6 +16,8 @@ from FastenerBase import FSBaseObject
 import FastenersCmd as FS
 
 import libAsm4 as Asm4
+import expressionParser as Parser
+import selectionCache
 
 
 
@@ -24,11 +26,17 @@ import libAsm4 as Asm4
     |               Helper functions                |
     +-----------------------------------------------+
 """
+# the selected fastener, decoded once for each selection
 def getSelectionFS():    
+    return selectionCache.fact( 'fastener', findSelectionFS )
+
+
+def findSelectionFS():    
     selectedObj = None
     # check that something is selected
-    if len(Gui.Selection.getSelection())==1:
-        obj = Gui.Selection.getSelection()[0]
+    selection = selectionCache.snapshot().single
+    if selection:
+        obj = selection
         if isFastener(obj):
             selectedObj = obj
         else:
@@ -52,7 +60,12 @@ def isFastener(obj):
 iconFile = os.path.join( Asm4.iconPath , 'Asm4_mvFastener.svg')
 
 
+# the selected fastener and hole axes, decoded once for each selection
 def getSelectedAxes():
+    return selectionCache.fact( 'holeAxes', findSelectedAxes )
+
+
+def findSelectedAxes():
     holeAxes = []
     fstnr = None
     selection = Gui.Selection.getSelectionEx('', 0)
@@ -106,20 +119,22 @@ class cloneFastenersToAxesCmd():
     def Activated(self):
         (fstnr, axes) = self.selection
         if fstnr.Document:
-            for axisData in axes:
-                if len(axisData) > 3: # DocName/ModelName/AppLinkName/AxisName
-                    docName = axisData[0]
-                    doc = App.getDocument(docName)
-                    if doc:
-                        model = doc.getObject(axisData[1])
-                        if model:
-                            objLink = model.getObject(axisData[2])
-                            if objLink:
-                                obj = objLink.getLinkedObject()
-                                axis = obj.getObject(axisData[3])
-                                if axis and axis.Document:
-                                    newFstnr = Asm4.cloneObject(fstnr)
-                                    Asm4.placeObjectToLCS(newFstnr, axisData[2], axis.Document.Name, axisData[3])
+            # recompute only once, after all fasteners have been cloned and placed
+            with Asm4.recomputeBatch( 'Clone fasteners to axes', fstnr.Document ):
+                for axisData in axes:
+                    if len(axisData) > 3: # DocName/ModelName/AppLinkName/AxisName
+                        docName = axisData[0]
+                        doc = App.getDocument(docName)
+                        if doc:
+                            model = doc.getObject(axisData[1])
+                            if model:
+                                objLink = model.getObject(axisData[2])
+                                if objLink:
+                                    obj = objLink.getLinkedObject()
+                                    axis = obj.getObject(axisData[3])
+                                    if axis and axis.Document:
+                                        newFstnr = Asm4.cloneObject(fstnr)
+                                        Asm4.placeObjectToLCS(newFstnr, axisData[2], axis.Document.Name, axisData[3])
                                     
             Gui.Selection.clearSelection()
             Gui.Selection.addSelection( fstnr.Document.Name, 'Model', fstnr.Name +'.')
@@ -364,47 +379,17 @@ class placeFastenerUI():
     +-----------------------------------------------+
     """
     def splitExpressionFastener(self, expr, parent ):
-        # default return value
-        retval = ( expr, 'None', 'None' )
-        if parent == 'Parent Assembly':
-            # we're attached to an LCS in the parent assembly
-            # expr = LCS_in_the_assembly.Placement * AttachmentOffset
-            ( attLCS, separator, rest1 ) = expr.partition('.Placement * AttachmentOff')
-            restFinal = rest1[0:3]
-            attLink = parent
-            attPart = 'None'
-            #self.expression.setText( 'parentAsm ***'+restFinal+'***'+attLink+'***'+attLCS+'***' )
-            #return ( restFinal, 'None', 'None', 'None', 'None', 'None')
-        else:
-            parentObj = self.parentAssembly.getObject(parent)
-            if parentObj and parentObj.TypeId == 'App::Link':
-                parentDoc = parentObj.LinkedObject.Document
-                # if the link points to a Part in the same document
-                if parentDoc == self.activeDoc:
-                    # we're attached to an LCS in a part in the same document
-                    # expr = ParentLink.Placement * LCS_parent.Placement * AttachmentOffset
-                    ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
-                    ( attLCS,     separator, rest2 ) = rest1.partition('.Placement * AttachmentOff')
-                    restFinal = rest2[0:3]
-                    attPart = 'None'
-                    #self.expression.setText( 'sameDoc ***'+restFinal+'***'+attLink+'***'+attLCS+'***' )
-                else:
-                    # we're attached to an LCS in a sister part in an external document
-                    # expr = ParentLink.Placement * ParentPart#LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1'			
-                    ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
-                    ( attPart,    separator, rest2 ) = rest1.partition('#')
-                    ( attLCS,     separator, rest3 ) = rest2.partition('.Placement * AttachmentOff')
-                    restFinal = rest3[0:3]
-                    #self.expression.setText( 'extDoc ***'+restFinal+'***'+attLink+'***'+attLCS+'***' )
-                    #return ( restFinal, 'None', 'None', 'None', 'None', 'None')
-        if restFinal=='set' and attLink==parent :
+        # expr = LCS_in_the_assembly.Placement * AttachmentOffset
+        # expr = ParentLink.Placement * LCS_parent.Placement * AttachmentOffset
+        # expr = ParentLink.Placement * ParentPart#LCS.Placement * AttachmentOffset
+        parsed = Parser.parseExpression( expr )
+        if parsed and parsed.isDatum() and parsed.attLink==parent :
             # wow, everything went according to plan
-            retval = ( attLink, attPart, attLCS )
-        #self.expression.setText( attPart +'***'+ attLCS )
+            attPart = parsed.attDoc or 'None'
+            retval = ( parsed.attLink, attPart, parsed.attLCS )
         else:
             # rats ! But still, if the decode is unsuccessful, put some text for debugging
-            retval = ( '', restFinal, attLink )
-        #self.expression.setText( '***'+restFinal+'***'+attLink+'***'+attLCS+'***' )
+            retval = ( '', 'None', parent )
         return retval
 
 
@@ -698,8 +683,8 @@ class insertFastener:
 
     def getPart(self):
         # check where to put our fastener
-        if Gui.Selection.getSelection():
-            selectedObj = Gui.Selection.getSelection()[0]
+        selectedObj = selectionCache.snapshot().first
+        if selectedObj:
             # first-choice: it's an App::Part
             if selectedObj.TypeId=='App::Part':
                 return( selectedObj )
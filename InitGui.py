@@ -87,9 +87,30 @@ class Assembly4Workbench(Workbench):
         import gotoDocumentCmd     # opens the documentof the selected App::Link
         import Asm4_Measure        # Measure tool in the Task panel
         import makeBomCmd          # creates the parts list
+        import massPropertiesCmd   # mass, center of gravity and inertia of the assembly
         import HelpCmd             # shows a basic help window
         import showHideLcsCmd      # shows/hides all the LCSs
+        import visibilitySnapshotsCmd # saves and restores the visibility of all the objects
         import configurationEngine  # save/restore configuration
+        import profilerCmd         # shows the time spent in recomputes
+        import whereAttachedCmd    # lists the objects attached to an LCS
+        import refactorCmd         # renames datums and replaces parts, re-attaching everything
+        import checkAssemblyCmd    # lists the broken attachments
+        # keeps the attachment graphs of the open documents up to date
+        import solverEngine
+        solverEngine.startObserver()
+        # keeps the indexes of the open documents up to date
+        import modelIndex
+        modelIndex.startIndex()
+        # warns about broken attachments when a document is opened
+        import checkEngine
+        checkEngine.startCheckOnOpen()
+        # stores the BOM cache in the Model when the document is saved
+        import bomEngine
+        bomEngine.startCacheOnSave()
+        # classifies the selection once for all the IsActive handlers
+        import selectionCache
+        selectionCache.startSelectionCache()
         #import DraftTools
         #import treeSelectionOverride as selectionOverride
 
@@ -135,17 +156,25 @@ class Assembly4Workbench(Workbench):
                                 "Asm4_cloneFastenersToAxes", 
                                 "Asm4_placeDatum", 
                                 "Asm4_releaseAttachment", 
+                                "Asm4_whereAttached", 
+                                "Asm4_refactor", 
                                 #"Asm4_makeLinkArray",
                                 "Separator",
                                 "Asm4_infoPart", 
                                 "Asm4_makeBOM", 
+                                "Asm4_massProperties", 
                                 "Asm4_Measure", 
                                 'Asm4_showLcs',
                                 'Asm4_hideLcs',
+                                'Asm4_visibilitySnapshots',
                                 "Asm4_addVariable", 
                                 "Asm4_delVariable", 
                                 "Asm4_Animate", 
-                                "Asm4_updateAssembly"]
+                                "Asm4_updateAssembly",
+                                "Asm4_checkAssembly",
+                                "Asm4_nativeSolver",
+                                "Asm4_expressionSolver",
+                                "Asm4_profiler"]
         self.appendMenu("&Assembly",itemsAssemblyMenu)
         # commands to appear in the Assembly4 toolbar
         itemsAssemblyToolbar = [ "Asm4_newPart", 
@@ -186,6 +215,7 @@ class Assembly4Workbench(Workbench):
         # This is executed whenever the user right-clicks on screen"
         # "recipient" will be either "view" or "tree"
         contextMenu  = ['Asm4_gotoDocument'  ,
+                        'Asm4_whereAttached' ,
                         'Asm4_showLcs'       ,
                         'Asm4_hideLcs'       ]
         # commands to appear in the 'Assembly' sub-menu in the contextual menu (right-click)
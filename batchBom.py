@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# batchBom.py
+#
+# consolidated Bill of Materials of many Assembly4 files, headless
+#
+# usage:
+#   python3 batchBom.py [options] DIR|FILE.FCStd|MANIFEST.txt ...
+#
+#   --output FILE      the consolidated BOM (.json or .csv)
+#   --breakdown FILE   the BOM of each assembly, one row per part and file
+#   --report FILE      per-file status and timing report (.json or .csv)
+#   --jobs N           number of worker processes (default: number of cores)
+#   --freecad PATH     the FreeCADCmd executable (default: found in the PATH)
+#   --timeout SECONDS  maximum time for one file
+#
+# each file is opened by a FreeCADCmd worker which returns the rows of
+# bomEngine for its Model, the driver adds up the quantities of the same
+# parts: with the same PartID, or else the same document and object
+
+
+
+import os, sys, argparse
+
+# the workbench modules must also be importable by the FreeCADCmd workers
+wbPath = os.environ.get( 'ASM4_WB_PATH' ) or os.path.dirname( os.path.abspath(__file__) )
+if wbPath not in sys.path:
+    sys.path.append( wbPath )
+
+import batchLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |      the worker, runs inside FreeCADCmd       |
+    +-----------------------------------------------+
+"""
+def bomFile( fileName, args ):
+    import FreeCAD as App
+    import bomEngine
+    doc = App.openDocument( fileName )
+    try:
+        model = doc.getObject('Model')
+        if model is None or model.TypeId != 'App::Part':
+            return { 'status':'no model', 'parts':0, 'rows':[] }
+        rows = list( bomEngine.bomRows( model ) )
+    finally:
+        for other in list( App.listDocuments().keys() ):
+            App.closeDocument( other )
+    return { 'status':'done', 'parts':len(rows), 'rows':rows }
+
+
+def runWorker( job ):
+    ( fileName, args ) = job
+    try:
+        result = bomFile( fileName, args )
+    except Exception as e:
+        result = { 'status':'failed', 'message':str(e) }
+    batchLib.workerResult( result )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       merge the BOMs of all the files         |
+    +-----------------------------------------------+
+"""
+# one row per part with the total quantity and the number of assemblies using it
+def mergeRows( results ):
+    merged = {}
+    for result in results:
+        for row in result.get('rows',[]):
+            key = batchLib.bomKey( row )
+            total = merged.get( key )
+            if total is None:
+                total = { 'key':key, 'quantity':0, 'assemblies':0 }
+                for name, value in row.items():
+                    if name != 'quantity':
+                        total[name] = value
+                merged[key] = total
+            total['quantity']   += row['quantity']
+            total['assemblies'] += 1
+    return list( merged.values() )
+
+
+# one row per part and assembly file
+def breakdownRows( results ):
+    rows = []
+    for result in results:
+        for row in result.get('rows',[]):
+            line = { 'assembly':result['file'], 'key':batchLib.bomKey( row ) }
+            line.update( row )
+            rows.append( line )
+    return rows
+
+
+
+"""
+    +-----------------------------------------------+
+    |           the driver, runs anywhere           |
+    +-----------------------------------------------+
+"""
+def parseArguments( argv ):
+    parser = argparse.ArgumentParser( description='Consolidated BOM of Assembly4 files, headless' )
+    parser.add_argument( 'paths', nargs='+', help='directories, .FCStd files or manifests' )
+    parser.add_argument( '--output', default='bom.csv' )
+    parser.add_argument( '--breakdown', default=None )
+    parser.add_argument( '--report', default=None )
+    parser.add_argument( '--jobs', type=int, default=None )
+    parser.add_argument( '--freecad', default=None )
+    parser.add_argument( '--timeout', type=float, default=None )
+    return parser.parse_args( argv )
+
+
+def main( argv ):
+    options = parseArguments( argv )
+    freecadCmd = batchLib.findFreeCADCmd( options.freecad )
+    if not freecadCmd:
+        print( 'FreeCADCmd not found, use --freecad' )
+        return 1
+    files = batchLib.listFiles( options.paths )
+    print( 'Reading the BOM of '+str(len(files))+' files' )
+    results = batchLib.runPool( freecadCmd, os.path.abspath(__file__), files, {},
+                                options.jobs, options.timeout )
+    merged = mergeRows( results )
+    batchLib.writeReport( merged, options.output )
+    if options.breakdown:
+        batchLib.writeReport( breakdownRows( results ), options.breakdown )
+    report = []
+    for result in results:
+        line = dict( result )
+        line.pop( 'rows', None )
+        report.append( line )
+    batchLib.writeReport( report, options.report, [ 'file', 'status', 'time', 'parts', 'message' ] )
+    failed = len( [ r for r in results if r['status'] == 'failed' ] )
+    print( str(len(merged))+' parts from '+str(len(files)-failed)+' files, '+str(failed)+' failed' )
+    return 1 if failed else 0
+
+
+
+job = batchLib.workerJob()
+if job:
+    runWorker( job )
+elif __name__ == '__main__':
+    sys.exit( main( sys.argv[1:] ) )
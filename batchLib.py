@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# batchLib.py
+#
+# helpers to process many FreeCAD files headless, with FreeCADCmd workers
+#
+# This module doesn't import FreeCAD: the driver runs in any Python 3, and
+# starts one FreeCADCmd process per file. The worker processes run the same
+# script, they are told what to do through environment variables.
+
+
+
+import os, sys, json, csv, time, hashlib, shutil, subprocess, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+
+# environment variables passed to the workers
+WORKER_FILE   = 'ASM4_BATCH_FILE'
+WORKER_RESULT = 'ASM4_BATCH_RESULT'
+WORKER_ARGS   = 'ASM4_BATCH_ARGS'
+WB_PATH       = 'ASM4_WB_PATH'
+
+# names of the FreeCAD command-line executable
+freecadCmdNames = [ 'FreeCADCmd', 'freecadcmd', 'FreeCADCmd.exe' ]
+
+
+
+"""
+    +-----------------------------------------------+
+    |               files and hashes                |
+    +-----------------------------------------------+
+"""
+# all the .FCStd files from a list of directories, files and manifests
+# a manifest is a text file with one path per line ('#' for comments)
+def listFiles( paths ):
+    files = []
+    for path in paths:
+        if os.path.isdir( path ):
+            for root, dirs, names in os.walk( path ):
+                for name in sorted(names):
+                    if name.lower().endswith('.fcstd'):
+                        files.append( os.path.join( root, name ) )
+        elif path.lower().endswith('.fcstd'):
+            files.append( path )
+        elif os.path.isfile( path ):
+            baseDir = os.path.dirname( path )
+            with open( path ) as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append( os.path.join( baseDir, line ) )
+    # remove duplicates but keep the order
+    seen = set()
+    result = []
+    for f in files:
+        f = os.path.abspath( f )
+        if f not in seen:
+            seen.add( f )
+            result.append( f )
+    return result
+
+
+def fileHash( fileName ):
+    sha = hashlib.sha1()
+    try:
+        with open( fileName, 'rb' ) as f:
+            for block in iter( lambda: f.read(1<<20), b'' ):
+                sha.update( block )
+    except OSError:
+        return None
+    return sha.hexdigest()
+
+
+# the cache is fileName -> { 'hash': hash, 'deps': { depFileName: hash } }
+def loadCache( cacheFile ):
+    if cacheFile and os.path.isfile( cacheFile ):
+        with open( cacheFile ) as f:
+            return json.load( f )
+    return {}
+
+
+def saveCache( cacheFile, cache ):
+    if cacheFile:
+        with open( cacheFile, 'w' ) as f:
+            json.dump( cache, f, indent=1, sort_keys=True )
+
+
+# a file is unchanged if it and all the files it depends on have the same
+# hashes as after its last successful processing
+def isUnchanged( fileName, cache ):
+    entry = cache.get( fileName )
+    if not entry or entry.get('hash') != fileHash( fileName ):
+        return False
+    for dep, depHash in entry.get('deps',{}).items():
+        if fileHash( dep ) != depHash:
+            return False
+    return True
+
+
+
+"""
+    +-----------------------------------------------+
+    |                 worker processes              |
+    +-----------------------------------------------+
+"""
+def findFreeCADCmd( freecadCmd=None ):
+    if freecadCmd:
+        return freecadCmd
+    for name in freecadCmdNames:
+        path = shutil.which( name )
+        if path:
+            return path
+    return None
+
+
+# runs a script with FreeCADCmd for one file, returns the dict written by the worker
+def runWorker( freecadCmd, script, fileName, args, timeout=None ):
+    ( fd, resultFile ) = tempfile.mkstemp( suffix='.json', prefix='asm4_' )
+    os.close( fd )
+    env = dict( os.environ )
+    env[WORKER_FILE]   = fileName
+    env[WORKER_RESULT] = resultFile
+    env[WORKER_ARGS]   = json.dumps( args )
+    env[WB_PATH]       = os.path.dirname( os.path.abspath( script ) )
+    result = { 'file':fileName, 'status':'failed', 'message':'' }
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run( [ freecadCmd, script ], env=env, timeout=timeout,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+        with open( resultFile ) as f:
+            content = f.read()
+        if content:
+            result.update( json.loads( content ) )
+        elif proc.returncode:
+            result['message'] = proc.stdout.decode( errors='replace' )[-2000:]
+    except subprocess.TimeoutExpired:
+        result['message'] = 'timeout'
+    except Exception as e:
+        result['message'] = str(e)
+    finally:
+        if os.path.exists( resultFile ):
+            os.remove( resultFile )
+    result['time'] = round( time.perf_counter() - start, 3 )
+    return result
+
+
+# runs the workers on all files, jobs at a time
+def runPool( freecadCmd, script, files, args, jobs=None, timeout=None ):
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    with ThreadPoolExecutor( max_workers=jobs ) as pool:
+        futures = [ pool.submit( runWorker, freecadCmd, script, f, args, timeout ) for f in files ]
+        results = []
+        for future in futures:
+            result = future.result()
+            print( '{status:>8}  {time:>8}s  {file}'.format(**result) )
+            results.append( result )
+    return results
+
+
+# inside a worker process: the file to process and the arguments, or None
+def workerJob():
+    fileName = os.environ.get( WORKER_FILE )
+    if not fileName:
+        return None
+    return ( fileName, json.loads( os.environ.get( WORKER_ARGS, '{}' ) ) )
+
+
+# inside a worker process: hands the result over to the driver
+def workerResult( result ):
+    with open( os.environ[WORKER_RESULT], 'w' ) as f:
+        json.dump( result, f )
+
+
+
+"""
+    +-----------------------------------------------+
+    |                    reports                    |
+    +-----------------------------------------------+
+"""
+# the key of a BOM row: the same part in different BOMs has the same PartID,
+# or else is the same object of the same document
+def bomKey( row ):
+    if row.get('PartID'):
+        return row['PartID']
+    return row.get('document','')+'#'+row.get('object','')
+
+
+# writes a list of dicts as JSON, or as CSV if the file name ends with .csv
+def writeReport( rows, fileName, columns=None ):
+    if not fileName:
+        return
+    if fileName.lower().endswith('.csv'):
+        if columns is None:
+            columns = []
+            for row in rows:
+                for key in row:
+                    if key not in columns:
+                        columns.append( key )
+        with open( fileName, 'w', newline='' ) as f:
+            writer = csv.DictWriter( f, fieldnames=columns, extrasaction='ignore' )
+            writer.writeheader()
+            writer.writerows( rows )
+    else:
+        with open( fileName, 'w' ) as f:
+            json.dump( rows, f, indent=2 )
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# batchUpdate.py
+#
+# headless solve and save of many Assembly4 files
+#
+# usage:
+#   python3 batchUpdate.py [options] DIR|FILE.FCStd|MANIFEST.txt ...
+#
+#   --jobs N           number of worker processes (default: number of cores)
+#   --freecad PATH     the FreeCADCmd executable (default: found in the PATH)
+#   --report FILE      per-file status and timing report (.json or .csv)
+#   --cache FILE       hashes of the files and their linked documents, files
+#                      unchanged since their last update are skipped
+#   --force            update all files, even unchanged ones
+#   --timeout SECONDS  maximum time for one file
+#
+# each file is opened by a FreeCADCmd worker, all Assembly4 Models are solved
+# in dependency order, and the file is saved
+
+
+
+import os, sys, time, argparse
+
+# the workbench modules must also be importable by the FreeCADCmd workers
+wbPath = os.environ.get( 'ASM4_WB_PATH' ) or os.path.dirname( os.path.abspath(__file__) )
+if wbPath not in sys.path:
+    sys.path.append( wbPath )
+
+import batchLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |      the worker, runs inside FreeCADCmd       |
+    +-----------------------------------------------+
+"""
+# the Assembly4 Models of a document
+def getModels( doc ):
+    models = []
+    for obj in doc.Objects:
+        if obj.TypeId == 'App::Part' and ( obj.Name == 'Model' or getattr(obj,'Type','') == 'Assembly4 Model' ):
+            models.append( obj )
+    return models
+
+
+def updateFile( fileName, args ):
+    import FreeCAD as App
+    import solverEngine
+    start = time.perf_counter()
+    doc = App.openDocument( fileName )
+    result = { 'status':'unchanged', 'models':0, 'recomputed':0, 'deps':{} }
+    try:
+        models = getModels( doc )
+        result['models'] = len(models)
+        if models:
+            recomputed = solverEngine.updateAssembly( doc, full=True )
+            result['recomputed'] = len(recomputed)
+            # recompute what doesn't depend on the attachments
+            doc.recompute()
+            doc.save()
+            result['status'] = 'updated'
+        # the linked documents, opened together with the assembly
+        for other in App.listDocuments().values():
+            if other != doc and other.FileName:
+                result['deps'][ os.path.abspath(other.FileName) ] = batchLib.fileHash( other.FileName )
+    finally:
+        for other in list( App.listDocuments().keys() ):
+            App.closeDocument( other )
+    result['solveTime'] = round( time.perf_counter() - start, 3 )
+    return result
+
+
+def runWorker( job ):
+    ( fileName, args ) = job
+    try:
+        result = updateFile( fileName, args )
+    except Exception as e:
+        result = { 'status':'failed', 'message':str(e) }
+    batchLib.workerResult( result )
+
+
+
+"""
+    +-----------------------------------------------+
+    |           the driver, runs anywhere           |
+    +-----------------------------------------------+
+"""
+def parseArguments( argv ):
+    parser = argparse.ArgumentParser( description='Solve and save Assembly4 files headless' )
+    parser.add_argument( 'paths', nargs='+', help='directories, .FCStd files or manifests' )
+    parser.add_argument( '--jobs', type=int, default=None )
+    parser.add_argument( '--freecad', default=None )
+    parser.add_argument( '--report', default=None )
+    parser.add_argument( '--cache', default=None )
+    parser.add_argument( '--force', action='store_true' )
+    parser.add_argument( '--timeout', type=float, default=None )
+    return parser.parse_args( argv )
+
+
+def main( argv ):
+    options = parseArguments( argv )
+    freecadCmd = batchLib.findFreeCADCmd( options.freecad )
+    if not freecadCmd:
+        print( 'FreeCADCmd not found, use --freecad' )
+        return 1
+    files = batchLib.listFiles( options.paths )
+    cache = batchLib.loadCache( options.cache )
+    # skip the files that didn't change since their last update
+    toUpdate = []
+    report = []
+    for f in files:
+        if not options.force and batchLib.isUnchanged( f, cache ):
+            report.append( { 'file':f, 'status':'skipped', 'time':0.0 } )
+        else:
+            toUpdate.append( f )
+    print( 'Updating '+str(len(toUpdate))+' of '+str(len(files))+' files' )
+    results = batchLib.runPool( freecadCmd, os.path.abspath(__file__), toUpdate, {},
+                                options.jobs, options.timeout )
+    for result in results:
+        if result['status'] in ( 'updated', 'unchanged' ):
+            cache[ result['file'] ] = { 'hash': batchLib.fileHash( result['file'] ),
+                                        'deps': result.get('deps',{}) }
+        else:
+            cache.pop( result['file'], None )
+        result.pop( 'deps', None )
+        report.append( result )
+    batchLib.saveCache( options.cache, cache )
+    batchLib.writeReport( report, options.report,
+                          [ 'file', 'status', 'time', 'solveTime', 'models', 'recomputed', 'message' ] )
+    failed = len( [ r for r in report if r['status'] == 'failed' ] )
+    print( str(len(results)-failed)+' updated, '+str(len(files)-len(results))+' skipped, '+str(failed)+' failed' )
+    return 1 if failed else 0
+
+
+
+job = batchLib.workerJob()
+if job:
+    runWorker( job )
+elif __name__ == '__main__':
+    sys.exit( main( sys.argv[1:] ) )
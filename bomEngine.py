@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# bomEngine.py
+#
+# aggregated Bill of Materials of an Assembly4 Model, usable headless:
+#
+#   import bomEngine
+#   rows = bomEngine.bomRows( App.ActiveDocument.Model )
+#   bomEngine.writeBom( rows, 'bom.csv' )
+#
+# identical linked objects are grouped in one row with their quantity,
+# and the attributes of each unique part are only computed once
+#
+# the counts and the part attributes are cached per document, with the stamp
+# of the document: the hash of its saved file, or its revision in this session
+# if it has been modified. The cache is kept in memory, and only written in the
+# Model of the assembly when the document is saved or its BOM exported, so that
+# listing the parts doesn't modify the document
+#
+# two BOMs, of two configurations or two revisions, are compared with:
+#
+#   changes = bomEngine.diffBoms( bomEngine.loadBom('old.json'), rows )
+
+
+
+import os, csv, json
+
+import FreeCAD as App
+import Part
+
+import libAsm4 as Asm4
+import solverEngine
+import batchLib
+
+
+
+# the columns of the BOM, in this order
+bomColumns = [ 'label', 'quantity', 'type', 'size' ] + Asm4.partInfo + [ 'document', 'object' ]
+
+# the containers of an assembly walked into, links are counted separately
+walkTypes = [ 'App::Part', 'App::DocumentObjectGroup' ]
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+def objectKey( obj ):
+    return ( obj.Document.Name, obj.Name )
+
+
+# an Assembly4 Model linked in another one is a sub-assembly,
+# its parts are counted in the parent assembly
+# a linked object whose contents are counted: a Model, or any other App::Part
+# holding links. It's asked once per document stamp, the answer is cached
+def isAssembly( obj, entries ):
+    if obj.TypeId != 'App::Part':
+        return False
+    if obj.Name == 'Model':
+        return True
+    assemblies = documentEntry( obj.Document, entries )['assemblies']
+    if obj.Name not in assemblies:
+        assemblies[ obj.Name ] = any( o.TypeId == 'App::Link' for ( path, o, placement ) in \
+                    Asm4.walkAssembly( obj, intoTypes=walkTypes, intoLinks=False, unique=True ) )
+    return assemblies[ obj.Name ]
+
+
+# a solid placed directly in an assembly, not through a link
+def isPartObject( obj ):
+    if obj.TypeId in Asm4.datumTypes or obj.TypeId == 'App::Part':
+        return False
+    if obj.TypeId == 'PartDesign::Body':
+        return True
+    return obj.isDerivedFrom('Part::Feature') and not obj.isDerivedFrom('Part::Part2DObject')
+
+
+# the object a link points to, also for a link to a sub-object
+def linkedObject( link ):
+    linked = link.LinkedObject
+    if isinstance( linked, tuple ):
+        linked = linked[0]
+    if linked and hasattr(linked,'Document') and linked.Document:
+        return linked
+    return None
+
+
+# the number of instances of a link, link arrays have several
+def linkCount( link ):
+    if hasattr(link,'ElementCount') and link.ElementCount > 0:
+        return link.ElementCount
+    return 1
+
+
+# 'X x Y x Z' of the bounding box, '' if there is none
+def partSize( obj ):
+    try:
+        bb = Part.getShape( obj ).BoundBox
+    except Exception:
+        return ''
+    if not bb.isValid() or max(bb.XLength,bb.YLength,bb.ZLength) >= 1e+10:
+        return ''
+    Xsize = str(int((bb.XLength * 10)+0.099)/10)
+    Ysize = str(int((bb.YLength * 10)+0.099)/10)
+    Zsize = str(int((bb.ZLength * 10)+0.099)/10)
+    return Xsize+' x '+Ysize+' x '+Zsize
+
+
+# the attributes of one unique part, from the PartInfo of infoPartCmd
+def partAttributes( obj ):
+    row = { 'label'    : obj.Label,
+            'type'     : obj.TypeId,
+            'size'     : partSize( obj ),
+            'document' : obj.Document.Name,
+            'object'   : obj.Name }
+    for info in Asm4.partInfo:
+        value = ''
+        if hasattr(obj,info):
+            value = str( getattr(obj,info) )
+        row[info] = value
+    return row
+
+
+
+"""
+    +-----------------------------------------------+
+    |          the cache of each document           |
+    +-----------------------------------------------+
+"""
+# docName -> { 'stamp'      : stamp of the document when the entry was made,
+#              'parts'      : { objName: attributes of the part },
+#              'assemblies' : { objName: whether the App::Part is an assembly },
+#              'counts'     : { objName: [ [ docName, objName, quantity ], ... ] }
+#                             of each assembly of the document,
+#              'depends'    : { objName: { docName: stamp } } of the
+#                             sub-assemblies counted in each assembly }
+cache = {}
+
+# docName -> the entries used by the last BOM of its Model, to be stored in it
+lastEntries = {}
+
+
+# the valid cache entry of doc, taken once for each BOM in entries
+def documentEntry( doc, entries ):
+    entry = entries.get( doc.Name )
+    if entry is None:
+        stamp = solverEngine.documentStamp( doc )
+        entry = cache.get( doc.Name )
+        if entry is None or stamp is None or entry['stamp'] != stamp:
+            entry = newEntry( stamp )
+            if stamp is not None:
+                cache[ doc.Name ] = entry
+        entries[ doc.Name ] = entry
+    return entry
+
+
+def newEntry( stamp ):
+    return { 'stamp': stamp, 'parts': {}, 'assemblies': {}, 'counts': {}, 'depends': {} }
+
+
+# the counts of an assembly are valid if its sub-assemblies didn't change
+def countsValid( entry, objName, entries ):
+    if objName not in entry['counts']:
+        return False
+    for docName, stamp in entry['depends'].get( objName, {} ).items():
+        doc = App.listDocuments().get( docName )
+        if doc is None or documentEntry( doc, entries )['stamp'] != stamp:
+            return False
+    return True
+
+
+# the cache stored in the Model of doc, for the entries not in memory
+def loadCache( doc ):
+    model = doc.getObject('Model')
+    if not model or not hasattr(model,'BomCache') or not model.BomCache:
+        return
+    try:
+        stored = json.loads( model.BomCache )
+    except ValueError:
+        return
+    for docName, entry in stored.items():
+        # entries written in an older format are dropped
+        if docName not in cache and isinstance( entry.get('counts'), dict ) and 'assemblies' in entry:
+            cache[ docName ] = entry
+
+
+# stores the entries used by the last BOM of doc in its Model, without touching
+# it. Only the stamps from saved files are still valid when re-opened
+def saveCache( doc ):
+    entries = lastEntries.get( doc.Name )
+    model = doc.getObject('Model')
+    if not entries or not model or model.TypeId != 'App::Part':
+        return
+    stored = {}
+    for docName, entry in entries.items():
+        if entry['stamp'] and not entry['stamp'].startswith('unsaved:'):
+            stored[ docName ] = entry
+    text = json.dumps( stored, sort_keys=True )
+    if not hasattr(model,'BomCache'):
+        model.addProperty( 'App::PropertyString', 'BomCache', 'Assembly' )
+        model.setEditorMode( 'BomCache', 2 )
+    if model.BomCache != text:
+        model.BomCache = text
+        model.purgeTouched()
+
+
+
+"""
+    +-----------------------------------------------+
+    |        count the parts of an assembly         |
+    +-----------------------------------------------+
+"""
+# returns [ [ docName, objName, quantity ], ... ] for one instance of the assembly,
+# in the order the parts are first met. The contents of each sub-assembly, a
+# linked Model or App::Part holding links, are counted once and multiplied by
+# the number of its instances, the counts of the documents that didn't change
+# are taken from the cache. The objects of model named in hidden, and their
+# contents, are left out, as in a configuration, these counts aren't cached
+def countParts( model, entries=None, building=None, hidden=None ):
+    if entries is None:
+        entries = {}
+    if building is None:
+        building = set()
+    entry = documentEntry( model.Document, entries )
+    if hidden is None and countsValid( entry, model.Name, entries ):
+        return entry['counts'][ model.Name ]
+    building.add( objectKey(model) )
+    counts = {}
+    depends = {}
+    # only the counts are needed, not the placements
+    for ( path, obj, placement ) in Asm4.walkAssembly( model, intoTypes=walkTypes, intoLinks=False, unique=True ):
+        if hidden and not hidden.isdisjoint( path ):
+            continue
+        if obj.TypeId == 'App::Link':
+            linked = linkedObject( obj )
+            if linked is None:
+                continue
+            quantity = linkCount( obj )
+            addPart( counts, linked, quantity )
+            # a sub-assembly linked in itself is only counted, not opened
+            if objectKey(linked) not in building and isAssembly( linked, entries ):
+                subEntry = documentEntry( linked.Document, entries )
+                for ( docName, objName, subQuantity ) in countParts( linked, entries, building ):
+                    key = ( docName, objName )
+                    counts[key] = counts.get( key, 0 ) + subQuantity * quantity
+                depends[ linked.Document.Name ] = subEntry['stamp']
+                depends.update( subEntry['depends'].get( linked.Name, {} ) )
+        elif isPartObject( obj ):
+            addPart( counts, obj, 1 )
+    building.discard( objectKey(model) )
+    counts = [ [ docName, objName, quantity ] for ( docName, objName ), quantity in counts.items() ]
+    if hidden is None:
+        entry['counts'][ model.Name ]  = counts
+        entry['depends'][ model.Name ] = depends
+    return counts
+
+
+def addPart( counts, obj, quantity ):
+    key = objectKey( obj )
+    counts[key] = counts.get( key, 0 ) + quantity
+
+
+# the attributes of a part, from the cache if its document didn't change
+# they only depend on the part's own document
+def cachedAttributes( docName, objName, entries ):
+    doc = App.listDocuments().get( docName )
+    if doc is None:
+        return None
+    parts = documentEntry( doc, entries )['parts']
+    attributes = parts.get( objName )
+    if attributes is None:
+        obj = doc.getObject( objName )
+        if obj is None:
+            return None
+        attributes = partAttributes( obj )
+        parts[ objName ] = attributes
+    return attributes
+
+
+
+"""
+    +-----------------------------------------------+
+    |          stream the rows and write them       |
+    +-----------------------------------------------+
+"""
+# yields one row (dict) for each unique part of the assembly, with its quantity
+# the parts are counted first, which is fast, and their attributes are only
+# computed when their row is asked for
+def bomRows( model, hidden=None ):
+    entries = {}
+    loadCache( model.Document )
+    for ( docName, objName, quantity ) in countParts( model, entries, hidden=hidden ):
+        attributes = cachedAttributes( docName, objName, entries )
+        if attributes is None:
+            continue
+        row = dict( attributes )
+        row['quantity'] = quantity
+        yield row
+    lastEntries[ model.Document.Name ] = entries
+
+
+# writes the rows as they come, in CSV if the file name ends with .csv or else JSON
+def writeBom( rows, fileName, columns=bomColumns ):
+    if fileName.lower().endswith('.csv'):
+        writeCsv( rows, fileName, columns )
+    else:
+        writeJson( rows, fileName )
+
+
+def writeCsv( rows, fileName, columns=bomColumns ):
+    with open( fileName, 'w', newline='' ) as f:
+        writer = csv.DictWriter( f, fieldnames=columns, extrasaction='ignore' )
+        writer.writeheader()
+        for row in rows:
+            writer.writerow( row )
+
+
+# a JSON list written one row at a time, without building it in memory
+def writeJson( rows, fileName ):
+    with open( fileName, 'w' ) as f:
+        f.write( '[' )
+        separator = '\n  '
+        for row in rows:
+            f.write( separator + json.dumps( row ) )
+            separator = ',\n  '
+        f.write( '\n]\n' )
+
+
+
+"""
+    +-----------------------------------------------+
+    |        snapshots of BOMs and their diff       |
+    +-----------------------------------------------+
+"""
+# the rows of a BOM written by writeBom
+def loadBom( fileName ):
+    with open( fileName, newline='' ) as f:
+        if fileName.lower().endswith('.csv'):
+            rows = list( csv.DictReader( f ) )
+            for row in rows:
+                row['quantity'] = int( row['quantity'] or 0 )
+        else:
+            rows = json.load( f )
+    return rows
+
+
+# the rows of the BOM of a revision of an assembly, in a file. The parts of the
+# revision itself are named after the file, as the document would be if it
+# wasn't opened next to the current revision
+def fileBom( fileName ):
+    opened = set( App.listDocuments().keys() )
+    doc = App.openDocument( fileName )
+    # the document is closed below, its name can't be read after
+    openedName = doc.Name
+    try:
+        model = doc.getObject('Model')
+        if model is None or model.TypeId != 'App::Part':
+            return []
+        rows = list( bomRows( model ) )
+    finally:
+        for docName in list( App.listDocuments().keys() ):
+            if docName not in opened:
+                App.closeDocument( docName )
+    docName = os.path.splitext( os.path.basename(fileName) )[0]
+    for row in rows:
+        if row['document'] == openedName:
+            row['document'] = docName
+    return rows
+
+
+# { key: ( quantity, row ) } of a BOM, the rows with the same key are added up
+def indexBom( rows ):
+    index = {}
+    for row in rows:
+        key = batchLib.bomKey( row )
+        known = index.get( key )
+        if known is None:
+            index[key] = ( row['quantity'], row )
+        else:
+            index[key] = ( known[0] + row['quantity'], known[1] )
+    return index
+
+
+# the attributes that differ between two rows of the same part, as 'name: old -> new'
+def changedAttributes( oldRow, newRow, columns ):
+    changes = []
+    for name in columns:
+        oldValue = oldRow.get( name, '' )
+        newValue = newRow.get( name, '' )
+        if oldValue != newValue and name != 'quantity' and str(oldValue) != str(newValue):
+            changes.append( name+': '+str(oldValue)+' -> '+str(newValue) )
+    return changes
+
+
+# the differences between two BOMs, one dict for each part that was 'added',
+# 'removed', or whose 'quantity' or 'attributes' changed. Both BOMs are
+# indexed by the keys of their parts, so only the parts present in both
+# are compared and the cost is proportional to the number of rows
+def diffBoms( oldRows, newRows, columns=bomColumns ):
+    oldIndex = indexBom( oldRows )
+    newIndex = indexBom( newRows )
+    diff = []
+    for key, ( newQuantity, newRow ) in newIndex.items():
+        old = oldIndex.get( key )
+        if old is None:
+            diff.append( diffLine( key, newRow, 'added', 0, newQuantity ) )
+            continue
+        ( oldQuantity, oldRow ) = old
+        # most parts don't change at all
+        if oldRow is newRow or ( oldQuantity == newQuantity and oldRow == newRow ):
+            continue
+        changes = []
+        if oldQuantity != newQuantity:
+            changes.append( 'quantity' )
+        attributes = changedAttributes( oldRow, newRow, columns )
+        if attributes:
+            changes.append( 'attributes' )
+        if changes:
+            diff.append( diffLine( key, newRow, '+'.join(changes), oldQuantity, newQuantity, attributes ) )
+    for key, ( oldQuantity, oldRow ) in oldIndex.items():
+        if key not in newIndex:
+            diff.append( diffLine( key, oldRow, 'removed', oldQuantity, 0 ) )
+    return diff
+
+
+def diffLine( key, row, change, oldQuantity, newQuantity, attributes=() ):
+    return { 'key'         : key,
+             'label'       : row.get('label',''),
+             'change'      : change,
+             'oldQuantity' : oldQuantity,
+             'newQuantity' : newQuantity,
+             'attributes'  : '; '.join( attributes ) }
+
+
+# writes the diff as JSON, or as CSV if the file name ends with .csv
+def writeDiff( diff, fileName ):
+    batchLib.writeReport( diff, fileName, [ 'key', 'label', 'change', 'oldQuantity', 'newQuantity', 'attributes' ] )
+
+
+
+"""
+    +-----------------------------------------------+
+    |     store the cache when the file is saved    |
+    +-----------------------------------------------+
+"""
+class CacheOnSave():
+
+    def slotStartSaveDocument( self, doc, fileName ):
+        saveCache( doc )
+
+    def slotDeletedDocument( self, doc ):
+        lastEntries.pop( doc.Name, None )
+
+
+
+observer = None
+
+
+def startCacheOnSave():
+    global observer
+    if observer is None:
+        observer = CacheOnSave()
+        App.addDocumentObserver( observer )
+    return observer
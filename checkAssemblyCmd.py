@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# checkAssemblyCmd.py
+#
+# shows the broken or inconsistent attachments found by checkEngine
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import checkEngine
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class checkAssemblyCmd():
+    def __init__(self):
+        super(checkAssemblyCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Check Assembly",
+                "ToolTip": "Check the attachments of all the links, fasteners and datums\n"+ \
+                           "and list the broken or inconsistent ones",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_valid.svg')
+                }
+
+    def IsActive(self):
+        if App.ActiveDocument:
+            return True
+        return False
+
+    def Activated(self):
+        Gui.Control.showDialog( checkAssemblyUI() )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class checkAssemblyUI():
+
+    columns = [ 'label', 'type', 'problem' ]
+
+    def __init__(self):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Asm4_valid.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Check Assembly')
+        self.activeDoc = App.ActiveDocument
+        self.drawUI()
+        self.onCheck()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Close)
+
+    def reject(self):
+        self.finish()
+
+
+    def onCheck(self):
+        self.report = checkEngine.checkDocument( self.activeDoc )
+        self.table.clearContents()
+        self.table.setRowCount( len(self.report) )
+        for row, problem in enumerate( self.report ):
+            for col, key in enumerate( self.columns ):
+                self.table.setItem( row, col, QtGui.QTableWidgetItem( problem[key] ) )
+        if self.report:
+            self.result.setText( str(len(self.report))+' broken or inconsistent attachment(s)' )
+        else:
+            self.result.setText( 'All attachments are valid' )
+
+
+    # highlight the object clicked in the table
+    def onItemClicked( self, item ):
+        row = self.table.currentRow()
+        if row < len(self.report):
+            obj = self.activeDoc.getObject( self.report[row]['object'] )
+            if obj:
+                Gui.Selection.clearSelection()
+                parent = obj.getParentGeoFeatureGroup()
+                if parent:
+                    Gui.Selection.addSelection( self.activeDoc.Name, parent.Name, obj.Name+'.' )
+                else:
+                    Gui.Selection.addSelection( self.activeDoc.Name, obj.Name )
+
+
+    def onSave(self):
+        fileName = QtGui.QFileDialog.getSaveFileName( None, 'Save report', 'Asm4_check.csv', 'CSV (*.csv);;JSON (*.json)' )[0]
+        if fileName:
+            checkEngine.writeReport( self.report, fileName )
+            FCC.PrintMessage( 'Report saved to '+fileName+'\n' )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        self.result = QtGui.QLabel()
+        self.mainLayout.addWidget(self.result)
+
+        self.table = QtGui.QTableWidget( 0, 3 )
+        self.table.setHorizontalHeaderLabels( [ 'Object', 'Type', 'Problem' ] )
+        self.table.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setMinimumHeight(300)
+        self.mainLayout.addWidget(self.table)
+
+        self.buttonsLayout = QtGui.QHBoxLayout()
+        self.CheckButton = QtGui.QPushButton('Check again')
+        self.SaveButton  = QtGui.QPushButton('Save report')
+        self.buttonsLayout.addWidget(self.CheckButton)
+        self.buttonsLayout.addStretch()
+        self.buttonsLayout.addWidget(self.SaveButton)
+        self.mainLayout.addLayout(self.buttonsLayout)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.table.itemClicked.connect( self.onItemClicked )
+        self.CheckButton.clicked.connect( self.onCheck )
+        self.SaveButton.clicked.connect( self.onSave )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_checkAssembly', checkAssemblyCmd() )
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# checkEngine.py
+#
+# verifies the attachments of all the Assembly4 objects of a document
+# usable headless:
+#
+#   import checkEngine
+#   problems = checkEngine.checkDocument( App.ActiveDocument )
+#   checkEngine.writeReport( problems, 'report.csv' )
+
+
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import expressionParser as Parser
+import nativeSolver
+import batchLib
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+# link, datum or fastener
+def objectType( obj ):
+    if obj.TypeId == 'App::Link':
+        return 'link'
+    elif obj.TypeId in Asm4.datumTypes:
+        return 'datum'
+    return 'fastener'
+
+
+# the document in which the LCS an object is attached to should be
+# returns ( document, problem ), one of them is None
+def targetDocument( obj, attLink ):
+    doc = obj.Document
+    if attLink == 'Parent Assembly':
+        return ( doc, None )
+    parent = doc.getObject( attLink )
+    if not parent:
+        return ( None, 'link '+attLink+' not found' )
+    if not hasattr(parent,'LinkedObject') or not parent.LinkedObject:
+        return ( None, attLink+' is not a link to a part' )
+    return ( parent.LinkedObject.Document, None )
+
+
+# the documents named in the expression must be open
+def checkExpressionDocuments( expr ):
+    parsed = Parser.parseExpression( expr )
+    if parsed:
+        for term in parsed.terms:
+            if term.doc and not App.listDocuments().get( term.doc ):
+                return 'document '+term.doc+' is not open'
+    return None
+
+
+
+"""
+    +-----------------------------------------------+
+    |             check all the objects             |
+    +-----------------------------------------------+
+"""
+# returns the problems of one object as a list of messages
+# with external=False the LCS in other documents aren't checked
+def checkObject( obj, external=True ):
+    problems = []
+    doc = obj.Document
+    ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+    if not attLink or not attLCS:
+        return [ 'AttachedTo is empty or incomplete: "'+obj.AttachedTo+'"' ]
+    # the target LCS must exist
+    if external or attLink == 'Parent Assembly':
+        ( attDoc, problem ) = targetDocument( obj, attLink )
+        if problem:
+            problems.append( problem )
+        elif not attDoc.getObject( attLCS ):
+            problems.append( attLCS+' not found in '+attDoc.Name )
+    elif not doc.getObject( attLink ):
+        problems.append( 'link '+attLink+' not found' )
+    # the LCS of the linked part used to attach it
+    linkLCS = None
+    if obj.TypeId == 'App::Link':
+        if not obj.AttachedBy.startswith('#'):
+            problems.append( 'AttachedBy is not an LCS: "'+obj.AttachedBy+'"' )
+        else:
+            linkLCS = obj.AttachedBy[1:]
+            if external and not obj.LinkedObject:
+                problems.append( 'the link is broken' )
+            elif external and not obj.LinkedObject.Document.getObject( linkLCS ):
+                problems.append( linkLCS+' not found in '+obj.LinkedObject.Document.Name )
+    # in native solver mode the properties are all there is
+    if nativeSolver.isNative( obj ):
+        return problems
+    # the expression must be decoded, and agree with the properties
+    expr = Asm4.placementEE( obj.ExpressionEngine )
+    if not expr:
+        problems.append( 'no Placement expression' )
+        return problems
+    if obj.TypeId == 'App::Link':
+        ( exprLink, exprLCS, exprLinkLCS ) = Asm4.splitExpressionLink( expr, attLink )
+        if exprLCS == 'None':
+            problems.append( 'the expression can\'t be decoded, or is not attached to '+attLink )
+        else:
+            if exprLCS != attLCS:
+                problems.append( 'AttachedTo says '+attLCS+', the expression '+exprLCS )
+            if linkLCS and exprLinkLCS != linkLCS:
+                problems.append( 'AttachedBy says '+linkLCS+', the expression '+exprLinkLCS )
+    else:
+        ( exprLink, exprPart, exprLCS ) = Asm4.splitExpressionDatum( expr )
+        if exprLCS == 'None':
+            problems.append( 'the expression can\'t be decoded' )
+        else:
+            if exprLink != attLink:
+                problems.append( 'AttachedTo says '+attLink+', the expression '+exprLink )
+            if exprLCS != attLCS:
+                problems.append( 'AttachedTo says '+attLCS+', the expression '+exprLCS )
+    if external:
+        problem = checkExpressionDocuments( expr )
+        if problem:
+            problems.append( problem )
+    return problems
+
+
+# checks all the Assembly4 attachments of a document in one pass
+# returns a list of dicts, one for each object with a problem
+def checkDocument( doc, external=True ):
+    report = []
+    for obj in doc.Objects:
+        if hasattr(obj,'AssemblyType') and obj.AssemblyType == 'Asm4EE' and hasattr(obj,'AttachedTo'):
+            problems = checkObject( obj, external )
+            if problems:
+                report.append( {    'document' : doc.Name,
+                                    'object'   : obj.Name,
+                                    'label'    : obj.Label,
+                                    'type'     : objectType( obj ),
+                                    'problem'  : '; '.join( problems ) } )
+    return report
+
+
+def checkDocuments( docs=None ):
+    if docs is None:
+        docs = App.listDocuments().values()
+    report = []
+    for doc in docs:
+        report.extend( checkDocument( doc ) )
+    return report
+
+
+# writes the report as JSON, or as CSV if the file name ends with .csv
+def writeReport( report, fileName ):
+    batchLib.writeReport( report, fileName, [ 'document', 'object', 'label', 'type', 'problem' ] )
+
+
+
+"""
+    +-----------------------------------------------+
+    |         check the documents when opened       |
+    +-----------------------------------------------+
+"""
+class CheckOnOpen():
+
+    def slotFinishRestoreDocument( self, doc ):
+        # the linked documents might not be loaded yet, only check this one
+        report = checkDocument( doc, external=False )
+        if report:
+            FCC.PrintWarning( doc.Name+': '+str(len(report))+' broken or inconsistent attachment(s), use "Check Assembly"\n' )
+            for row in report:
+                FCC.PrintWarning( '  '+row['label']+' ('+row['object']+'): '+row['problem']+'\n' )
+
+
+
+observer = None
+
+
+def startCheckOnOpen():
+    global observer
+    if observer is None:
+        observer = CheckOnOpen()
+        App.addDocumentObserver( observer )
+    return observer
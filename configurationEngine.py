@@ -12,6 +12,8 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import recomputeProfiler as Profiler
+import bomEngine
 
 HEADER_CELL             = 'A1'
 DESCRIPTION_CELL        = 'A2'
@@ -139,17 +141,13 @@ class saveConfigurationUI():
     
 
     def SaveSubObjects(self, conf, container):
-        for objName in container.getSubObjects():
-            obj = container.getSubObject(objName, 1)
+        # parse App::Part containers, and only those
+        for ( path, obj, placement ) in Asm4.walkAssembly( container, intoTypes=['App::Part'], intoLinks=False ):
             #if obj.TypeId == 'App::Link':
             self.SaveObject(conf, obj)
 
 
     def SaveObject(self, conf, obj):
-        # parse App::Part containers, and only those
-        if obj.TypeId == 'App::Part':
-            self.SaveSubObjects(conf, obj)
-
         parentObj, objFullName = obj.Parents[0]
         #objName = App.ActiveDocument.Name + '.' + parentObj.Name + '.' + objFullName
         objName = parentObj.Name + '.' + objFullName[0:-1]
@@ -323,7 +321,7 @@ class restoreConfigurationUI():
             Asm4.warningBox('Please select a cofiguration in the list')
             return
         config = selectedItems[0]
-        RestoreConfiguration(config.name)
+        RestoreConfiguration(config.name, self.diffCheck.isChecked())
         Gui.Control.closeDialog()
 
 
@@ -357,6 +355,10 @@ class restoreConfigurationUI():
         self.configurationList.setMinimumHeight(100)
         self.mainLayout.addWidget(self.configurationList)
 
+        # print the changes in the parts list
+        self.diffCheck = QtGui.QCheckBox("Show the changes in the parts list")
+        self.mainLayout.addWidget(self.diffCheck)
+
         # apply the layout to the main window
         self.form.setLayout(self.mainLayout)
 
@@ -429,30 +431,57 @@ class ListEntry(QtGui.QListWidgetItem):
         super(ListEntry, self).__init__()
 
 
-def RestoreConfiguration(docName):
+# if diff is True, the changes in the parts list are printed. This costs
+# two BOMs, so it's only done when asked for
+def RestoreConfiguration(docName, diff=False):
     FCC.PrintMessage('Restoring configuration "' + docName + '"\n')
     doc = getConfig(docName, 'Configurations')
     model = Asm4.checkModel()
     link = Asm4.getSelectedLink()
-    if link:
-        RestoreObject(doc, link)
-    else:
-        RestoreSubObjects(doc, model)
-    App.ActiveDocument.recompute()
+    # the parts of the hidden objects are left out of the BOM of a configuration
+    if diff:
+        before = list( bomEngine.bomRows( model, hiddenObjects(model) ) )
+    with Profiler.section('RestoreConfiguration'):
+        if link:
+            RestoreObject(doc, link)
+        else:
+            RestoreSubObjects(doc, model)
+        Profiler.recompute( App.ActiveDocument )
+    if diff:
+        after = list( bomEngine.bomRows( model, hiddenObjects(model) ) )
+        printBomDiff( bomEngine.diffBoms( before, after ) )
+
+
+# the names of the objects of the assembly that are hidden
+def hiddenObjects(model):
+    hidden = set()
+    for ( path, obj, placement ) in Asm4.walkAssembly( model, intoTypes=['App::Part'], intoLinks=False ):
+        if not obj.Visibility:
+            hidden.add( obj.Name )
+    return hidden
+
+
+def printBomDiff(diff):
+    if not diff:
+        FCC.PrintMessage('The parts list is unchanged\n')
+        return
+    FCC.PrintMessage('Changes in the parts list:\n')
+    for line in diff:
+        text = '  ' + line['label'] + ': ' + line['change']
+        text += ' (' + str(line['oldQuantity']) + ' -> ' + str(line['newQuantity']) + ')'
+        if line['attributes']:
+            text += ' ' + line['attributes']
+        FCC.PrintMessage(text + '\n')
 
 
 def RestoreSubObjects(doc, container):
-    for objName in container.getSubObjects():
-        obj = container.getSubObject(objName, 1)
+    # parse App::Part containers, and only those
+    for ( path, obj, placement ) in Asm4.walkAssembly( container, intoTypes=['App::Part'], intoLinks=False ):
         #if obj.TypeId == 'App::Link':
         RestoreObject(doc, obj)
 
 
 def RestoreObject(doc, obj):
-    # parse App::Part containers, and only those
-    if obj.TypeId == 'App::Part':
-        SaveSubObjects(conf, obj)
-
     parentObj, objFullName = obj.Parents[0]
     #objName = App.ActiveDocument.Name + '.' + parentObj.Name + '.' + objFullName
     objName = parentObj.Name + '.' + objFullName
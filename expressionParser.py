@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# expressionParser.py
+#
+# tokenizer and parser for the Placement expressions written by Assembly4
+#
+# the expressions are products of Placement terms, with at most one
+# AttachmentOffset and optionally inverted terms:
+#
+#   LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+#   Link.Placement * ParentPart#LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+#   Link.Placement * SubLink.Placement * SubPart#LCS.Placement * AttachmentOffset
+#
+# any number of terms can be chained before and after the AttachmentOffset
+
+
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+
+
+# identifiers, <<labels>> and the operators used by Assembly4
+tokenPattern = re.compile( r'\s*(?:(<<[^>]*>>)|(\w+)|(-1)|([#.*^]))' )
+
+# one term of the product: doc is None for the same document, path is
+# the object followed by its sub-objects, inverse is True for ' ^ -1'
+PlacementTerm = namedtuple( 'PlacementTerm', [ 'doc', 'path', 'inverse' ] )
+
+
+
+"""
+    +-----------------------------------------------+
+    |           the decoded attachment              |
+    +-----------------------------------------------+
+"""
+# the results are shared through the cache and must not be modified
+class AttachmentExpression():
+
+    def __init__( self, terms, offsetIndex ):
+        # tuple of PlacementTerm, without the AttachmentOffset
+        self.terms = terms
+        # position of the AttachmentOffset in the product, None if there is none
+        self.offsetIndex = offsetIndex
+        if offsetIndex is None:
+            self.before = terms
+            self.after  = ()
+        else:
+            self.before = terms[0:offsetIndex]
+            self.after  = terms[offsetIndex:]
+
+    # the link or datum is placed on the last term before the AttachmentOffset,
+    # after the links leading to it. 'Parent Assembly' if there are none
+    @property
+    def attLink( self ):
+        if len(self.before) > 1:
+            return self.before[0].path[0]
+        return 'Parent Assembly'
+
+    @property
+    def attDoc( self ):
+        if self.before:
+            return self.before[-1].doc
+        return None
+
+    @property
+    def attLCS( self ):
+        if self.before:
+            return self.before[-1].path[-1]
+        return None
+
+    # for a link, the LCS in the linked part, inverted at the end
+    @property
+    def linkedDoc( self ):
+        if len(self.after) == 1:
+            return self.after[0].doc
+        return None
+
+    @property
+    def linkLCS( self ):
+        if len(self.after) == 1:
+            return self.after[0].path[-1]
+        return None
+
+    # LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1
+    def isLink( self ):
+        return self.offsetIndex is not None and len(self.before) > 0 \
+                and len(self.after) == 1 and self.after[0].inverse
+
+    # LCS.Placement * AttachmentOffset
+    def isDatum( self ):
+        return self.offsetIndex is not None and len(self.before) > 0 and len(self.after) == 0
+
+    # (docName, objName) of the objects the expression depends on: the first
+    # link, the LCS it's placed on, and the LCS of the linked part. The terms
+    # in between are sub-links reached through the first link, they aren't
+    # objects of the document of the expression and are left out
+    def references( self ):
+        terms = self.before[0:1] + self.before[1:][-1:] + self.after
+        return [ ( t.doc, t.path[0] ) for t in terms ]
+
+
+
+"""
+    +-----------------------------------------------+
+    |             tokenizer and parser              |
+    +-----------------------------------------------+
+"""
+def tokenize( expr ):
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        match = tokenPattern.match( expr, pos )
+        if not match:
+            return None
+        tokens.append( match.group( match.lastindex ) )
+        pos = match.end()
+    return tokens
+
+
+def isName( token ):
+    return token is not None and token not in ( '#', '.', '*', '^', '-1' )
+
+
+# returns an AttachmentExpression, or None if expr isn't an Assembly4 expression
+# the results are cached, the same expressions are decoded over and over
+@lru_cache( maxsize=4096 )
+def parseExpression( expr ):
+    if not expr:
+        return None
+    tokens = tokenize( expr )
+    if not tokens:
+        return None
+    tokens.append( None )
+    terms = []
+    offsetIndex = None
+    pos = 0
+    while True:
+        token = tokens[pos]
+        if token == 'AttachmentOffset':
+            # only one AttachmentOffset allowed
+            if offsetIndex is not None:
+                return None
+            offsetIndex = len(terms)
+            pos += 1
+        elif isName( token ):
+            # [doc#]object[.subObject]*.Placement
+            doc = None
+            if tokens[pos+1] == '#':
+                doc = token
+                pos += 2
+                if not isName( tokens[pos] ):
+                    return None
+            path = [ tokens[pos] ]
+            pos += 1
+            while tokens[pos] == '.' and isName( tokens[pos+1] ):
+                path.append( tokens[pos+1] )
+                pos += 2
+            if path[-1] != 'Placement' or len(path) < 2:
+                return None
+            inverse = False
+            if tokens[pos] == '^':
+                if tokens[pos+1] != '-1':
+                    return None
+                inverse = True
+                pos += 2
+            terms.append( PlacementTerm( doc, tuple(path[0:-1]), inverse ) )
+        else:
+            return None
+        # the terms are separated by '*'
+        if tokens[pos] is None:
+            break
+        if tokens[pos] != '*':
+            return None
+        pos += 1
+    return AttachmentExpression( tuple(terms), offsetIndex )
+
+
+
+"""
+    +-----------------------------------------------+
+    |        write an expression back as text       |
+    +-----------------------------------------------+
+"""
+# the inverse of parseExpression, in the format of makeExpressionPart
+def formatExpression( terms, offsetIndex ):
+    factors = []
+    for i, term in enumerate( terms ):
+        if i == offsetIndex:
+            factors.append( 'AttachmentOffset' )
+        factor = '.'.join( term.path )+'.Placement'
+        if term.doc:
+            factor = term.doc+'#'+factor
+        if term.inverse:
+            factor += ' ^ -1'
+        factors.append( factor )
+    if offsetIndex is not None and offsetIndex == len(terms):
+        factors.append( 'AttachmentOffset' )
+    return ' * '.join( factors )
@@ -16,6 +16,7 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import selectionCache
 
 
 
@@ -31,8 +32,8 @@ partTypes = [ 'App::Part', 'PartDesign::Body']
 def checkPart():
     selectedPart = None
     # if an App::Part is selected
-    if len(Gui.Selection.getSelection())==1:
-        selectedObj = Gui.Selection.getSelection()[0]
+    selectedObj = selectionCache.snapshot().single
+    if selectedObj:
         if selectedObj.TypeId in partTypes:
             selectedPart = selectedObj
     return selectedPart
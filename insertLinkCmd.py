@@ -13,6 +13,7 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
+import modelIndex
 
 
 
@@ -140,9 +141,7 @@ class insertLink( QtGui.QDialog ):
                 if lastChar.isnumeric():
                     rootName = origName[:-1]
                     instanceNum = int(lastChar)
-                    while App.ActiveDocument.getObject( rootName+str(instanceNum) ):
-                        instanceNum += 1
-                    proposedLinkName = rootName+str(instanceNum)
+                    proposedLinkName = modelIndex.nextName( App.ActiveDocument, rootName, instanceNum )
                 # else we append a _2 to the original name (Label)
                 else:
                     proposedLinkName = origName+'_2'
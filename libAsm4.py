@@ -20,10 +20,17 @@ wbPath   = os.path.dirname(__file__)
 iconPath = os.path.join( wbPath, 'Resources/icons' )
 libPath  = os.path.join( wbPath, 'Resources/library' )
 
-from PySide import QtGui, QtCore
-import FreeCADGui as Gui
 import FreeCAD as App
 from FreeCAD import Console as FCC
+# the library is also used headless (FreeCADCmd), without Qt and the GUI
+if App.GuiUp:
+    from PySide import QtGui, QtCore
+    import FreeCADGui as Gui
+    import selectionCache
+
+import recomputeProfiler as Profiler
+import expressionParser as Parser
+import modelIndex
 
 
 
@@ -44,14 +51,22 @@ containerTypes = [  'App::Part', 'PartDesign::Body' ]
 
 
 
-def findObjectLink(obj, doc = App.ActiveDocument):
-    for o in doc.Objects:
-        if hasattr(o, 'LinkedObject'):
-            if o.LinkedObject == obj:
-                return o
+# the first link to obj in doc, in the order of the objects of doc,
+# the active document by default
+def findObjectLink(obj, doc = None):
+    if doc is None:
+        doc = App.ActiveDocument
+    links = modelIndex.findLinks( obj, doc )
+    if links:
+        return links[0]
     return(None)
 
 
+# all the links to obj, in all the open documents, from the index kept by modelIndex
+def findObjectLinks(obj):
+    return modelIndex.findLinks( obj )
+
+
 def getSelectionPath(docName, objName, subObjName):
         val = []
         if (docName is None) or (docName == ''):
@@ -82,12 +97,7 @@ def cloneObject(obj):
         result.LinkedObject = obj
         result.Label = obj.Label
         container.addObject(result)
-        result.recompute()
-        container = result.getParentGeoFeatureGroup()
-        if container:
-            container.recompute()
-        if result.Document:
-            result.Document.recompute()
+        recomputeObject(result)
     return result
  
  
@@ -95,7 +105,7 @@ def placeObjectToLCS( attObj, attLink, attDoc, attLCS ):
     expr = makeExpressionDatum( attLink, attDoc, attLCS )
     # indicate the this fastener has been placed with the Assembly4 workbench
     if not hasattr(attObj,'AssemblyType'):
-        Asm4.makeAsmProperties(attObj)
+        makeAsmProperties(attObj)
     attObj.AssemblyType = 'Asm4EE'
     # the fastener is attached by its Origin, no extra LCS
     attObj.AttachedBy = 'Origin'
@@ -104,12 +114,110 @@ def placeObjectToLCS( attObj, attLink, attDoc, attLCS ):
     # load the built expression into the Expression field of the constraint
     attObj.setExpression( 'Placement', expr )
     # recompute the object to apply the placement:
-    attObj.recompute()
-    container = attObj.getParentGeoFeatureGroup()
+    with Profiler.section('placeObjectToLCS'):
+        recomputeObject( attObj )
+
+
+
+
+"""
+    +-----------------------------------------------+
+    |        defer and coalesce the recomputes      |
+    +-----------------------------------------------+
+"""
+# while a batch is open, the objects to recompute are only collected here
+# ( docName, objName ) -> obj
+batchDepth   = 0
+batchObjects = {}
+
+
+# used as:  with Asm4.recomputeBatch('Clone fasteners', doc): ...
+# the helpers called inside don't recompute, the collected objects are
+# recomputed once when the outermost batch closes, in one undo transaction
+class recomputeBatch():
+
+    def __init__( self, name='Assembly4', doc=None ):
+        self.name = name
+        self.doc  = doc
+
+    def __enter__( self ):
+        global batchDepth
+        # only the outermost batch opens a transaction
+        if batchDepth == 0:
+            if self.doc is None:
+                self.doc = App.ActiveDocument
+            if self.doc:
+                self.doc.openTransaction( self.name )
+        else:
+            self.doc = None
+        batchDepth += 1
+        return self
+
+    def __exit__( self, excType, excValue, traceback ):
+        global batchDepth
+        batchDepth -= 1
+        if batchDepth == 0:
+            # a batch that failed half-way is undone, not kept as one undo step
+            if excType is not None:
+                batchObjects.clear()
+                if self.doc:
+                    self.doc.abortTransaction()
+                return False
+            try:
+                flushRecomputes()
+            except Exception:
+                if self.doc:
+                    self.doc.abortTransaction()
+                raise
+            if self.doc:
+                self.doc.commitTransaction()
+        return False
+
+
+# the document of obj, None if obj has been deleted
+def objectDocument( obj ):
+    try:
+        return obj.Document
+    except Exception:
+        return None
+
+
+# recompute an object with its container and document, or defer it if a batch is open
+def recomputeObject( obj ):
+    doc = objectDocument( obj )
+    if not doc:
+        return
+    if batchDepth > 0:
+        batchObjects[ (doc.Name, obj.Name) ] = obj
+        return
+    Profiler.recompute( obj )
+    container = obj.getParentGeoFeatureGroup()
     if container:
-        container.recompute()
-    if attObj.Document:
-        attObj.Document.recompute()
+        Profiler.recompute( container )
+    Profiler.recompute( doc )
+
+
+# recompute each container and each document of the collected objects once
+def flushRecomputes():
+    global batchObjects
+    objects = batchObjects
+    batchObjects = {}
+    containers = {}
+    docs = {}
+    for obj in objects.values():
+        # the object might have been deleted in the meantime
+        doc = objectDocument( obj )
+        if not doc:
+            continue
+        container = obj.getParentGeoFeatureGroup()
+        if container and objectDocument( container ):
+            containers[ (container.Document.Name, container.Name) ] = container
+        docs[ doc.Name ] = doc
+    with Profiler.section('recomputeBatch'):
+        for container in containers.values():
+            Profiler.recompute( container )
+        for doc in docs.values():
+            Profiler.recompute( doc )
 
 
 
@@ -150,7 +258,9 @@ def createVariables():
     # there is none, so we create it
     else:
         variables = App.ActiveDocument.addObject('App::FeaturePython','Variables')
-        variables.ViewObject.Proxy = setCustomIcon(object,'Asm4_Variables.svg')
+        # there is no ViewObject when running headless (FreeCADCmd)
+        if App.GuiUp:
+            variables.ViewObject.Proxy = setCustomIcon(object,'Asm4_Variables.svg')
         retval = variables
     return retval
 
@@ -211,37 +321,36 @@ def isLinkToPart(obj):
         return False
 
 
+# the link to a part holding the datum selected as selTree = 'linkName.[groupName.]datumName.'
+# links is the set of the names of the links to parts in the Model
+def linkOfDatum( selTree, datum, links ):
+    (parents, toto, dot) = selTree.partition('.'+datum.Name)
+    if dot =='.' and parents in links:
+        return App.ActiveDocument.getObject( parents )
+    # see whether the datum is in a group, some people like to do that
+    (parents2, dot, groupName) = parents.partition('.')
+    group = App.ActiveDocument.getObject( groupName )
+    if parents2 in links and group and group.TypeId=='App::DocumentObjectGroup':
+        return App.ActiveDocument.getObject( parents2 )
+    return None
+
+
 # get from the selected datum the corresponding link
 def getLinkAndDatum():
     retval = (None,None)
     # only for Asm4 
-    if checkModel() and len(Gui.Selection.getSelection())==1:
-        parentAssembly = App.ActiveDocument.Model
-        # find all the links to Part or Body objects
-        childrenTable = []
-        for objStr in parentAssembly.getSubObjects():
-            # the string ends with a . that must be removed
-            obj = App.ActiveDocument.getObject( objStr[0:-1] )
-            if isLinkToPart(obj):
-                # add it to our tree table if it's a link to an App::Part ...
-                childrenTable.append( obj )
-
-        selObj = Gui.Selection.getSelection()[0]
+    selection = selectionCache.snapshot().objects
+    if checkModel() and len(selection)==1:
+        selObj = selection[0]
         # a datum is selected
         if selObj.TypeId in datumTypes:
+            # the links to Part or Body objects, kept up to date by modelIndex
+            links = modelIndex.getModelContents( App.ActiveDocument ).links
             # this returns the selection hierarchy in the form 'linkName.datumName.'
             selTree = Gui.Selection.getSelectionEx("", 0)[0].SubElementNames[0]
-            (parents, toto, dot) = selTree.partition('.'+selObj.Name)
-            link = App.ActiveDocument.getObject( parents )
-            if dot =='.' and link in childrenTable:
+            link = linkOfDatum( selTree, selObj, links )
+            if link:
                 retval = (link,selObj)
-            else:
-                # see whether the datum is in a group, some people like to do that
-                (parents2, dot, groupName) = parents.partition('.')
-                link2 = App.ActiveDocument.getObject( parents2 )
-                group = App.ActiveDocument.getObject( groupName )
-                if link2 and group and link2 in childrenTable and group.TypeId=='App::DocumentObjectGroup':
-                    retval = (link2,selObj)
     return retval
 
 
@@ -249,59 +358,116 @@ def getLinkAndDatum():
 def getLinkAndDatum2():
     retval = (None, None, None, None)
     # only for Asm4 
-    if checkModel() and len(Gui.Selection.getSelection()) == 2:
-        parentAssembly = App.ActiveDocument.Model
-        # find all the links to Part or Body objects
-        childrenTable = []
-        for objStr in parentAssembly.getSubObjects():
-            # the string ends with a . that must be removed
-            obj = App.ActiveDocument.getObject( objStr[0:-1] )
-            if isLinkToPart(obj):
-                # add it to our tree table if it's a link to an App::Part ...
-                childrenTable.append( obj )
-
-        selObjA = Gui.Selection.getSelection()[0]
-        selObjB = Gui.Selection.getSelection()[1]
+    selection = selectionCache.snapshot().objects
+    if checkModel() and len(selection) == 2:
+        (selObjA, selObjB) = selection
         # two datum objects are selected
         if ((selObjA.TypeId in datumTypes) and (selObjB.TypeId in datumTypes)):
+            # the links to Part or Body objects, kept up to date by modelIndex
+            links = modelIndex.getModelContents( App.ActiveDocument ).links
             # this returns the selection hierarchy in the form 'linkName.datumName.'
-            selTreeA = Gui.Selection.getSelectionEx("", 0)[0].SubElementNames[0]
-            selTreeB = Gui.Selection.getSelectionEx("", 0)[0].SubElementNames[1]
-            (parentsA, totoA, dotA) = selTreeA.partition('.'+selObjA.Name)
-            (parentsB, totoB, dotB) = selTreeB.partition('.'+selObjB.Name)
-            linkA = App.ActiveDocument.getObject( parentsA )
-            linkB = App.ActiveDocument.getObject( parentsB )
-            if (dotA =='.' and linkA in childrenTable) and (dotB =='.' and linkB in childrenTable):
+            selTree = Gui.Selection.getSelectionEx("", 0)[0].SubElementNames
+            linkA = linkOfDatum( selTree[0], selObjA, links )
+            linkB = linkOfDatum( selTree[1], selObjB, links )
+            if linkA and linkB:
                 retval = (linkA, selObjA, linkB, selObjB)
-
-            else:
-                # see whether the datum objects are in a group, some people like to do that
-                (parentsA2, dotA, groupNameA) = parentsA.partition('.')
-                (parentsB2, dotB, groupNameB) = parentsB.partition('.')
-                linkA2 = App.ActiveDocument.getObject( parentsA2 )
-                linkB2 = App.ActiveDocument.getObject( parentsB2 )
-                groupA = App.ActiveDocument.getObject( groupNameA )
-                groupB = App.ActiveDocument.getObject( groupNameB )
-                if ((linkA2 in childrenTable and groupA.TypeId=='App::DocumentObjectGroup') and (linkB2 in childrenTable and groupB.TypeId=='App::DocumentObjectGroup')):
-                    retval = (linkA2,selObjA,linkB2,selObjB)
-
     return retval
 
-# get all datums in a part
+# get all datums in a part, from the index kept up to date by modelIndex
 def getPartLCS( part ):
-    partLCS = [ ]
-    # parse all objects in the part (they return strings)
-    for objName in part.getSubObjects(1):
-        # get the proper objects
-        # all object names end with a "." , this needs to be removed
-        obj = part.getObject( objName[0:-1] )
-        if obj.TypeId in datumTypes:
-            partLCS.append( obj )
-        elif obj.TypeId == 'App::DocumentObjectGroup':
-            datums = getPartLCS(obj)
-            for datum in datums:
-                partLCS.append(datum)
-    return partLCS
+    return modelIndex.getPartLCS( part )
+
+
+
+"""
+    +-----------------------------------------------+
+    |     walk through an assembly and its parts    |
+    +-----------------------------------------------+
+"""
+# the containers walked into by default
+walkTypes = containerTypes + [ 'App::DocumentObjectGroup' ]
+
+
+# the Placement of obj, the identity for objects without one like groups
+def objectPlacement( obj ):
+    if hasattr(obj,'Placement'):
+        return obj.Placement
+    return App.Placement()
+
+
+# the container to walk into from obj, None if it's not walked into
+def walkTarget( obj, intoTypes, intoLinks ):
+    if obj.TypeId in intoTypes:
+        return obj
+    if intoLinks and obj.TypeId == 'App::Link' and obj.LinkedObject \
+                and hasattr(obj.LinkedObject,'TypeId') and obj.LinkedObject.TypeId in intoTypes:
+        return obj.LinkedObject
+    return None
+
+
+# the Placement of the contents of target in the container of obj
+def walkPlacement( obj, target ):
+    placement = objectPlacement( obj )
+    # a link ignores the Placement of the linked object, unless told otherwise
+    if target is not obj and hasattr(obj,'LinkTransform') and obj.LinkTransform:
+        placement = placement.multiply( objectPlacement(target) )
+    return placement
+
+
+# the ( child, container to walk into ) of container, each container is
+# only asked once for its children however many times it's linked
+def walkChildren( container, intoTypes, intoLinks, memo ):
+    key = ( container.Document.Name, container.Name )
+    children = memo.get( key )
+    if children is None:
+        children = []
+        for objName in container.getSubObjects(1):
+            # 1 for returning the real object
+            obj = container.getSubObject( objName, 1 )
+            if obj is not None:
+                children.append( ( obj, walkTarget( obj, intoTypes, intoLinks ) ) )
+        memo[key] = children
+    return children
+
+
+# yields ( path, obj, placement ) for all the objects in container and in the
+# containers and linked parts it holds, in tree order. path is the tuple of names
+# from container to obj, the sub-name is '.'.join(path)+'.', and placement
+# that of obj in the coordinate system of container.
+# The walk is iterative, so deep trees don't hit the recursion limit, and
+# a container holding itself through a link is only walked once.
+# With unique=True each container or linked part is walked into only the
+# first time it's met, so every object is yielded once whatever the number
+# of instances, and the placements aren't computed: placement is None
+def walkAssembly( container, intoTypes=walkTypes, intoLinks=True, unique=False ):
+    memo = {}
+    key = ( container.Document.Name, container.Name )
+    base = None if unique else App.Placement()
+    # one level per container walked into, with the path and placement to it
+    stack = [ ( iter( walkChildren( container, intoTypes, intoLinks, memo ) ), (), base, key ) ]
+    onPath = { key }
+    while stack:
+        ( children, path, base, key ) = stack[-1]
+        entry = next( children, None )
+        if entry is None:
+            stack.pop()
+            if not unique:
+                onPath.discard( key )
+            continue
+        ( child, target ) = entry
+        childPath = path + ( child.Name, )
+        if unique:
+            yield ( childPath, child, None )
+        else:
+            yield ( childPath, child, base.multiply( objectPlacement(child) ) )
+        if target is not None:
+            targetKey = ( target.Document.Name, target.Name )
+            if targetKey not in onPath:
+                onPath.add( targetKey )
+                targetBase = None if unique else base.multiply( walkPlacement( child, target ) )
+                stack.append( ( iter( walkChildren( target, intoTypes, intoLinks, memo ) ), \
+                                childPath, targetBase, targetKey ) )
+
 
 
 """
@@ -309,19 +475,20 @@ def getPartLCS( part ):
     |           get the next instance's name         |
     +-----------------------------------------------+
 """
-def nextInstance( name, startAtOne=False ):
+def nextInstance( name, startAtOne=False, doc=None ):
+    if doc is None:
+        doc = App.ActiveDocument
     # if there is no such name, return the original
-    if not App.ActiveDocument.getObject(name) and not startAtOne:
+    if not doc.getObject(name) and not startAtOne:
         return name
     # there is already one, we increment
+    # the numbers used are kept by modelIndex, no need to probe them all
     else:
         if startAtOne:
             instanceNum = 1
         else:
             instanceNum = 2
-        while App.ActiveDocument.getObject( name+'_'+str(instanceNum) ):
-            instanceNum += 1
-        return name+'_'+str(instanceNum)
+        return modelIndex.nextName( doc, name+'_', instanceNum )
 
 
 
@@ -420,6 +587,10 @@ def isAppLink(obj):
     +-----------------------------------------------+
 """
 def warningBox( text ):
+    # no message box when running headless
+    if not App.GuiUp:
+        FCC.PrintWarning( text+'\n' )
+        return
     msgBox = QtGui.QMessageBox()
     msgBox.setWindowTitle( 'FreeCAD Warning' )
     msgBox.setIcon( QtGui.QMessageBox.Critical )
@@ -450,13 +621,7 @@ def confirmBox( text ):
 """
     +-----------------------------------------------+
     |        Drop-down menu to group buttons        |
-    +----def findObjectLink(obj, doc = App.ActiveDocument):
-    for o in doc.Objects:
-        if hasattr(o, 'LinkedObject'):
-            if o.LinkedObject == obj:
-                return o
-    return(None)
--------------------------------------------+
+    +-----------------------------------------------+
 """
 # from https://github.com/HakanSeven12/FreeCAD-Geomatics-Workbench/commit/d82d27b47fcf794bf6f9825405eacc284de18996
 class dropDownCmd:
@@ -550,58 +715,13 @@ def splitExpressionLink( expr, parent ):
     # external document:
     # expr = LCS_target.Placement * AttachmentOffset * linkedPart#LCS_attachment.Placement ^ -1
     # expr = sisterLink.Placement * sisterPart#LCS_target.Placement * AttachmentOffset * linkedPart#LCS_attachment.Placement ^ -1
+    # and any deeper chain of links before the target LCS
     retval = ( expr, 'None', 'None' )
-    restFinal = ''
-    attLink = ''
-    # expr is empty
-    if not expr:
-        return retval
-    nbHash = expr.count('#')
-    if nbHash==0:
-        # linked part, sister part and assembly in the same document
-        if parent == 'Parent Assembly':
-            # we're attached to an LCS in the parent assembly
-            # expr = LCS_in_the_assembly.Placement * AttachmentOffset * LCS_linkedPart.Placement ^ -1
-            ( attLCS, separator, rest1 ) = expr.partition('.Placement * AttachmentOffset * ')
-            ( linkLCS, separator, rest2 ) = rest1.partition('.Placement ^ ')
-            restFinal = rest2[0:2]
-            attLink = parent
-            attPart = 'None'
-        else:
-            # we're attached to an LCS in a sister part
-            # expr = ParentLink.Placement * LCS_parent.Placement * AttachmentOffset * LCS_linkedPart.Placement ^ -1
-            ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
-            ( attLCS,     separator, rest2 ) = rest1.partition('.Placement * AttachmentOffset * ')
-            ( linkLCS,    separator, rest3 ) = rest2.partition('.Placement ^ ')
-            restFinal = rest3[0:2]
-    elif nbHash==1:
-        # an external part is linked to the assembly or a part in the same document as the assembly
-        if parent == 'Parent Assembly':
-            # we're attached to an LCS in the parent assembly
-            # expr = LCS_assembly.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1'			
-            ( attLCS, separator, rest1 ) = expr.partition('.Placement * AttachmentOffset * ')
-            ( linkedDoc, separator, rest2 ) = rest1.partition('#')
-            ( linkLCS, separator, rest3 ) = rest2.partition('.Placement ^ ')
-            restFinal = rest3[0:2]
-            attLink = parent
-            attPart = 'None'
-    elif nbHash==2:
-        # linked part and sister part in external documents to the parent assembly:
-        # expr = ParentLink.Placement * ParentPart#LCS.Placement * AttachmentOffset * LinkedPart#LCS.Placement ^ -1'			
-        ( attLink,    separator, rest1 ) = expr.partition('.Placement * ')
-        ( attPart,    separator, rest2 ) = rest1.partition('#')
-        ( attLCS,     separator, rest3 ) = rest2.partition('.Placement * AttachmentOffset * ')
-        ( linkedDoc, separator, rest4 ) = rest3.partition('#')
-        ( linkLCS,    separator, rest5 ) = rest4.partition('.Placement ^ ')
-        restFinal = rest5[0:2]
-    else:
-        # complicated stuff, we'll do it later
-        pass        
+    parsed = Parser.parseExpression( expr )
     # final check, all options should give the correct data
-    if restFinal=='-1' and attLink==parent :
+    if parsed and parsed.isLink() and parsed.attLink==parent :
         # wow, everything went according to plan
-        # retval = ( expr, attPart, attLCS, constrLink, partLCS )
-        retval = ( attLink, attLCS, linkLCS )
+        retval = ( parsed.attLink, parsed.attLCS, parsed.linkLCS )
     return retval
 
 
@@ -633,37 +753,21 @@ def makeExpressionDatum( attLink, attPart, attLCS ):
     +-----------------------------------------------+
 """
 def splitExpressionDatum( expr ):
+    # expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
+    # expr = Link.Placement * LCS.Placement * AttachmentOffset
+    # expr = LCS.Placement * AttachmentOffset
     retval = ( expr, 'None', 'None' )
-    # expr is empty
-    if not expr:
-        return retval
-    restFinal = ''
-    attLink = ''
-    if expr:
-        # Look for a # to see whether the linked part is in the same document
-        # expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
-        # expr = Link.Placement * LCS.Placement * AttachmentOffset
-        if '#' in expr:
+    parsed = Parser.parseExpression( expr )
+    if parsed and parsed.isDatum():
+        if parsed.attLink == 'Parent Assembly':
+            attPart = 'None'
+        elif parsed.attDoc:
             # the linked part is in another document
-            # expr = Link.Placement * LinkedPart#LCS.Placement * AttachmentOffset
-            ( attLink, separator, rest1 ) = expr.partition('.Placement * ')
-            ( attPart, separator, rest2 ) = rest1.partition('#')
-            ( attLCS,  separator, rest3 ) = rest2.partition('.Placement * ')
-            restFinal = rest3[0:16]
+            attPart = parsed.attDoc
         else:
             # the linked part is in the same document
-            # expr = Link.Placement * LCS.Placement * AttachmentOffset
-            ( attLink, separator, rest1 ) =  expr.partition('.Placement * ')
-            ( attLCS,  separator, rest2 ) = rest1.partition('.Placement * ')
-            restFinal = rest2[0:16]
             attPart = 'unimportant'
-        if restFinal=='AttachmentOffset':
-            # wow, everything went according to plan
-            retval = ( attLink, attPart, attLCS )
-            #self.expression.setText( attPart +'***'+ attLCS )
-        else:
-            # rats ! But still, if the decode is unsuccessful, put some text
-            retval = ( restFinal, 'None', 'None' )
+        retval = ( parsed.attLink, attPart, parsed.attLCS )
     return retval
 
 
@@ -677,40 +781,6 @@ def splitExpressionDatum( expr ):
 
 
 
-"""
-    +-----------------------------------------------+
-    |              Show/Hide the LCSs in            |
-    |   the provided object and all its children    |
-    +-----------------------------------------------+
-
-def showChildLCSs(obj, show, processedLinks):
-    #global processedLinks
-    # if its a datum apply the visibility
-    if obj.TypeId in datumTypes:
-        obj.Visibility = show
-    # if it's a link, look for subObjects
-    elif obj.TypeId == 'App::Link' and obj.Name not in processedLinks:
-        processedLinks.append(obj.Name)
-        for objName in obj.LinkedObject.getSubObjects(1):
-            linkedObj = obj.LinkedObject.Document.getObject(objName[0:-1])
-            showChildLCSs(linkedObj, show, processedLinks)
-    # if it's a container
-    else:
-        if obj.TypeId in containerTypes:
-            for subObjName in obj.getSubObjects(1):
-                subObj = obj.getSubObject(subObjName, 1)    # 1 for returning the real object
-                if subObj != None:
-                    if subObj.TypeId in datumTypes:
-                        #subObj.Visibility = show
-                        # Aparently obj.Visibility API is very slow
-                        # Using the ViewObject.show() and ViewObject.hide() API runs at least twice faster
-                        if show:
-                            subObj.ViewObject.show()
-                        else:
-                            subObj.ViewObject.hide()
-"""
-
-
 """
     +-----------------------------------------------+
     |        Selection Helper functions             |
@@ -727,39 +797,22 @@ def getModelSelected():
 """
 
 
+# the selection is classified once by selectionCache, at each change
 def getSelectedContainer():
-    selection = Gui.Selection.getSelection()
-    if len(selection)==1:
-        selObj = selection[0]
-        # it's an App::Link
-        if selObj.TypeId in containerTypes:
-            return selObj
-    return None
+    return selectionCache.snapshot().container
 
 
 def getSelectedLink():
     # check that there is an App::Part called 'Model'
     #if App.ActiveDocument.getObject('Model') and App.ActiveDocument.Model.TypeId == 'App::Part':
     if checkModel():
-        selection = Gui.Selection.getSelection()
-        if len(selection)==1:
-            selObj = selection[0]
-            # it's an App::Link
-            if selObj.isDerivedFrom('App::Link') and selObj.LinkedObject.TypeId in containerTypes:
-                return selObj
+        # it's an App::Link to a container
+        return selectionCache.snapshot().link
     return None
 
 
 def getSelectedDatum():    
-    selectedObj = None
-    # check that something is selected
-    if len(Gui.Selection.getSelection())==1:
-        selection = Gui.Selection.getSelection()[0]
-        # check that it's a datum
-        if selection.TypeId in datumTypes:
-            selectedObj = selection
-    # now we should be safe
-    return selectedObj
+    return selectionCache.snapshot().datum
 
 
 
@@ -3,11 +3,13 @@
 # 
 # makeBomCmd.py 
 #
-# parses the Asm4 Model tree and creates a list of parts
+# shows the list of parts of the Asm4 Model counted by bomEngine, which walks
+# the tree with libAsm4.walkAssembly: each sub-assembly is walked once and its
+# parts multiplied by its number of instances
 
 
 
-import os
+import os, itertools
 
 from PySide import QtGui, QtCore
 import FreeCADGui as Gui
@@ -15,6 +17,7 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import bomEngine
 
 
 
@@ -24,6 +27,12 @@ import libAsm4 as Asm4
     |               Helper functions                |
     +-----------------------------------------------+
 """
+# the columns shown in the dialog, from those of bomEngine
+tableColumns = [ 'quantity', 'label', 'PartID', 'PartName', 'size', 'document' ]
+tableHeaders = [ 'Qty', 'Part', 'ID', 'Name', 'Size', 'Document' ]
+
+# rows added to the table before letting the UI breathe
+rowsPerStep = 200
 
 
 
@@ -180,85 +189,40 @@ class makeBOM:
         self.model = self.modelDoc.Model
         self.drawUI()
         self.UI.show()
-        self.BOM.clear()
-        self.PartsList = ''
-        self.listParts(self.model)
-        self.BOM.setPlainText(self.PartsList)
-
-
-    def listParts( self, obj, level=0 ):
-        indent = '\n'+'\t'*level
-        if obj.Document == self.modelDoc:
-            docName = ''
+        self.rows = []
+        # the rows are computed and shown a few at a time, the UI stays responsive.
+        # The walk itself isn't repeated for each instance of a linked part, bomEngine
+        # counts the links without entering them
+        self.rowIterator = bomEngine.bomRows( self.model )
+        self.loadRows()
+
+
+    # add the next rows to the table, and come back later for more
+    def loadRows(self):
+        if self.rowIterator is None:
+            return
+        newRows = list( itertools.islice( self.rowIterator, rowsPerStep ) )
+        if newRows:
+            first = len(self.rows)
+            self.rows.extend( newRows )
+            self.BOM.setRowCount( len(self.rows) )
+            for i, row in enumerate( newRows ):
+                for col, key in enumerate( tableColumns ):
+                    self.BOM.setItem( first+i, col, QtGui.QTableWidgetItem( str(row[key]) ) )
+            self.status.setText( 'Loading : '+str(len(self.rows))+' parts' )
+            QtCore.QTimer.singleShot( 0, self.loadRows )
         else:
-            docName = obj.Document.Name+'#'
-        #partBB = App.BoundBox()
-        # list the Variables
-        if obj.Name=='Variables':
-            #print(indent+'Variables:')
-            self.PartsList += indent+'Variables:'
-            for prop in obj.PropertiesList:
-                if obj.getGroupOfProperty(prop)=='Variables' :
-                    propValue = obj.getPropertyByName(prop)
-                    self.PartsList += indent+'\t'+prop+' = '+str(propValue)
-        # if it's part we look for sub-objects
-        elif obj.TypeId=='App::Part':
-            self.PartsList += indent +docName +obj.Label
-            for objname in obj.getSubObjects():
-                subobj = obj.Document.getObject( objname[0:-1] )
-                self.listParts( subobj, level+1 )
-        # if its a link, look for the linked object
-        elif obj.TypeId=='App::Link':
-            self.PartsList += indent+obj.Label+' -> '
-            self.listParts( obj.LinkedObject, level )
-        # if its a Body container we also add the document name and the size
-        elif obj.TypeId=='PartDesign::Body':
-            self.PartsList += indent +docName +obj.Label
-            if obj.Label2:
-                self.PartsList += ' ('+obj.Label2+')'
-            bb = obj.Shape.BoundBox
-            if abs(max(bb.XLength,bb.YLength,bb.ZLength)) < 1e+10:
-                Xsize = str(int((bb.XLength * 10)+0.099)/10)
-                Ysize = str(int((bb.YLength * 10)+0.099)/10)
-                Zsize = str(int((bb.ZLength * 10)+0.099)/10)
-                self.PartsList += ', Size: '+Xsize+' x '+Ysize+' x '+Zsize
-        # everything else except datum objects
-        elif obj.TypeId not in Asm4.datumTypes:
-            self.PartsList += indent+obj.Label
-            if obj.Label2:
-                self.PartsList += ' ('+obj.Label2+')'
-            else:
-                self.PartsList += ' ('+obj.TypeId+')'
-            # if the object has a shape, add it at the end of the line
-            if hasattr(obj,'Shape') and obj.Shape.BoundBox.isValid():
-                bb = obj.Shape.BoundBox
-                if max(bb.XLength,bb.YLength,bb.ZLength) < 1e+10:
-                    Xsize = str(int((bb.XLength * 10)+0.099)/10)
-                    Ysize = str(int((bb.YLength * 10)+0.099)/10)
-                    Zsize = str(int((bb.ZLength * 10)+0.099)/10)
-                    self.PartsList += ', Size: '+Xsize+' x '+Ysize+' x '+Zsize
-        return
+            self.rowIterator = None
+            total = sum( row['quantity'] for row in self.rows )
+            self.status.setText( str(len(self.rows))+' different parts, '+str(total)+' in total' )
 
 
     def onSave(self):
-        #pass
-        """Saves ASCII tree to user system file"""
-        _path = QtGui.QFileDialog.getSaveFileName()
-        if _path[0]:
-            save_file = QtCore.QFile(_path[0])
-            if save_file.open(QtCore.QFile.ReadWrite):
-                save_fileContent = QtCore.QTextStream(save_file)
-                save_fileContent << self.BOM
-                save_file.flush()
-                save_file.close()
-                self.BOM.setPlainText("Saved to file : " + _path[0])
-            else:
-                #FCC.PrintError("ERROR : Can't open file : "+ _path[0]+'\n')
-                self.BOM.setPlainText("ERROR : Can't open file : " + _path[0])
-        else:
-            self.BOM.setPlainText("ERROR : Can't open file : " + _path[0])
-        QtCore.QTimer.singleShot(3000, lambda:self.BOM.setPlainText(self.PartsList))
-        #self.UI.close()
+        fileName = QtGui.QFileDialog.getSaveFileName( self.UI, 'Save BOM', self.modelDoc.Name+'_BOM.csv', 'CSV (*.csv);;JSON (*.json)' )[0]
+        if fileName:
+            bomEngine.writeBom( self.rows, fileName )
+            bomEngine.saveCache( self.modelDoc )
+            self.status.setText( 'Saved to file : '+fileName )
 
 
     def isReal( bb ):
@@ -280,13 +244,16 @@ class makeBOM:
 
     def onCopy(self):
         """Copies Parts List to clipboard"""
-        self.BOM.selectAll()
-        self.BOM.copy()
-        self.BOM.setPlainText("Copied BoM to clipboard")
-        QtCore.QTimer.singleShot(3000, lambda:self.BOM.setPlainText(self.PartsList))
+        lines = [ '\t'.join( tableHeaders ) ]
+        for row in self.rows:
+            lines.append( '\t'.join( str(row[key]) for key in tableColumns ) )
+        QtGui.QApplication.clipboard().setText( '\n'.join( lines ) )
+        self.status.setText( "Copied BoM to clipboard" )
 
 
     def onOK(self):
+        # stop loading if it isn't finished
+        self.rowIterator = None
         self.UI.close()
 
 
@@ -304,21 +271,27 @@ class makeBOM:
         # set main window widgets layout
         self.mainLayout = QtGui.QVBoxLayout(self.UI)
 
-        # The list, is a plain text field
-        self.BOM = QtGui.QPlainTextEdit()
+        # The list, one row for each different part
+        self.BOM = QtGui.QTableWidget( 0, len(tableColumns) )
+        self.BOM.setHorizontalHeaderLabels( tableHeaders )
+        self.BOM.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.BOM.horizontalHeader().setStretchLastSection(True)
         self.BOM.setMinimumSize(600,500)
-        self.BOM.setLineWrapMode(QtGui.QPlainTextEdit.NoWrap)
         self.mainLayout.addWidget(self.BOM)
 
+        # the number of parts, or what has been done
+        self.status = QtGui.QLabel()
+        self.mainLayout.addWidget(self.status)
+
         # the button row definition
         self.buttonLayout = QtGui.QHBoxLayout()
         self.buttonLayout.addStretch()
-        # Save button
+        # Copy button
         self.CopyButton = QtGui.QPushButton('Copy')
         self.buttonLayout.addWidget(self.CopyButton)
         # Save button
-        #self.SaveButton = QtGui.QPushButton('Save')
-        #self.buttonLayout.addWidget(self.SaveButton)
+        self.SaveButton = QtGui.QPushButton('Save')
+        self.buttonLayout.addWidget(self.SaveButton)
         # OK button
         self.OkButton = QtGui.QPushButton('Close')
         self.OkButton.setDefault(True)
@@ -330,7 +303,7 @@ class makeBOM:
 
         # Actions
         self.CopyButton.clicked.connect(self.onCopy)
-        #self.SaveButton.clicked.connect(self.onSave)
+        self.SaveButton.clicked.connect(self.onSave)
         self.OkButton.clicked.connect(self.onOK)
 
 # add the command to the workbench
@@ -13,6 +13,7 @@ import FreeCAD as App
 import Part, Draft
 
 import libAsm4 as asm4
+import selectionCache
 
 
 
@@ -68,8 +69,8 @@ class newLinkArray():
         selectedObj = None
         # check that it's an Assembly4 'Model'
         if App.ActiveDocument.getObject('Model') and App.ActiveDocument.getObject('Model').TypeId=='App::Part':
-            if Gui.Selection.getSelection():
-                selection = Gui.Selection.getSelection()[0]
+            selection = selectionCache.snapshot().first
+            if selection:
                 # Only create arrays of links ...
                 if selection.TypeId == 'App::Link':
                     selectedObj = selection
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# massEngine.py
+#
+# mass, center of gravity and inertia of an Assembly4 Model, usable headless:
+#
+#   import massEngine
+#   props = massEngine.massProperties( App.ActiveDocument.Model )
+#   print( props['mass'], props['center'] )
+#
+# the volume, centroid and inertia of each unique solid are computed once,
+# in its own coordinate system and for a density of 1, and cached with the
+# stamp of its document. All the instances are then combined through their
+# placements in the assembly as arrays, so that moving a link only costs
+# the walk through the assembly and a few matrix products
+#
+# lengths are in mm, densities in kg/m^3, masses in kg and inertias in kg.mm^2
+
+
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+import Part
+
+import libAsm4 as Asm4
+import solverEngine
+import bomEngine
+
+# NumPy is shipped with FreeCAD, but the workbench still loads without it,
+# only the mass properties aren't available
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+# the containers walked into, bodies and other solids are instances
+walkTypes = [ 'App::Part', 'App::DocumentObjectGroup' ]
+
+# the properties holding a density, on a solid or on a part containing it
+# a number is in kg/m^3, a string or a quantity can have any density unit
+densityProperties = [ 'Density', 'PartDensity' ]
+
+# the density of the solids that don't have one
+defaultDensity = 1000.0
+
+# kg/m^3 * mm^3 = 1e-9 kg
+densityScale = 1e-9
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+# the density in kg/m^3 of value, None if it isn't a positive density
+def parseDensity( value ):
+    if value is None or value == '':
+        return None
+    try:
+        if isinstance( value, (int,float) ):
+            density = float( value )
+        else:
+            if isinstance( value, str ):
+                value = App.Units.Quantity( value )
+            if value.Unit == App.Units.Unit():
+                density = float( value.Value )
+            else:
+                density = float( value.getValueAs('kg/m^3') )
+    except Exception:
+        return None
+    if density > 0:
+        return density
+    return None
+
+
+# the density set on obj itself: a Density property, the Material map
+# of the Arch workbench, or the ShapeMaterial of recent FreeCAD versions
+def ownDensity( obj ):
+    for prop in densityProperties:
+        if hasattr(obj,prop):
+            density = parseDensity( getattr(obj,prop) )
+            if density:
+                return density
+    if hasattr(obj,'Material') and isinstance( obj.Material, dict ):
+        density = parseDensity( obj.Material.get('Density') )
+        if density:
+            return density
+    if hasattr(obj,'ShapeMaterial'):
+        try:
+            density = parseDensity( obj.ShapeMaterial.PhysicalProperties.get('Density') )
+        except Exception:
+            density = None
+        if density:
+            return density
+    return None
+
+
+# the density of a container met on the way to a solid, for a link
+# that of the link and else that of the linked part
+def containerDensity( obj ):
+    density = ownDensity( obj )
+    if density is None and obj.TypeId == 'App::Link':
+        linked = bomEngine.linkedObject( obj )
+        if linked is not None:
+            density = ownDensity( linked )
+    return density
+
+
+# ( x, y, z, w ) quaternions to rotation matrices, all at once
+def rotationMatrices( quaternions ):
+    x, y, z, w = quaternions.T
+    return np.stack( [ 1-2*(y*y+z*z),   2*(x*y-z*w),   2*(x*z+y*w),
+                         2*(x*y+z*w), 1-2*(x*x+z*z),   2*(y*z-x*w),
+                         2*(x*z-y*w),   2*(y*z+x*w), 1-2*(x*x+y*y) ], axis=-1 ).reshape( -1, 3, 3 )
+
+
+# the total mass, the center of gravity and the inertia about it of
+# masses at centers, each with its own inertias about its center
+def combine( masses, centers, inertias ):
+    mass = masses.sum()
+    if mass <= 0:
+        return ( 0.0, np.zeros(3), np.zeros((3,3)) )
+    center = ( masses[:,None] * centers ).sum(axis=0) / mass
+    d = centers - center
+    # parallel axis theorem: m * ( |d|^2 * E - d.dT )
+    inertia = inertias.sum(axis=0) \
+            + np.einsum( 'n,ni,ni->', masses, d, d ) * np.eye(3) \
+            - np.einsum( 'n,ni,nj->ij', masses, d, d )
+    return ( mass, center, inertia )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       the properties of each unique solid     |
+    +-----------------------------------------------+
+"""
+# docName -> { 'stamp'     : stamp of the document when the entry was made,
+#              'solids'    : { objName: ( volume, centroid, inertia ) or None },
+#              'densities' : { objName: density or None } }
+cache = {}
+
+
+# the valid cache entry of doc, taken once for each computation in entries
+def documentEntry( doc, entries ):
+    entry = entries.get( doc.Name )
+    if entry is None:
+        stamp = solverEngine.documentStamp( doc )
+        entry = cache.get( doc.Name )
+        if entry is None or stamp is None or entry['stamp'] != stamp:
+            entry = { 'stamp': stamp, 'solids': {}, 'densities': {} }
+            if stamp is not None:
+                cache[ doc.Name ] = entry
+        entries[ doc.Name ] = entry
+    return entry
+
+
+# ( volume, centroid, inertia ) of obj for a density of 1, in the coordinate
+# system of obj, None if it has no volume. The solids of a compound are combined
+def solidProperties( obj ):
+    try:
+        shape = Part.getShape( obj, transform=False )
+    except Exception:
+        return None
+    volumes  = []
+    centers  = []
+    inertias = []
+    for solid in shape.Solids:
+        volume = abs( solid.Volume )
+        if volume <= 0:
+            continue
+        c = solid.CenterOfMass
+        m = solid.MatrixOfInertia
+        volumes.append( volume )
+        centers.append( ( c.x, c.y, c.z ) )
+        inertias.append( ( ( m.A11, m.A12, m.A13 ), ( m.A21, m.A22, m.A23 ), ( m.A31, m.A32, m.A33 ) ) )
+    if not volumes:
+        return None
+    ( volume, center, inertia ) = combine( np.array(volumes), np.array(centers), np.array(inertias) )
+    return ( float(volume), tuple( center.tolist() ), tuple( map(tuple,inertia.tolist()) ) )
+
+
+def cachedProperties( obj, entries ):
+    entry = documentEntry( obj.Document, entries )
+    if obj.Name not in entry['solids']:
+        entry['solids'][obj.Name]    = solidProperties( obj )
+        entry['densities'][obj.Name] = ownDensity( obj )
+    return ( entry['solids'][obj.Name], entry['densities'][obj.Name] )
+
+
+
+"""
+    +-----------------------------------------------+
+    |        the instances in the assembly          |
+    +-----------------------------------------------+
+"""
+# the placements of the instances of a link to a solid, link arrays have several
+def linkPlacements( link, linked, placement ):
+    if bomEngine.linkCount( link ) > 1:
+        if hasattr(link,'ElementList') and link.ElementList:
+            elements = [ e.Placement for e in link.ElementList ]
+        else:
+            elements = list( link.PlacementList )
+        placements = [ placement.multiply(e) for e in elements ]
+    else:
+        placements = [ placement ]
+    if hasattr(link,'LinkTransform') and link.LinkTransform:
+        placements = [ p.multiply(linked.Placement) for p in placements ]
+    return placements
+
+
+# yields ( solid, placement, containers ) for each solid in the assembly,
+# placed directly in it or in a part, or linked. Hidden solids, like the
+# operands of a boolean, are construction geometry and not counted. The
+# containers are those met on the way to the solid, the nearest last
+def solidInstances( model ):
+    containers = []
+    for ( path, obj, placement ) in Asm4.walkAssembly( model, intoTypes=walkTypes, intoLinks=True ):
+        # the containers on the way to obj
+        del containers[ len(path)-1: ]
+        containers.append( obj )
+        if obj.TypeId == 'App::Link':
+            linked = bomEngine.linkedObject( obj )
+            if linked is not None and bomEngine.isPartObject( linked ):
+                for p in linkPlacements( obj, linked, placement ):
+                    yield ( linked, p, list(containers) )
+        elif bomEngine.isPartObject( obj ) and obj.Visibility:
+            yield ( obj, placement, containers[:-1] )
+
+
+
+"""
+    +-----------------------------------------------+
+    |        the mass properties of an assembly     |
+    +-----------------------------------------------+
+"""
+# returns a dict with the total 'mass', 'volume' and 'center' of gravity of
+# model, its 'inertia' tensor about the center in the axes of model, and the
+# 'principal' moments of inertia with their 'axes' as columns. 'parts' lists
+# each unique solid with its quantity, volume and total mass, and 'noDensity'
+# the labels of the solids for which the default density was used
+# returns None if NumPy isn't available
+def massProperties( model, density=defaultDensity ):
+    if np is None:
+        FCC.PrintWarning( 'The mass properties need NumPy, which is not installed\n' )
+        return None
+    entries = {}
+    keys = {}
+    uniques = []
+    index = []
+    densities = []
+    quaternions = []
+    positions = []
+    for ( solid, placement, containers ) in solidInstances( model ):
+        ( properties, solidDensity ) = cachedProperties( solid, entries )
+        if properties is None:
+            continue
+        key = bomEngine.objectKey( solid )
+        if key not in keys:
+            keys[key] = len( uniques )
+            uniques.append( ( solid, properties ) )
+        # the density of the solid, else that of the nearest container
+        for container in reversed( containers ):
+            if solidDensity:
+                break
+            solidDensity = containerDensity( container )
+        index.append( keys[key] )
+        densities.append( solidDensity or 0.0 )
+        quaternions.append( placement.Rotation.Q )
+        positions.append( tuple( placement.Base ) )
+
+    result = { 'mass': 0.0, 'volume': 0.0, 'center': (0.0,0.0,0.0),
+               'inertia': [ [0.0]*3 for i in range(3) ],
+               'principal': (0.0,0.0,0.0), 'axes': [ list(r) for r in np.eye(3) ],
+               'instances': len(index), 'parts': [], 'noDensity': [] }
+    if not index:
+        return result
+
+    index     = np.array( index )
+    densities = np.array( densities )
+    missing   = densities <= 0
+    densities[ missing ] = density
+    volumes   = np.array( [ p[0] for s, p in uniques ] )[ index ]
+    centroids = np.array( [ p[1] for s, p in uniques ] )[ index ]
+    inertias  = np.array( [ p[2] for s, p in uniques ] )[ index ]
+    # all the instances in the coordinate system of model
+    R = rotationMatrices( np.array( quaternions ) )
+    centers  = np.einsum( 'nij,nj->ni', R, centroids ) + np.array( positions )
+    masses   = densities * volumes * densityScale
+    inertias = ( densities * densityScale )[:,None,None] * np.einsum( 'nij,njk,nlk->nil', R, inertias, R )
+    ( mass, center, inertia ) = combine( masses, centers, inertias )
+    ( principal, axes ) = np.linalg.eigh( inertia )
+
+    quantities = np.bincount( index, minlength=len(uniques) )
+    partMasses = np.bincount( index, weights=masses, minlength=len(uniques) )
+    noDensity  = set( index[ missing ] )
+    for i, ( solid, properties ) in enumerate( uniques ):
+        result['parts'].append( { 'label'    : solid.Label,
+                                  'document' : solid.Document.Name,
+                                  'object'   : solid.Name,
+                                  'quantity' : int( quantities[i] ),
+                                  'volume'   : properties[0],
+                                  'mass'     : float( partMasses[i] ) } )
+        if i in noDensity:
+            result['noDensity'].append( solid.Label )
+    result.update( { 'mass'      : float( mass ),
+                     'volume'    : float( volumes.sum() ),
+                     'center'    : tuple( float(x) for x in center ),
+                     'inertia'   : inertia.tolist(),
+                     'principal' : tuple( float(x) for x in principal ),
+                     'axes'      : axes.tolist() } )
+    return result
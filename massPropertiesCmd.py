@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# massPropertiesCmd.py
+#
+# shows the mass, center of gravity and inertia of the assembly computed by massEngine
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import massEngine
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class massPropertiesCmd():
+    def __init__(self):
+        super(massPropertiesCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Mass Properties",
+                "ToolTip": "Compute the mass, center of gravity and inertia of the assembly\n"+ \
+                           "with the Density of the parts, or their material",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_Body.svg')
+                }
+
+    def IsActive(self):
+        # the computation needs NumPy
+        if massEngine.np is not None and Asm4.checkModel():
+            return True
+        return False
+
+    def Activated(self):
+        Gui.Control.showDialog( massPropertiesUI() )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class massPropertiesUI():
+
+    def __init__(self):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Asm4_Body.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Mass Properties')
+        self.model = App.ActiveDocument.Model
+        self.drawUI()
+        self.onCompute()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Close)
+
+    def reject(self):
+        self.finish()
+
+
+    def onCompute(self):
+        props = massEngine.massProperties( self.model )
+        if props is None:
+            self.warning.setText( 'The mass properties need NumPy, which is not installed' )
+            return
+        self.massValue.setText( '{:.6g} kg'.format( props['mass'] ) )
+        self.volumeValue.setText( '{:.6g} mm^3'.format( props['volume'] ) )
+        self.centerValue.setText( '( {:.3f}, {:.3f}, {:.3f} ) mm'.format( *props['center'] ) )
+        self.principalValue.setText( '{:.6g}, {:.6g}, {:.6g}'.format( *props['principal'] ) )
+        for i in range(3):
+            for j in range(3):
+                self.inertiaTable.setItem( i, j, QtGui.QTableWidgetItem( '{:.6g}'.format( props['inertia'][i][j] ) ) )
+        self.partsTable.clearContents()
+        self.partsTable.setRowCount( len(props['parts']) )
+        for row, part in enumerate( props['parts'] ):
+            self.partsTable.setItem( row, 0, QtGui.QTableWidgetItem( part['label'] ) )
+            self.partsTable.setItem( row, 1, QtGui.QTableWidgetItem( str(part['quantity']) ) )
+            self.partsTable.setItem( row, 2, QtGui.QTableWidgetItem( '{:.6g}'.format( part['mass'] ) ) )
+            self.partsTable.setItem( row, 3, QtGui.QTableWidgetItem( part['document'] ) )
+        if props['noDensity']:
+            self.warning.setText( 'No density for '+', '.join( props['noDensity'] ) \
+                                  +'\nthe default of '+str(massEngine.defaultDensity)+' kg/m^3 was used' )
+        else:
+            self.warning.setText( '' )
+        FCC.PrintMessage( 'Mass of '+self.model.Document.Name+': '+self.massValue.text() \
+                          +' at '+self.centerValue.text()+'\n' )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        self.formLayout = QtGui.QFormLayout()
+        self.massValue = QtGui.QLabel()
+        self.formLayout.addRow(QtGui.QLabel('Mass :'),self.massValue)
+        self.volumeValue = QtGui.QLabel()
+        self.formLayout.addRow(QtGui.QLabel('Volume :'),self.volumeValue)
+        self.centerValue = QtGui.QLabel()
+        self.formLayout.addRow(QtGui.QLabel('Center of gravity :'),self.centerValue)
+        self.principalValue = QtGui.QLabel()
+        self.formLayout.addRow(QtGui.QLabel('Principal moments :'),self.principalValue)
+        self.mainLayout.addLayout(self.formLayout)
+
+        # the inertia tensor at the center of gravity, in kg.mm^2
+        self.mainLayout.addWidget(QtGui.QLabel('Inertia at the center of gravity (kg.mm^2) :'))
+        self.inertiaTable = QtGui.QTableWidget( 3, 3 )
+        self.inertiaTable.setHorizontalHeaderLabels( [ 'X', 'Y', 'Z' ] )
+        self.inertiaTable.setVerticalHeaderLabels( [ 'X', 'Y', 'Z' ] )
+        self.inertiaTable.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.inertiaTable.horizontalHeader().setStretchLastSection(True)
+        self.inertiaTable.setMaximumHeight(120)
+        self.mainLayout.addWidget(self.inertiaTable)
+
+        self.partsTable = QtGui.QTableWidget( 0, 4 )
+        self.partsTable.setHorizontalHeaderLabels( [ 'Part', 'Qty', 'Mass (kg)', 'Document' ] )
+        self.partsTable.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.partsTable.horizontalHeader().setStretchLastSection(True)
+        self.partsTable.setMinimumHeight(200)
+        self.mainLayout.addWidget(self.partsTable)
+
+        self.warning = QtGui.QLabel()
+        self.warning.setWordWrap(True)
+        self.mainLayout.addWidget(self.warning)
+
+        self.buttonsLayout = QtGui.QHBoxLayout()
+        self.ComputeButton = QtGui.QPushButton('Compute again')
+        self.buttonsLayout.addWidget(self.ComputeButton)
+        self.buttonsLayout.addStretch()
+        self.mainLayout.addLayout(self.buttonsLayout)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.ComputeButton.clicked.connect( self.onCompute )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_massProperties', massPropertiesCmd() )
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# modelIndex.py
+#
+# indexes of the open documents, kept up to date by a document observer,
+# so that the commands don't have to scan all the objects every time
+
+
+
+import FreeCAD as App
+
+# libAsm4 imports this module too, its functions are only used at run time
+import libAsm4 as Asm4
+import expressionParser as Parser
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+# the properties defining what an object is attached to
+attachmentProperties = ( 'ExpressionEngine', 'AttachedTo', 'AttachedBy', 'LinkedObject' )
+
+
+# the properties changing what a link or a container is
+typeProperties = ( 'LinkedObject', 'Group' )
+
+
+def objectKey( obj ):
+    return ( obj.Document.Name, obj.Name )
+
+
+# the document of the object that a link in doc points to
+def linkedDocName( doc, linkName ):
+    link = doc.getObject( linkName )
+    if link and hasattr(link,'LinkedObject') and link.LinkedObject and link.LinkedObject.Document:
+        return link.LinkedObject.Document.Name
+    return None
+
+
+# the (docName, objName) of the object a link points to, None if it isn't a link
+def linkedKey( obj ):
+    if not hasattr(obj,'LinkedObject') or not obj.LinkedObject:
+        return None
+    linked = obj.LinkedObject
+    # a link to a sub-object is ( object, subName )
+    if isinstance( linked, tuple ):
+        linked = linked[0]
+    if not hasattr(linked,'Document') or not linked.Document:
+        return None
+    return objectKey( linked )
+
+
+# the (docName, objName) of the objects whose Placement is used to place obj:
+# the terms of its Placement expression and its Assembly4 properties
+def attachmentTargets( obj ):
+    targets = set()
+    doc = obj.Document
+    for expr in obj.ExpressionEngine:
+        if expr[0] == 'Placement':
+            parsed = Parser.parseExpression( expr[1] )
+            if parsed:
+                # the sub-links between the first link and the LCS aren't in doc
+                for term in parsed.before[0:1] + parsed.before[1:][-1:] + parsed.after:
+                    targets.add( ( term.doc or doc.Name, term.path[-1] ) )
+    if hasattr(obj,'AttachedTo') and obj.AttachedTo:
+        ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+        if attLink == 'Parent Assembly':
+            targets.add( ( doc.Name, attLCS ) )
+        elif attLink and attLCS:
+            targets.add( ( doc.Name, attLink ) )
+            targets.add( ( linkedDocName( doc, attLink ) or doc.Name, attLCS ) )
+    if hasattr(obj,'AttachedBy') and obj.AttachedBy.startswith('#'):
+        targets.add( ( linkedDocName( doc, obj.Name ) or doc.Name, obj.AttachedBy[1:] ) )
+    targets.discard( objectKey(obj) )
+    return targets
+
+
+# all datums in a container, also those in its sub-groups
+def findPartLCS( part ):
+    partLCS = [ ]
+    # parse all objects in the part (they return strings)
+    for objName in part.getSubObjects(1):
+        # get the proper objects
+        # all object names end with a "." , this needs to be removed
+        obj = part.getObject( objName[0:-1] )
+        if obj.TypeId in Asm4.datumTypes:
+            partLCS.append( obj )
+        elif obj.TypeId == 'App::DocumentObjectGroup':
+            partLCS.extend( findPartLCS(obj) )
+    return partLCS
+
+
+
+# the objects in an Assembly4 Model, in sets for fast membership tests
+class ModelContents():
+
+    def __init__( self, model ):
+        # names of the links to parts and bodies
+        self.links = set()
+        # names of the parts and bodies
+        self.containers = set()
+        # names of the datums
+        self.datums = set()
+        # objName -> name of the Model or group holding it
+        self.parents = {}
+        doc = model.Document
+        for objStr in model.getSubObjects():
+            # the string ends with a . that must be removed
+            obj = doc.getObject( objStr[0:-1] )
+            if obj:
+                self.addChild( obj, model )
+
+    def addChild( self, obj, parent ):
+        self.parents[ obj.Name ] = parent.Name
+        if Asm4.isLinkToPart( obj ):
+            self.links.add( obj.Name )
+        elif obj.TypeId in Asm4.containerTypes:
+            self.containers.add( obj.Name )
+        elif obj.TypeId in Asm4.datumTypes:
+            self.datums.add( obj.Name )
+        elif obj.TypeId == 'App::DocumentObjectGroup':
+            # some people like to put their objects in groups
+            for child in obj.Group:
+                self.addChild( child, obj )
+
+
+
+# the numbers used after a prefix in the names of the objects of a document,
+# to find a free name without probing the document for each number
+class PrefixNumbers():
+
+    def __init__( self, doc, prefix ):
+        self.prefix = prefix
+        self.used = set()
+        # start -> the lowest number that might be free from there
+        self.free = {}
+        for obj in doc.Objects:
+            self.add( obj.Name )
+
+    # the number after the prefix, None if the name doesn't have this form
+    def number( self, name ):
+        if name.startswith( self.prefix ):
+            digits = name[ len(self.prefix): ]
+            if digits.isdigit() and str(int(digits)) == digits:
+                return int(digits)
+        return None
+
+    def add( self, name ):
+        num = self.number( name )
+        if num is not None:
+            self.used.add( num )
+
+    def remove( self, name ):
+        num = self.number( name )
+        if num is not None:
+            self.used.discard( num )
+            for start, hint in self.free.items():
+                if start <= num < hint:
+                    self.free[start] = num
+
+    # the lowest free number from start, marked as used once the object is created
+    def allocate( self, start ):
+        num = max( start, self.free.get( start, start ) )
+        while num in self.used:
+            num += 1
+        self.free[start] = num
+        return num
+
+
+
+"""
+    +-----------------------------------------------+
+    |      the indexes, and the observer feeding    |
+    +-----------------------------------------------+
+"""
+class ModelIndex():
+
+    def __init__( self ):
+        self.reset()
+
+    def reset( self ):
+        # (docName, objName) -> set of (docName, objName) attached to it
+        self.dependents = {}
+        # (docName, objName) -> the targets it was indexed with
+        self.targets = {}
+        # docName -> { containerName: list of datums }, filled when asked for
+        self.datums = {}
+        # docName -> ModelContents of its Model, filled when asked for
+        self.models = {}
+        # (docName, objName) -> set of (docName, linkName) of the links to it
+        self.instances = {}
+        # (docName, linkName) -> the linked object it was indexed with
+        self.linked = {}
+        # docName -> { prefix: PrefixNumbers }, seeded when first asked for
+        self.names = {}
+        for doc in App.listDocuments().values():
+            self.indexDocument( doc )
+
+
+    def indexDocument( self, doc ):
+        for obj in doc.Objects:
+            self.indexObject( obj )
+
+
+    def indexObject( self, obj ):
+        key = objectKey( obj )
+        self.unindexObject( key )
+        targets = attachmentTargets( obj )
+        if targets:
+            self.targets[key] = targets
+            for target in targets:
+                self.dependents.setdefault( target, set() ).add( key )
+        linked = linkedKey( obj )
+        if linked:
+            self.linked[key] = linked
+            self.instances.setdefault( linked, set() ).add( key )
+
+
+    def unindexObject( self, key ):
+        for target in self.targets.pop( key, () ):
+            users = self.dependents.get( target )
+            if users:
+                users.discard( key )
+                if not users:
+                    del self.dependents[target]
+        linked = self.linked.pop( key, None )
+        if linked:
+            links = self.instances.get( linked )
+            if links:
+                links.discard( key )
+                if not links:
+                    del self.instances[linked]
+
+
+    def unindexDocument( self, docName ):
+        keys = set( k for k in self.targets if k[0] == docName )
+        keys.update( k for k in self.linked if k[0] == docName )
+        for key in keys:
+            self.unindexObject( key )
+
+
+    # the (docName, objName) of the objects attached to the given object
+    def whereAttached( self, docName, objName ):
+        return self.dependents.get( ( docName, objName ), set() )
+
+
+    # the (docName, linkName) of the links pointing to the given object
+    def findLinks( self, docName, objName ):
+        return self.instances.get( ( docName, objName ), set() )
+
+
+    # the datums of a container, a copy of the cached list
+    def getPartLCS( self, part ):
+        docDatums = self.datums.setdefault( part.Document.Name, {} )
+        partLCS = docDatums.get( part.Name )
+        if partLCS is None:
+            partLCS = findPartLCS( part )
+            docDatums[ part.Name ] = partLCS
+        return list( partLCS )
+
+
+    # the contents of the Model of doc, None if there is no Model
+    def getModelContents( self, doc ):
+        contents = self.models.get( doc.Name )
+        if contents is None:
+            model = doc.getObject('Model')
+            if not model or model.TypeId != 'App::Part':
+                return None
+            contents = ModelContents( model )
+            self.models[ doc.Name ] = contents
+        return contents
+
+
+    # the first free name prefix+N in doc with N >= start
+    def nextName( self, doc, prefix, start ):
+        prefixes = self.names.setdefault( doc.Name, {} )
+        numbers = prefixes.get( prefix )
+        if numbers is None:
+            numbers = PrefixNumbers( doc, prefix )
+            prefixes[prefix] = numbers
+        return prefix+str( numbers.allocate(start) )
+
+
+    # the contents of doc changed, they will be indexed again when asked for
+    def resetDocument( self, docName ):
+        self.datums.pop( docName, None )
+        self.models.pop( docName, None )
+
+
+    # document observer
+    def slotCreatedObject( self, obj ):
+        self.indexObject( obj )
+        self.resetDocument( obj.Document.Name )
+        for numbers in self.names.get( obj.Document.Name, {} ).values():
+            numbers.add( obj.Name )
+
+    def slotDeletedObject( self, obj ):
+        self.unindexObject( objectKey(obj) )
+        self.resetDocument( obj.Document.Name )
+        for numbers in self.names.get( obj.Document.Name, {} ).values():
+            numbers.remove( obj.Name )
+
+    def slotChangedObject( self, obj, prop ):
+        if not hasattr(obj,'Document') or not obj.Document:
+            return
+        if prop in attachmentProperties:
+            self.indexObject( obj )
+        if prop in typeProperties:
+            self.resetDocument( obj.Document.Name )
+
+    def slotFinishRestoreDocument( self, doc ):
+        self.indexDocument( doc )
+        self.resetDocument( doc.Name )
+        self.names.pop( doc.Name, None )
+
+    def slotDeletedDocument( self, doc ):
+        self.unindexDocument( doc.Name )
+        self.resetDocument( doc.Name )
+        self.names.pop( doc.Name, None )
+
+
+
+# the index shared by all commands, None if it isn't started
+index = None
+
+
+def startIndex():
+    global index
+    if index is None:
+        index = ModelIndex()
+        App.addDocumentObserver( index )
+    return index
+
+
+def stopIndex():
+    global index
+    if index is not None:
+        App.removeDocumentObserver( index )
+        index = None
+
+
+# the objects attached to obj, as a sorted list of (docName, objName)
+def whereAttached( obj ):
+    # without the observer, build a temporary index
+    current = index if index is not None else ModelIndex()
+    return sorted( current.whereAttached( obj.Document.Name, obj.Name ) )
+
+
+# the datums of a container, from the index if it's running
+def getPartLCS( part ):
+    if index is not None:
+        return index.getPartLCS( part )
+    return findPartLCS( part )
+
+
+# the contents of the Model of doc, from the index if it's running
+def getModelContents( doc ):
+    if index is not None:
+        return index.getModelContents( doc )
+    model = doc.getObject('Model')
+    if model and model.TypeId == 'App::Part':
+        return ModelContents( model )
+    return None
+
+
+# the links pointing to obj, in all open documents or only in doc. They're
+# sorted by document name, and in each document in the order of its objects
+# (their ID grows as they're created), as a scan of doc.Objects finds them
+def findLinks( obj, doc=None ):
+    if index is None:
+        docs = [ doc ] if doc else [ d for n, d in sorted( App.listDocuments().items() ) ]
+        return [ o for d in docs for o in d.Objects if linkedKey(o) == objectKey(obj) ]
+    links = []
+    for ( docName, linkName ) in index.findLinks( obj.Document.Name, obj.Name ):
+        if doc and docName != doc.Name:
+            continue
+        linkDoc = App.listDocuments().get( docName )
+        link = linkDoc.getObject( linkName ) if linkDoc else None
+        if link:
+            links.append( link )
+    links.sort( key=lambda link: ( link.Document.Name, link.ID ) )
+    return links
+
+
+# the first free object name prefix+N in doc with N >= start
+def nextName( doc, prefix, start=1 ):
+    if index is not None:
+        return index.nextName( doc, prefix, start )
+    num = start
+    while doc.getObject( prefix+str(num) ):
+        num += 1
+    return prefix+str(num)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# nativeSolver.py
+#
+# evaluates the Assembly4 attachment chains directly, without the ExpressionEngine
+#
+# An Asm4 link placed by the ExpressionEngine has the expression:
+#   ParentLink.Placement * ParentDoc#LCS.Placement * AttachmentOffset * LinkedDoc#LCS.Placement ^ -1
+# In 'Native' mode, the same chain is stored in the AttachedTo, AttachedBy
+# and AttachmentOffset properties only, and all the chains of a document are
+# evaluated together as batches of 4x4 matrix products
+
+
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+
+# NumPy is shipped with FreeCAD, but we still work without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+# the value of the SolverMode property for natively solved objects
+NATIVE = 'Native'
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+def isNative( obj ):
+    if obj and hasattr(obj,'SolverMode') and obj.SolverMode == NATIVE:
+        return True
+    return False
+
+
+# the attachment chain of an object as ( parentLink, targetLCS, sourceLCS )
+# parentLink is None when attached to the parent assembly, sourceLCS is None
+# when the object is attached by its origin (fasteners, datums)
+def getChain( obj ):
+    doc = obj.Document
+    if not hasattr(obj,'AttachedTo') or not obj.AttachedTo:
+        return None
+    ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+    if attLink == 'Parent Assembly':
+        parentLink = None
+        targetLCS  = doc.getObject( attLCS )
+    else:
+        parentLink = doc.getObject( attLink )
+        if not parentLink or not hasattr(parentLink,'LinkedObject') or not parentLink.LinkedObject:
+            return None
+        targetLCS  = parentLink.LinkedObject.Document.getObject( attLCS )
+    if not targetLCS:
+        return None
+    sourceLCS = None
+    if obj.AttachedBy and obj.AttachedBy != 'Origin':
+        if not hasattr(obj,'LinkedObject') or not obj.LinkedObject:
+            return None
+        sourceLCS = obj.LinkedObject.Document.getObject( obj.AttachedBy.lstrip('#') )
+        if not sourceLCS:
+            return None
+    return ( parentLink, targetLCS, sourceLCS )
+
+
+# same result as the ExpressionEngine, one object at a time
+def evaluateChain( obj, chain ):
+    ( parentLink, targetLCS, sourceLCS ) = chain
+    placement = targetLCS.Placement.multiply( obj.AttachmentOffset )
+    if parentLink:
+        placement = parentLink.Placement.multiply( placement )
+    if sourceLCS:
+        placement = placement.multiply( sourceLCS.Placement.inverse() )
+    return placement
+
+
+
+"""
+    +-----------------------------------------------+
+    |    conversion between the ExpressionEngine    |
+    |           and the native solver mode          |
+    +-----------------------------------------------+
+"""
+# fills AttachedTo and AttachedBy from the Placement expression (older
+# documents may not have them), and releases the ExpressionEngine
+def convertToNative( obj ):
+    if isNative( obj ):
+        return True
+    expr = Asm4.placementEE( obj.ExpressionEngine )
+    Asm4.makeAsmProperties( obj )
+    # decode the expression into the structured form
+    if expr:
+        if obj.TypeId == 'App::Link':
+            ( attParent, separator, attLCS ) = obj.AttachedTo.partition('#')
+            ( attLink, attLCS, linkLCS ) = Asm4.splitExpressionLink( expr, attParent )
+            if attLCS != 'None' and linkLCS != 'None':
+                obj.AttachedTo = attLink+'#'+attLCS
+                obj.AttachedBy = '#'+linkLCS
+        else:
+            ( attLink, attPart, attLCS ) = Asm4.splitExpressionDatum( expr )
+            if attLCS != 'None':
+                obj.AttachedTo = attLink+'#'+attLCS
+                obj.AttachedBy = 'Origin'
+    if not getChain( obj ):
+        FCC.PrintWarning( 'Cannot convert '+Asm4.nameLabel(obj)+' to the native solver\n' )
+        return False
+    if not hasattr(obj,'SolverMode'):
+        obj.addProperty( 'App::PropertyString', 'SolverMode', 'Assembly' )
+    obj.AssemblyType = 'Asm4EE'
+    obj.SolverMode = NATIVE
+    obj.setExpression( 'Placement', None )
+    return True
+
+
+# rebuilds the Placement expression from the structured form
+def convertToExpression( obj ):
+    if not isNative( obj ):
+        return True
+    chain = getChain( obj )
+    if not chain:
+        return False
+    ( parentLink, targetLCS, sourceLCS ) = chain
+    ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+    attDoc = None
+    if parentLink:
+        attDoc = parentLink.LinkedObject.Document.Name
+    if sourceLCS:
+        expr = Asm4.makeExpressionPart( attLink, attDoc, attLCS, sourceLCS.Document.Name, sourceLCS.Name )
+    else:
+        expr = Asm4.makeExpressionDatum( attLink, attDoc, attLCS )
+    obj.SolverMode = ''
+    obj.setExpression( 'Placement', expr )
+    return True
+
+
+
+"""
+    +-----------------------------------------------+
+    |         batched evaluation with NumPy         |
+    +-----------------------------------------------+
+"""
+# stacks a list of App.Placement into an array of 4x4 matrices
+def placementsToArray( placements ):
+    n = len(placements)
+    q = np.array( [ pl.Rotation.Q   for pl in placements ], dtype=float ).reshape(n,4)
+    t = np.array( [ tuple(pl.Base)  for pl in placements ], dtype=float ).reshape(n,3)
+    x, y, z, w = q[:,0], q[:,1], q[:,2], q[:,3]
+    m = np.zeros( (n,4,4) )
+    m[:,0,0] = 1 - 2*(y*y + z*z)
+    m[:,0,1] = 2*(x*y - z*w)
+    m[:,0,2] = 2*(x*z + y*w)
+    m[:,1,0] = 2*(x*y + z*w)
+    m[:,1,1] = 1 - 2*(x*x + z*z)
+    m[:,1,2] = 2*(y*z - x*w)
+    m[:,2,0] = 2*(x*z - y*w)
+    m[:,2,1] = 2*(y*z + x*w)
+    m[:,2,2] = 1 - 2*(x*x + y*y)
+    m[:,0:3,3] = t
+    m[:,3,3] = 1.0
+    return m
+
+
+# inverse of an array of rigid transforms
+def invertRigid( m ):
+    inv = np.zeros_like( m )
+    rt = np.transpose( m[:,0:3,0:3], (0,2,1) )
+    inv[:,0:3,0:3] = rt
+    inv[:,0:3,3] = -np.einsum( 'nij,nj->ni', rt, m[:,0:3,3] )
+    inv[:,3,3] = 1.0
+    return inv
+
+
+def matrixToPlacement( m ):
+    return App.Placement( App.Matrix( *[ float(v) for v in m.flatten() ] ) )
+
+
+# evaluates a batch of chains that don't depend on each other
+# solved: objName -> 4x4 matrix of the objects of the same document solved before
+def evaluateBatch( objs, chains, solved ):
+    identity = App.Placement()
+    parents, targets, offsets, sources = [], [], [], []
+    for obj, chain in zip( objs, chains ):
+        ( parentLink, targetLCS, sourceLCS ) = chain
+        if parentLink and parentLink.Name in solved:
+            parents.append( None )
+        else:
+            parents.append( parentLink.Placement if parentLink else identity )
+        targets.append( targetLCS.Placement )
+        offsets.append( obj.AttachmentOffset )
+        sources.append( sourceLCS.Placement if sourceLCS else identity )
+    # parents solved in a previous batch are taken from their result
+    P = placementsToArray( [ p if p is not None else identity for p in parents ] )
+    for i, p in enumerate( parents ):
+        if p is None:
+            P[i] = solved[ chains[i][0].Name ]
+    T = placementsToArray( targets )
+    O = placementsToArray( offsets )
+    S = invertRigid( placementsToArray( sources ) )
+    return np.matmul( np.matmul( np.matmul( P, T ), O ), S )
+
+
+# solves the native objects given in topological levels: objects in a level
+# only depend on objects of previous levels, so each level is one batch
+# returns the number of modified Placements
+def solveLevels( levels ):
+    solved = {}
+    changed = 0
+    for level in levels:
+        objs, chains = [], []
+        for obj in level:
+            chain = getChain( obj )
+            if chain:
+                objs.append( obj )
+                chains.append( chain )
+            else:
+                FCC.PrintWarning( 'Broken attachment for '+Asm4.nameLabel(obj)+'\n' )
+        if not objs:
+            continue
+        if np is not None:
+            results = evaluateBatch( objs, chains, solved )
+            for obj, m in zip( objs, results ):
+                solved[obj.Name] = m
+                if setPlacement( obj, matrixToPlacement(m) ):
+                    changed += 1
+        else:
+            for obj, chain in zip( objs, chains ):
+                if setPlacement( obj, evaluateChain(obj, chain) ):
+                    changed += 1
+    return changed
+
+
+# only write the Placement if it changed, to avoid touching the document
+def setPlacement( obj, placement ):
+    old = obj.Placement
+    if (old.Base - placement.Base).Length < 1e-9 and old.Rotation.isSame( placement.Rotation ):
+        return False
+    obj.Placement = placement
+    return True
+
+
+# solves the given native objects of a document, in dependency order
+def solveObjects( objs ):
+    objs = [ o for o in objs if isNative(o) ]
+    if not objs:
+        return 0
+    # objects depending on another object of this batch go in a later level
+    names = set( [ o.Name for o in objs ] )
+    level = {}
+    def depth( obj ):
+        if obj.Name not in level:
+            level[obj.Name] = 0
+            chain = getChain( obj )
+            if chain and chain[0] and chain[0].Name in names:
+                level[obj.Name] = depth( chain[0] ) + 1
+        return level[obj.Name]
+    for obj in objs:
+        depth( obj )
+    levels = [ [] for i in range( max(level.values())+1 ) ]
+    for obj in objs:
+        levels[ level[obj.Name] ].append( obj )
+    return solveLevels( levels )
+
+
+# solves all native objects of a document
+def solveDocument( doc=None ):
+    if doc is None:
+        doc = App.ActiveDocument
+    if not doc:
+        return 0
+    return solveObjects( [ o for o in doc.Objects if isNative(o) ] )
@@ -16,6 +16,7 @@ import FreeCAD as App
 import Part
 
 import libAsm4 as Asm4
+import selectionCache
 
 
 
@@ -83,8 +84,8 @@ class newDatum:
 
     def checkSelection(self):
         # if something is selected ...
-        if Gui.Selection.getSelection():
-            selectedObj = Gui.Selection.getSelection()[0]
+        selectedObj = selectionCache.snapshot().first
+        if selectedObj:
             # ... and it's an App::Part or an datum object
             if selectedObj.TypeId in self.containers or selectedObj.TypeId in Asm4.datumTypes:
                 return(selectedObj)
@@ -168,18 +169,22 @@ class newHole:
             return True
 
     def getSelectedEdge(self):
+        # decoded once for each selection
+        return selectionCache.fact( 'circularEdge', self.findSelectedEdge )
+
+    def findSelectedEdge(self):
         # check that we have selected a circular edge
         selection = None
         if App.ActiveDocument:
             # 1 thing is selected:
-            if len(Gui.Selection.getSelection()) == 1: 
+            if selectionCache.snapshot().single: 
                 # check whether it's a circular edge:
                 edge = Gui.Selection.getSelectionEx()[0]
                 if len(edge.SubObjects) == 1:
                     # if the edge is circular
                     if Asm4.isCircle(edge.SubObjects[0]):
                         # find the feature on which the edge is located
-                        parentObj = Gui.Selection.getSelection()[0]
+                        parentObj = selectionCache.snapshot().single
                         edgeName = edge.SubElementNames[0]
                         # selection = ( parentObj, edgeName )
                         selection = ( parentObj, edge )
@@ -197,10 +202,8 @@ class newHole:
         # if the solid having the edge is indeed in an App::Part
         if parentPart and (parentPart.TypeId=='App::Part' or parentPart.TypeId=='PartDesign::Body'):
             # check whether there is already a similar datum, and increment the instance number 
-            instanceNum = 1
-            while App.ActiveDocument.getObject( 'HoleAxis_'+str(instanceNum) ):
-                instanceNum += 1
-            axis = parentPart.newObject('PartDesign::Line','HoleAxis_'+str(instanceNum))
+            axisName = Asm4.nextInstance( 'HoleAxis', startAtOne=True )
+            axis = parentPart.newObject('PartDesign::Line',axisName)
             axis.Support = [( selectedObj, (edgeName,) )]
             axis.MapMode = 'AxisOfCurvature'
             axis.MapReversed = False
@@ -211,7 +214,7 @@ class newHole:
             '''
             pt1    = App.Vector(0,0,diam/2.)
             pt2    = App.Vector(0,0,-diam/2.)
-            axis   = parentPart.newObject('Part::FeaturePython', 'HoleAxis_'+str(instanceNum))
+            axis   = parentPart.newObject('Part::FeaturePython', axisName)
             axis.ViewObject.Proxy = Asm4.setCustomIcon(axis,'Asm4_Hole.svg')
             axis.Shape = Part.Wire(Part.makeLine(pt1,pt2))
             axis.Placement = circle.Placement
@@ -12,6 +12,9 @@ import FreeCAD as App
 from FreeCAD import Console as FCC
 
 import libAsm4 as Asm4
+import nativeSolver
+import solverEngine
+import recomputeProfiler as Profiler
 
 
 
@@ -196,6 +199,9 @@ class placeLinkUI():
         old_linkLCS = ''
         # if the decode is unsuccessful, old_Expression is set to False and the other things are set to 'None'
         ( old_Parent, old_attLCS, old_linkLCS ) = Asm4.splitExpressionLink( self.old_EE, self.old_Parent )
+        # in native solver mode there is no expression, the attachment is in the properties
+        if nativeSolver.isNative(self.selectedLink):
+            ( old_Parent, old_attLCS, old_linkLCS ) = ( self.old_Parent, self.old_parentLCS, self.old_linkLCS )
 
         # find the old LCS in the list of LCS of the linked part...
         # MatchExactly, MatchContains, MatchEndsWith ...
@@ -279,6 +285,7 @@ class placeLinkUI():
             self.selectedLink.AttachmentOffset = self.old_AO
         if self.old_EE:
             self.selectedLink.setExpression( 'Placement', self.old_EE )
+        nativeSolver.solveObjects([self.selectedLink])
         self.selectedLink.recompute()
         # highlight in the 3D window the object we placed
         self.finish()
@@ -318,6 +325,11 @@ class placeLinkUI():
     +-----------------------------------------------+
     """
     def Apply( self ):
+        with Profiler.section('placeLink'):
+            return self.applyAttachment()
+
+
+    def applyAttachment( self ):
         # get the instance to attach to:
         # it's either the top level assembly or a sister App::Link
         if self.parentList.currentText() == 'Parent Assembly':
@@ -352,6 +364,16 @@ class placeLinkUI():
         # check that all of them have something in
         # constrName has been checked at the beginning
         if a_Link and a_LCS and l_Part and l_LCS :
+            # refuse to attach the link to something that is attached to it
+            if a_Link == 'Parent Assembly':
+                parentName = a_LCS
+            else:
+                parentName = a_Link
+            graph = solverEngine.getGraph( self.activeDoc )
+            if graph.createsCycle( self.selectedLink.Name, [parentName] ):
+                Asm4.warningBox( 'Can\'t attach '+Asm4.nameLabel(self.selectedLink)+' to '+parentName+\
+                                 ' because '+parentName+' is already attached to it' )
+                return False
             # this is where all the magic is, see:
             # 
             # https://forum.freecadweb.org/viewtopic.php?p=278124#p278124
@@ -368,11 +390,15 @@ class placeLinkUI():
             self.selectedLink.AssemblyType = 'Asm4EE'
             self.selectedLink.AttachedBy = '#'+l_LCS
             self.selectedLink.AttachedTo = a_Link+'#'+a_LCS
-            # load the expression into the link's Expression Engine
-            self.selectedLink.setExpression('Placement', expr )
+            # load the expression into the link's Expression Engine,
+            # or evaluate the attachment directly in native solver mode
+            if nativeSolver.isNative(self.selectedLink):
+                nativeSolver.solveObjects([self.selectedLink])
+            else:
+                self.selectedLink.setExpression('Placement', expr )
             # recompute the object to apply the placement:
-            self.selectedLink.recompute()
-            self.parentAssembly.recompute(True)
+            Profiler.recompute( self.selectedLink )
+            Profiler.recompute( self.parentAssembly, True )
             return True
         else:
             #FCC.PrintWarning("Problem in selections\n")
@@ -406,8 +432,7 @@ class placeLinkUI():
                 pText = Asm4.nameLabel( parentPart.LinkedObject )
                 self.parentDoc.setText( dText + pText )
                 # show all LCS in selected parent
-                for lcsName in parentPart.LinkedObject.getSubObjects(1):
-                    lcs = parentPart.LinkedObject.Document.getObject(lcsName[0:-1])
+                for lcs in self.attLCStable:
                     if lcs.TypeId in [ 'PartDesign::CoordinateSystem', 'PartDesign::Line' ]:
                         lcs.ViewObject.show()
                 # highlight the selected part:
@@ -479,6 +504,7 @@ class placeLinkUI():
         rotationZ = App.Placement( App.Vector(0.00, 0.00, 0.00), App.Rotation( App.Vector(0,0,1), self.ZrotationAngle - self.old_LinkRotation.toEuler()[2] ))
 
         self.selectedLink.AttachmentOffset = moveXYZ * rotationX * rotationY * rotationZ
+        nativeSolver.solveObjects([self.selectedLink])
         self.selectedLink.recompute()
 
         
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# profilerCmd.py
+#
+# shows the timings recorded by the recompute profiler
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import recomputeProfiler as Profiler
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class profilerCmd():
+    def __init__(self):
+        super(profilerCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Recompute Profiler",
+                "ToolTip": "Record the time spent recomputing each object, linked document\n"+ \
+                           "and attachment expression, and show the slowest ones",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_Solver.svg')
+                }
+
+    def IsActive(self):
+        if App.ActiveDocument:
+            return True
+        return False
+
+    def Activated(self):
+        Gui.Control.showDialog( profilerUI() )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class profilerUI():
+
+    # the tables of the profiler that can be shown
+    views = [   ( 'Objects',                            'objects'   ),
+                ( 'Documents (sum of their objects)',   'documents' ),
+                ( 'Expressions',                        'chains'    ),
+                ( 'Commands and whole recomputes',      'sections'  ) ]
+
+    def __init__(self):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Asm4_Solver.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Recompute Profiler')
+        self.profiler = Profiler.profiler
+        self.drawUI()
+        self.record.setChecked( self.profiler.enabled )
+        self.fillTable()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Close)
+
+    def reject(self):
+        self.finish()
+
+
+    def onRecord(self):
+        self.profiler.enabled = self.record.isChecked()
+
+
+    def onReset(self):
+        self.profiler.reset()
+        self.fillTable()
+
+
+    def onSave(self):
+        fileName = QtGui.QFileDialog.getSaveFileName( None, 'Save profile', 'Asm4_profile.json', 'JSON (*.json)' )[0]
+        if fileName:
+            self.profiler.dumpJSON( fileName )
+            FCC.PrintMessage( 'Profile saved to '+fileName+'\n' )
+
+
+    # fill the table with the selected view
+    def fillTable(self):
+        table = getattr( self.profiler, self.views[ self.viewList.currentIndex() ][1] )
+        rows = self.profiler.rows( table )
+        # disable sorting while filling, or the rows get shuffled
+        self.table.setSortingEnabled(False)
+        self.table.clearContents()
+        self.table.setRowCount( len(rows) )
+        for i, row in enumerate(rows):
+            self.table.setItem( i, 0, QtGui.QTableWidgetItem( row['name'] ) )
+            self.table.setItem( i, 1, numberItem( row['calls'] ) )
+            self.table.setItem( i, 2, numberItem( round(row['total']*1000, 2) ) )
+            self.table.setItem( i, 3, numberItem( round(row['max']*1000, 2) ) )
+        self.table.setSortingEnabled(True)
+        self.table.sortItems( 2, QtCore.Qt.DescendingOrder )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        # recording and view selection
+        self.formLayout = QtGui.QFormLayout()
+        self.record = QtGui.QCheckBox('Record recomputes')
+        self.formLayout.addRow(QtGui.QLabel('Profiler :'),self.record)
+        self.viewList = QtGui.QComboBox()
+        for view in self.views:
+            self.viewList.addItem( view[0] )
+        self.formLayout.addRow(QtGui.QLabel('Show :'),self.viewList)
+        self.mainLayout.addLayout(self.formLayout)
+
+        # the timings, sortable by clicking on the column headers
+        self.table = QtGui.QTableWidget( 0, 4 )
+        self.table.setHorizontalHeaderLabels( [ 'Name', 'Calls', 'Total (ms)', 'Max (ms)' ] )
+        self.table.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setMinimumHeight(300)
+        self.mainLayout.addWidget(self.table)
+
+        # the buttons
+        self.buttonsLayout = QtGui.QHBoxLayout()
+        self.RefreshButton = QtGui.QPushButton('Refresh')
+        self.ResetButton   = QtGui.QPushButton('Reset')
+        self.SaveButton    = QtGui.QPushButton('Save JSON')
+        self.buttonsLayout.addWidget(self.RefreshButton)
+        self.buttonsLayout.addWidget(self.ResetButton)
+        self.buttonsLayout.addStretch()
+        self.buttonsLayout.addWidget(self.SaveButton)
+        self.mainLayout.addLayout(self.buttonsLayout)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.record.toggled.connect( self.onRecord )
+        self.viewList.currentIndexChanged.connect( self.fillTable )
+        self.RefreshButton.clicked.connect( self.fillTable )
+        self.ResetButton.clicked.connect( self.onReset )
+        self.SaveButton.clicked.connect( self.onSave )
+
+
+
+# a table item that sorts numerically
+def numberItem( value ):
+    item = QtGui.QTableWidgetItem()
+    item.setData( QtCore.Qt.DisplayRole, value )
+    return item
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_profiler', profilerCmd() )
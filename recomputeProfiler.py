@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# recomputeProfiler.py
+#
+# measures the time spent in the recomputes triggered by Assembly4
+# the results are shown by the Asm4_profiler command (profilerCmd.py)
+
+
+
+import json, time
+
+import FreeCAD as App
+
+
+
+"""
+    +-----------------------------------------------+
+    |      accumulates timings of the recomputes    |
+    +-----------------------------------------------+
+"""
+class RecomputeProfiler():
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+
+    def reset(self):
+        # each table is key -> [ calls, total time, max time ]
+        # objects, documents and chains only hold the recomputes of single
+        # objects, documents being the sum of those of their objects. The
+        # recomputes of whole documents or containers, which include those of
+        # their objects, go with the commands in sections, or they would be
+        # counted twice
+        self.objects   = {}
+        self.documents = {}
+        self.chains    = {}
+        self.sections  = {}
+        # object key -> ( document key, expression ) for the report
+        self.objectInfo = {}
+
+
+    def record( self, table, key, elapsed ):
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [ 1, elapsed, elapsed ]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+
+
+    # recompute an object (or a whole document) and record the time spent
+    def recompute( self, obj, *args ):
+        if not self.enabled:
+            return obj.recompute( *args )
+        start = time.perf_counter()
+        retval = obj.recompute( *args )
+        elapsed = time.perf_counter() - start
+        # a whole document
+        if isinstance( obj, App.Document ):
+            self.record( self.sections, 'recompute '+obj.Name, elapsed )
+            return retval
+        # a container with all its contents, like the Model
+        if isWhole( obj, args ):
+            self.record( self.sections, 'recompute '+obj.Document.Name+'#'+obj.Name, elapsed )
+            return retval
+        objKey = obj.Document.Name+'#'+obj.Name
+        # links are accounted in the document they link to
+        docKey = obj.Document.Name
+        if obj.TypeId == 'App::Link' and obj.LinkedObject and obj.LinkedObject.Document:
+            docKey = obj.LinkedObject.Document.Name
+        chain = placementChain( obj )
+        self.record( self.objects,   objKey, elapsed )
+        self.record( self.documents, docKey, elapsed )
+        if chain:
+            self.record( self.chains, chain, elapsed )
+        self.objectInfo[objKey] = ( docKey, chain )
+        return retval
+
+
+    # times a whole command or function
+    def section( self, name ):
+        return ProfilerSection( self, name )
+
+
+    # the table entries as a list of rows, slowest first
+    def rows( self, table ):
+        rows = []
+        for key, ( calls, total, maxTime ) in table.items():
+            rows.append( { 'name':key, 'calls':calls, 'total':total, 'max':maxTime } )
+        rows.sort( key=lambda r: r['total'], reverse=True )
+        return rows
+
+
+    # the n slowest objects, with their document and expression
+    def slowest( self, n=20 ):
+        rows = self.rows( self.objects )[0:n]
+        for row in rows:
+            ( row['document'], row['expression'] ) = self.objectInfo.get( row['name'], ('','') )
+        return rows
+
+
+    def report( self ):
+        return {    'objects'   : self.slowest( len(self.objects) ),
+                    'documents' : self.rows( self.documents ),
+                    'chains'    : self.rows( self.chains ),
+                    'sections'  : self.rows( self.sections ) }
+
+
+    def dumpJSON( self, fileName ):
+        with open( fileName, 'w' ) as jsonFile:
+            json.dump( self.report(), jsonFile, indent=2 )
+
+
+
+# used as:  with profiler.section('name'): ...
+class ProfilerSection():
+
+    def __init__( self, profiler, name ):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__( self ):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__( self, excType, excValue, traceback ):
+        if self.profiler.enabled:
+            elapsed = time.perf_counter() - self.start
+            self.profiler.record( self.profiler.sections, self.name, elapsed )
+        return False
+
+
+
+# whether recomputing obj recomputes the objects it contains: a container,
+# or any object recomputed with its dependencies (recursive argument set)
+def isWhole( obj, args ):
+    if args and args[0] and args[0] != 'False':
+        return True
+    return obj.TypeId in ( 'App::Part', 'App::DocumentObjectGroup' )
+
+
+# the Placement expression, or the native attachment, of an object
+def placementChain( obj ):
+    if hasattr(obj,'ExpressionEngine'):
+        for expr in obj.ExpressionEngine:
+            if expr[0] == 'Placement':
+                return expr[1]
+    if hasattr(obj,'SolverMode') and obj.SolverMode and obj.AttachedTo:
+        return obj.AttachedTo+' * AttachmentOffset * '+obj.AttachedBy+' ^ -1'
+    return None
+
+
+
+"""
+    +-----------------------------------------------+
+    |       the profiler shared by all commands     |
+    +-----------------------------------------------+
+"""
+profiler = RecomputeProfiler()
+
+
+def recompute( obj, *args ):
+    return profiler.recompute( obj, *args )
+
+
+def section( name ):
+    return profiler.section( name )
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# refactorCmd.py
+#
+# maps the datums of a part to new ones, or replaces a part by another one,
+# and re-attaches everything that was attached to the old datums
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import refactorEngine
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class refactorCmd():
+    def __init__(self):
+        super(refactorCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Rename Datums / Replace Part",
+                "ToolTip": "Map the datums of a part to new datums, or replace a part by a revision,\n"+ \
+                           "and re-attach all the objects attached to the old datums",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Place_Link.svg')
+                }
+
+    def IsActive(self):
+        if Asm4.checkModel():
+            return True
+        return False
+
+    def Activated(self):
+        Gui.Control.showDialog( refactorUI() )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class refactorUI():
+
+    def __init__(self):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Place_Link.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Rename Datums / Replace Part')
+        self.activeDoc = App.ActiveDocument
+        self.drawUI()
+        self.fillParts()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Cancel | QtGui.QDialogButtonBox.Ok)
+
+    def reject(self):
+        self.finish()
+
+    def accept(self):
+        self.onApply()
+        self.finish()
+
+
+    # the Model and the parts or bodies linked in it, from any document
+    def fillParts(self):
+        model = self.activeDoc.Model
+        self.parts = [ model ]
+        seen = { partKey(model) }
+        for obj in model.Group:
+            if obj.TypeId == 'App::Link':
+                linked = obj.LinkedObject
+                if linked and hasattr(linked,'TypeId') and linked.TypeId in Asm4.containerTypes \
+                        and partKey(linked) not in seen:
+                    seen.add( partKey(linked) )
+                    self.parts.append( linked )
+        self.partList.clear()
+        for part in self.parts:
+            self.partList.addItem( part.Document.Name+'#'+Asm4.nameLabel(part) )
+        # the parts and bodies that can replace a part: those not inside another container
+        self.newParts = []
+        for doc in App.listDocuments().values():
+            for obj in doc.Objects:
+                if obj.TypeId in Asm4.containerTypes and obj != model and not obj.getParentGeoFeatureGroup():
+                    self.newParts.append( obj )
+        self.replaceList.clear()
+        self.replaceList.addItem( '(keep)' )
+        for part in self.newParts:
+            self.replaceList.addItem( part.Document.Name+'#'+Asm4.nameLabel(part) )
+        self.fillDatums()
+
+
+    def selectedParts(self):
+        oldPart = self.parts[ self.partList.currentIndex() ]
+        newPart = oldPart
+        if self.replaceList.currentIndex() > 0:
+            newPart = self.newParts[ self.replaceList.currentIndex()-1 ]
+        return ( oldPart, newPart )
+
+
+    # one row for each datum of the part, with the new datum to use
+    def fillDatums(self):
+        if self.partList.currentIndex() < 0:
+            return
+        ( oldPart, newPart ) = self.selectedParts()
+        self.oldDatums = Asm4.getPartLCS( oldPart )
+        newDatums = Asm4.getPartLCS( newPart )
+        newNames  = [ d.Name for d in newDatums ]
+        newLabels = [ d.Label for d in newDatums ]
+        self.datumTable.clearContents()
+        self.datumTable.setRowCount( len(self.oldDatums) )
+        for row, datum in enumerate( self.oldDatums ):
+            self.datumTable.setItem( row, 0, QtGui.QTableWidgetItem( Asm4.nameLabel(datum) ) )
+            newList = QtGui.QComboBox()
+            newList.addItem( '' )
+            for newDatum in newDatums:
+                newList.addItem( Asm4.nameLabel(newDatum) )
+            # the same name, or else the same label
+            if datum.Name in newNames:
+                newList.setCurrentIndex( newNames.index(datum.Name)+1 )
+            elif datum.Label in newLabels:
+                newList.setCurrentIndex( newLabels.index(datum.Label)+1 )
+            self.datumTable.setCellWidget( row, 1, newList )
+        self.newDatums = newDatums
+
+
+    def onApply(self):
+        ( oldPart, newPart ) = self.selectedParts()
+        renames = {}
+        for row, datum in enumerate( self.oldDatums ):
+            index = self.datumTable.cellWidget( row, 1 ).currentIndex()
+            if index > 0:
+                newName = self.newDatums[index-1].Name
+                if newName != datum.Name:
+                    renames[ (oldPart.Document.Name, datum.Name) ] = newName
+        swaps = {}
+        if partKey(newPart) != partKey(oldPart):
+            swaps[ partKey(oldPart) ] = partKey(newPart)
+        if renames or swaps:
+            refactorEngine.refactor( renames, swaps )
+        else:
+            FCC.PrintMessage( 'Nothing to change\n' )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        self.formLayout = QtGui.QFormLayout()
+        self.partList = QtGui.QComboBox()
+        self.formLayout.addRow(QtGui.QLabel('Part :'),self.partList)
+        self.replaceList = QtGui.QComboBox()
+        self.formLayout.addRow(QtGui.QLabel('Replace by :'),self.replaceList)
+        self.mainLayout.addLayout(self.formLayout)
+
+        self.datumTable = QtGui.QTableWidget( 0, 2 )
+        self.datumTable.setHorizontalHeaderLabels( [ 'Datum', 'New datum' ] )
+        self.datumTable.setEditTriggers( QtGui.QAbstractItemView.NoEditTriggers )
+        self.datumTable.horizontalHeader().setStretchLastSection(True)
+        self.datumTable.setMinimumHeight(300)
+        self.mainLayout.addWidget(self.datumTable)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.partList.currentIndexChanged.connect( self.fillDatums )
+        self.replaceList.currentIndexChanged.connect( self.fillDatums )
+
+
+
+# the ( docName, objName ) of a part, as used by refactorEngine
+def partKey( part ):
+    return ( part.Document.Name, part.Name )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_refactor', refactorCmd() )
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# refactorEngine.py
+#
+# re-targets the attachments of an assembly when datums are renamed, or when
+# a linked part is replaced by another one with different datum names
+
+
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import expressionParser as Parser
+import nativeSolver
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+# (docName, linkName) -> (docName, objName) of the object linked, for all the
+# links of docs, taken before any change as the parts are swapped during the pass
+def linkedObjects( docs ):
+    linked = {}
+    for doc in docs:
+        for obj in doc.Objects:
+            if obj.TypeId == 'App::Link' and obj.LinkedObject and obj.LinkedObject.Document:
+                linked[ (doc.Name, obj.Name) ] = ( obj.LinkedObject.Document.Name, obj.LinkedObject.Name )
+    return linked
+
+
+# the document of the part replacing the one the link linkName of docName
+# points to, None if it isn't replaced
+def swappedDoc( swaps, linked, docName, linkName ):
+    newPart = swaps.get( linked.get( (docName, linkName) ) )
+    if newPart:
+        return newPart[0]
+    return None
+
+
+# new name of the datum called name in the document docName, None if unchanged
+def newDatumName( renames, docName, name ):
+    newName = renames.get( ( docName, name ) )
+    if newName and newName != name:
+        return newName
+    return None
+
+
+# the expression with the datums renamed, and the documents of the replaced
+# parts changed: attSwap for the LCS of the part attached to, ownSwap for
+# the LCS of the part linked by the object itself. None if nothing changes
+def rewriteExpression( expr, docName, renames, attSwap=None, ownSwap=None ):
+    parsed = Parser.parseExpression( expr )
+    if not parsed:
+        return None
+    changed = False
+    terms = []
+    for i, term in enumerate( parsed.terms ):
+        ( termDoc, path ) = ( term.doc, term.path )
+        newName = newDatumName( renames, termDoc or docName, path[-1] )
+        if newName:
+            path = path[0:-1] + ( newName, )
+            changed = True
+        if i >= len(parsed.before):
+            newDoc = ownSwap
+        elif i == len(parsed.before)-1 and i > 0:
+            newDoc = attSwap
+        else:
+            newDoc = None
+        if termDoc and newDoc and newDoc != termDoc:
+            termDoc = newDoc
+            changed = True
+        terms.append( Parser.PlacementTerm( termDoc, path, term.inverse ) )
+    if not changed:
+        return None
+    return Parser.formatExpression( terms, parsed.offsetIndex )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       rename datums and swap linked parts     |
+    +-----------------------------------------------+
+"""
+# renames: { (docName, oldDatumName): newDatumName }, the datums are those of
+#          a container of the document docName, the Model of the assembly or
+#          a part or body linked by the assembly, in any document
+# swaps:   { (oldDocName, oldPartName): (newDocName, newPartName) }, the links
+#          to the old part or body will link to the new one
+# the objects of docs (all open documents by default) are rewritten in one
+# pass, and recomputed once. Returns the list of the objects changed
+def refactor( renames, swaps=None, docs=None ):
+    if swaps is None:
+        swaps = {}
+    if docs is None:
+        docs = list( App.listDocuments().values() )
+    # check that the new parts and datums exist
+    for ( oldDoc, oldPart ), ( newDoc, newPart ) in swaps.items():
+        doc = App.listDocuments().get( newDoc )
+        if not doc or not doc.getObject( newPart ):
+            FCC.PrintWarning( newDoc+'#'+newPart+' not found, cannot replace '+oldDoc+'#'+oldPart+'\n' )
+            return []
+    swapDocs = { old[0]: new[0] for old, new in swaps.items() }
+    for ( docName, oldName ), newName in renames.items():
+        targetDoc = App.listDocuments().get( swapDocs.get( docName, docName ) )
+        if targetDoc and not targetDoc.getObject( newName ):
+            FCC.PrintWarning( newName+' not found in '+targetDoc.Name+', the objects attached to '+oldName+' will be broken\n' )
+    changed = []
+    if not docs:
+        return changed
+    linked = linkedObjects( docs )
+    with Asm4.recomputeBatch( 'Rename datums' ):
+        for doc in docs:
+            for obj in doc.Objects:
+                if refactorObject( obj, renames, swaps, linked ):
+                    changed.append( obj )
+        # objects in native solver mode aren't re-evaluated by the recompute
+        nativeSolver.solveObjects( [ o for o in changed if nativeSolver.isNative(o) ] )
+        for obj in changed:
+            Asm4.recomputeObject( obj )
+    FCC.PrintMessage( str(len(changed))+' object(s) re-attached\n' )
+    return changed
+
+
+# returns True if the object has been changed
+def refactorObject( obj, renames, swaps, linked ):
+    doc = obj.Document
+    changed = False
+    ownLinked = linked.get( (doc.Name, obj.Name) )
+    ownLinkedDoc = ownLinked[0] if ownLinked else None
+    # the Placement expression
+    expr = Asm4.placementEE( obj.ExpressionEngine )
+    parsed = Parser.parseExpression( expr ) if expr else None
+    if parsed:
+        attSwap = swappedDoc( swaps, linked, doc.Name, parsed.attLink )
+        ownSwap = swappedDoc( swaps, linked, doc.Name, obj.Name )
+        newExpr = rewriteExpression( expr, doc.Name, renames, attSwap, ownSwap )
+        if newExpr:
+            obj.setExpression( 'Placement', newExpr )
+            changed = True
+    # AttachedTo = 'Link#LCS' or 'Parent Assembly#LCS'
+    if hasattr(obj,'AttachedTo') and obj.AttachedTo:
+        ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+        if attLink == 'Parent Assembly':
+            attDoc = doc.Name
+        else:
+            attDoc = linked.get( (doc.Name, attLink), (doc.Name,) )[0]
+        newName = newDatumName( renames, attDoc, attLCS )
+        if newName:
+            obj.AttachedTo = attLink+'#'+newName
+            changed = True
+    # AttachedBy = '#LCS' in the linked part
+    if hasattr(obj,'AttachedBy') and obj.AttachedBy.startswith('#') and ownLinkedDoc:
+        newName = newDatumName( renames, ownLinkedDoc, obj.AttachedBy[1:] )
+        if newName:
+            obj.AttachedBy = '#'+newName
+            changed = True
+    # the link itself, to a part that is replaced
+    if ownLinked in swaps:
+        ( newDocName, newName ) = swaps[ownLinked]
+        newDoc = App.listDocuments().get( newDocName )
+        newTarget = newDoc.getObject( newName ) if newDoc else None
+        if newTarget:
+            obj.LinkedObject = newTarget
+            changed = True
+        else:
+            FCC.PrintWarning( newDocName+'#'+newName+' not found, '+Asm4.nameLabel(obj)+' not replaced\n' )
+    return changed
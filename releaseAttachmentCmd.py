@@ -11,6 +11,7 @@ import FreeCAD as App
 import Part
 
 import libAsm4 as Asm4
+import selectionCache
 
 
 
@@ -49,9 +50,9 @@ class releaseAttachment:
         # a standard App::Part would also do, but then more error checks are necessary
         if App.ActiveDocument.getObject('Model') and App.ActiveDocument.getObject('Model').TypeId=='App::Part' :
         # check that something is selected
-            if Gui.Selection.getSelection():
+            selection = selectionCache.snapshot().first
+            if selection:
             # set the (first) selected object as global variable
-                selection = Gui.Selection.getSelection()[0]
                 selectedType = selection.TypeId
                 # check that the selected object is a Datum CS or Point type
                 if  selectedType=='App::Link' or selectedType=='PartDesign::CoordinateSystem' or selectedType=='PartDesign::Plane' or selectedType=='PartDesign::Line' or selectedType=='PartDesign::Point' :
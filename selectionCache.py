@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# selectionCache.py
+#
+# one classified snapshot of the selection, shared by the IsActive handlers
+#
+# the IsActive of every command is called at each refresh of the toolbars,
+# they read the snapshot instead of querying and decoding the selection:
+#
+#   import selectionCache
+#   link = selectionCache.snapshot().link
+#   axes = selectionCache.fact( 'holeAxes', findSelectedAxes )
+
+
+
+import FreeCADGui as Gui
+import FreeCAD as App
+
+# libAsm4 imports this module too, its functions are only used at run time
+import libAsm4 as Asm4
+
+
+
+"""
+    +-----------------------------------------------+
+    |           the classified selection            |
+    +-----------------------------------------------+
+"""
+class SelectionSnapshot():
+
+    def __init__( self ):
+        self.document = App.ActiveDocument
+        # the selected objects, as Gui.Selection.getSelection()
+        self.objects = Gui.Selection.getSelection()
+        self.keys = set( ( o.Document.Name, o.Name ) for o in self.objects )
+        # the first selected object, and the only one if there is only one
+        self.first  = None
+        self.single = None
+        if self.objects:
+            self.first = self.objects[0]
+        if len(self.objects)==1:
+            self.single = self.first
+        # the single selected object classified
+        self.container = None
+        self.link      = None
+        self.datum     = None
+        if self.single:
+            obj = self.single
+            if obj.TypeId in Asm4.containerTypes:
+                self.container = obj
+            elif obj.TypeId in Asm4.datumTypes:
+                self.datum = obj
+            elif obj.isDerivedFrom('App::Link') and obj.LinkedObject \
+                        and hasattr(obj.LinkedObject,'TypeId') and obj.LinkedObject.TypeId in Asm4.containerTypes:
+                self.link = obj
+        # the other facts, computed once when first asked for
+        self.facts = {}
+
+    # the result of function(), computed once for this selection
+    def fact( self, name, function ):
+        if name not in self.facts:
+            self.facts[name] = function()
+        return self.facts[name]
+
+
+
+"""
+    +-----------------------------------------------+
+    |   the observer dropping the outdated snapshot |
+    +-----------------------------------------------+
+"""
+class SelectionCache():
+
+    def __init__( self ):
+        self.current = None
+
+    def reset( self ):
+        self.current = None
+
+    def snapshot( self ):
+        if self.current is None or self.current.document != App.ActiveDocument:
+            self.current = SelectionSnapshot()
+        return self.current
+
+    # selection observer
+    def addSelection( self, doc, obj, sub, pnt ):
+        self.reset()
+
+    def removeSelection( self, doc, obj, sub ):
+        self.reset()
+
+    def setSelection( self, doc ):
+        self.reset()
+
+    def clearSelection( self, doc ):
+        self.reset()
+
+    # document observer, a selected object can change type or link
+    def slotChangedObject( self, obj, prop ):
+        if self.current is not None and hasattr(obj,'Document') and obj.Document:
+            if ( obj.Document.Name, obj.Name ) in self.current.keys:
+                self.reset()
+
+    def slotDeletedObject( self, obj ):
+        self.reset()
+
+    def slotDeletedDocument( self, doc ):
+        self.reset()
+
+
+
+cache = None
+
+
+def startSelectionCache():
+    global cache
+    if cache is None:
+        cache = SelectionCache()
+        Gui.Selection.addObserver( cache )
+        App.addDocumentObserver( cache )
+    return cache
+
+
+def stopSelectionCache():
+    global cache
+    if cache is not None:
+        Gui.Selection.removeObserver( cache )
+        App.removeDocumentObserver( cache )
+        cache = None
+
+
+# the snapshot of the current selection, taken afresh if the cache isn't running
+def snapshot():
+    if cache is None:
+        return SelectionSnapshot()
+    return cache.snapshot()
+
+
+def fact( name, function ):
+    return snapshot().fact( name, function )
@@ -9,10 +9,7 @@ import FreeCADGui as Gui
 import FreeCAD as App
 
 import libAsm4 as Asm4
-
-
-# Already processed links cache, no need to process the same part if its linked multiple times
-#processedLinks = []
+import visibilityEngine
 
 
 """
@@ -37,20 +34,25 @@ class showLcsCmd:
         return False
 
     def Activated(self):
-        #global processedLinks
-        # reset processed links cache
-        processedLinks = []
-
         #model = Asm4.getModelSelected()
         container = Asm4.getSelectedContainer()
         if not container:
             container = Asm4.checkModel()
         link = Asm4.getSelectedLink()
         if link:
-            showChildLCSs(link, True, processedLinks)
-        elif container:
-            for objName in container.getSubObjects(1):
-                showChildLCSs(container.getSubObject(objName, 1), True, processedLinks)
+            container = link.LinkedObject
+        if container:
+            changes = visibilityEngine.toChange(visibilityEngine.datumsIn(container), True)
+            if not changes:
+                return
+            # if asked for in the preferences, the datums about to be shown are saved
+            # to hide them again with the Visibility Snapshots. A snapshot that
+            # hasn't been restored yet is kept, it holds the state before the first Show
+            model = Asm4.checkModel()
+            if model and visibilityEngine.autoSnapshotEnabled() \
+                    and visibilityEngine.autoSnapshot not in visibilityEngine.snapshotNames(model):
+                visibilityEngine.captureSnapshot(model, visibilityEngine.autoSnapshot, container, changes)
+            visibilityEngine.setVisibility(changes, True)
 
 
 """
@@ -75,19 +77,14 @@ class hideLcsCmd:
         return False
 
     def Activated(self):
-        #global processedLinks
-        # reset processed links cache
-        processedLinks = []
-
         container = Asm4.getSelectedContainer()
         if not container:
             container = Asm4.checkModel()
         link = Asm4.getSelectedLink()
         if link:
-            showChildLCSs(link, False, processedLinks)
+            showChildLCSs(link.LinkedObject, False)
         elif container:
-            for objName in container.getSubObjects(1):
-                showChildLCSs(container.getSubObject(objName, 1), False, processedLinks)
+            showChildLCSs(container, False)
 
 
 
@@ -97,31 +94,10 @@ class hideLcsCmd:
     |   the provided object and all its children    |
     +-----------------------------------------------+
 """
-def showChildLCSs(obj, show, processedLinks):
-    #global processedLinks
-    # if its a datum apply the visibility
-    if obj.TypeId in Asm4.datumTypes:
-        obj.Visibility = show
-    # if it's a link, look for subObjects
-    elif obj.TypeId == 'App::Link' and obj.Name not in processedLinks:
-        processedLinks.append(obj.Name)
-        for objName in obj.LinkedObject.getSubObjects(1):
-            linkedObj = obj.LinkedObject.Document.getObject(objName[0:-1])
-            showChildLCSs(linkedObj, show, processedLinks)
-    # if it's a container
-    else:
-        if obj.TypeId in Asm4.containerTypes:
-            for subObjName in obj.getSubObjects(1):
-                subObj = obj.getSubObject(subObjName, 1)    # 1 for returning the real object
-                if subObj != None:
-                    if subObj.TypeId in Asm4.datumTypes:
-                        #subObj.Visibility = show
-                        # Aparently obj.Visibility API is very slow
-                        # Using the ViewObject.show() and ViewObject.hide() API runs at least twice faster
-                        if show:
-                            subObj.ViewObject.show()
-                        else:
-                            subObj.ViewObject.hide()
+def showChildLCSs(container, show):
+    # all the datums are collected first, and only those to change are shown or hidden
+    datums = visibilityEngine.datumsIn(container)
+    return visibilityEngine.setVisibility(datums, show)
 
 
 
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# solverEngine.py
+#
+# dependency-ordered, incremental update of an Assembly4 Model
+
+
+
+import re, os, hashlib, zipfile
+
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import expressionParser as Parser
+import nativeSolver
+import recomputeProfiler as Profiler
+
+
+
+"""
+    +-----------------------------------------------+
+    |               Helper functions                |
+    +-----------------------------------------------+
+"""
+
+# matches the 'Doc#Object.Placement' and 'Object.Placement' terms of an expression
+placementTerm = re.compile( r'(?:(\w+)#)?(\w+)\.Placement' )
+
+
+# the objects referenced by a Placement expression
+# returns a list of (docName, objName), docName is None for the same document
+def expressionReferences( expr ):
+    parsed = Parser.parseExpression( expr )
+    if parsed:
+        return parsed.references()
+    # not written by Assembly4, look for anything like a Placement
+    refs = []
+    if expr:
+        for docName, objName in placementTerm.findall( expr ):
+            refs.append( ( docName or None, objName ) )
+    return refs
+
+
+# the objects placed by Assembly4: links, datums and attached fasteners
+# the other objects are ordered and recomputed by FreeCAD itself
+def isAttachable( obj ):
+    return obj.TypeId == 'App::Link' or obj.TypeId in Asm4.datumTypes or hasattr(obj,'AttachedTo')
+
+
+# checks whether FreeCAD has marked an object as needing a recompute
+def isTouched( obj ):
+    if obj and hasattr(obj,'State'):
+        if 'Touched' in obj.State or 'Invalid' in obj.State:
+            return True
+    return False
+
+
+
+"""
+    +-----------------------------------------------+
+    |    the attachment graph of an Assembly4 doc   |
+    +-----------------------------------------------+
+"""
+# nodes are the names of the attachable objects in the document
+# an edge parent -> child means that the Placement of child depends on parent
+class AttachmentGraph():
+
+    def __init__( self, doc ):
+        self.doc = doc
+        # objName -> set of objNames it depends on
+        self.parents  = {}
+        # objName -> set of objNames depending on it
+        self.children = {}
+        # docName -> set of objNames depending on something in that document
+        self.docUsers = {}
+        # objName not (yet) in the document -> set of objNames referring to it
+        self.waiting  = {}
+        # objects to be recomputed at the next update
+        self.dirty = set()
+        # docName -> revision of the external documents at the last update
+        self.seenRevisions = {}
+        # topological order of the whole graph, reset when an edge changes
+        self.order = None
+        self.build()
+
+
+    # (re-)build the whole graph in one pass over the document
+    def build( self ):
+        self.parents  = {}
+        self.children = {}
+        self.docUsers = {}
+        self.waiting  = {}
+        self.order    = None
+        for obj in self.doc.Objects:
+            if isAttachable( obj ):
+                self.addNode( obj )
+
+
+    # the names of the objects in this document, and the names of the
+    # external documents, on which the Placement of obj depends
+    def dependencies( self, obj ):
+        objNames = set()
+        docNames = set()
+        # the Placement expression
+        expr = Asm4.placementEE( obj.ExpressionEngine )
+        for docName, objName in expressionReferences( expr ):
+            if docName and docName != self.doc.Name:
+                docNames.add( docName )
+            elif objName != obj.Name:
+                objNames.add( objName )
+        # the Assembly4 properties
+        if hasattr(obj,'AttachedTo') and obj.AttachedTo:
+            ( attLink, separator, attLCS ) = obj.AttachedTo.partition('#')
+            if attLink == 'Parent Assembly':
+                if attLCS:
+                    objNames.add( attLCS )
+            elif attLink:
+                objNames.add( attLink )
+        # a link follows the document of the object it links to
+        if obj.TypeId == 'App::Link' and obj.LinkedObject and obj.LinkedObject.Document:
+            linkedDoc = obj.LinkedObject.Document
+            if linkedDoc != self.doc:
+                docNames.add( linkedDoc.Name )
+            elif hasattr(obj,'AttachedBy') and obj.AttachedBy:
+                objNames.add( obj.AttachedBy.lstrip('#') )
+        return ( objNames, docNames )
+
+
+    # add or refresh the node of obj and its incoming edges
+    def addNode( self, obj ):
+        name = obj.Name
+        self.removeEdges( name )
+        ( objNames, docNames ) = self.dependencies( obj )
+        # only keep the objects that do exist
+        for missing in [ n for n in objNames if not self.doc.getObject(n) ]:
+            self.waiting.setdefault( missing, set() ).add( name )
+            objNames.discard( missing )
+        # the other objects are FreeCAD's business
+        for other in [ n for n in objNames if not isAttachable( self.doc.getObject(n) ) ]:
+            objNames.discard( other )
+        self.parents[name] = objNames
+        self.children.setdefault( name, set() )
+        for parent in objNames:
+            self.children.setdefault( parent, set() ).add( name )
+            self.parents.setdefault( parent, set() )
+        for docName in docNames:
+            self.docUsers.setdefault( docName, set() ).add( name )
+        self.order = None
+
+
+    # remove the incoming edges of a node
+    def removeEdges( self, name ):
+        for parent in self.parents.get( name, () ):
+            if parent in self.children:
+                self.children[parent].discard( name )
+        self.parents[name] = set()
+        for users in self.docUsers.values():
+            users.discard( name )
+        for users in self.waiting.values():
+            users.discard( name )
+
+
+    # remove a node and all its edges
+    def removeNode( self, name ):
+        self.removeEdges( name )
+        for child in self.children.get( name, () ):
+            if child in self.parents:
+                self.parents[child].discard( name )
+                # in case it comes back, with an undo for example
+                self.waiting.setdefault( name, set() ).add( child )
+        self.parents.pop( name, None )
+        self.children.pop( name, None )
+        self.dirty.discard( name )
+        self.order = None
+
+
+    # flag an object as needing a recompute
+    def markDirty( self, obj ):
+        if obj and obj.Document == self.doc:
+            self.dirty.add( obj.Name )
+
+
+    # the objects changed since the last update, and the objects depending
+    # on an external document that has changed. The changes are followed by
+    # the observer, the objects are only searched for touched ones without it
+    def collectDirty( self ):
+        dirty = set( self.dirty )
+        if observer is not None:
+            dirty.update( observer.changedObjects( self.doc ) )
+        else:
+            for obj in self.doc.Objects:
+                if isTouched( obj ):
+                    dirty.add( obj.Name )
+        for docName, users in self.docUsers.items():
+            extDoc = App.listDocuments().get( docName )
+            if extDoc and users and self.docChanged( extDoc ):
+                dirty.update( users )
+        return dirty
+
+
+    # whether an external document changed since the last update
+    def docChanged( self, extDoc ):
+        seen = self.seenRevisions.get( extDoc.Name )
+        if observer is None or seen is None:
+            return len( [ o for o in extDoc.Objects if isTouched(o) ] ) > 0
+        return observer.revision( extDoc ) != seen
+
+
+    # the document and the external documents it uses are up to date
+    def markUpdated( self ):
+        self.dirty.clear()
+        if observer is not None:
+            observer.changed.pop( self.doc.Name, None )
+            for docName in self.docUsers:
+                extDoc = App.listDocuments().get( docName )
+                if extDoc:
+                    self.seenRevisions[ docName ] = observer.revision( extDoc )
+
+
+    # all the objects downstream of the given ones (included)
+    def downstream( self, names ):
+        result = set()
+        stack  = [ n for n in names if n in self.children ]
+        while stack:
+            name = stack.pop()
+            if name not in result:
+                result.add( name )
+                stack.extend( self.children.get( name, () ) )
+        return result
+
+
+    # topological order of the given nodes (all nodes by default)
+    # returns ( ordered, cyclic ), cyclic being the nodes that couldn't be ordered
+    def topologicalOrder( self, names=None ):
+        if names is None:
+            names = set( self.parents.keys() )
+        # number of parents inside the sub-graph
+        inDegree = {}
+        for name in names:
+            inDegree[name] = len( [ p for p in self.parents.get(name,()) if p in names ] )
+        ready   = sorted( [ n for n in names if inDegree[n] == 0 ] )
+        ordered = []
+        while ready:
+            name = ready.pop()
+            ordered.append( name )
+            for child in self.children.get( name, () ):
+                if child in inDegree:
+                    inDegree[child] -= 1
+                    if inDegree[child] == 0:
+                        ready.append( child )
+        cyclic = [ n for n in names if inDegree[n] > 0 ]
+        return ( ordered, cyclic )
+
+
+    # the topological order of the whole graph, computed only after it changed
+    # returns ( ordered, cyclic )
+    def sortedNodes( self ):
+        if self.order is None:
+            self.order = self.topologicalOrder()
+        return self.order
+
+
+    # checks whether attaching the object name to the parent objects would
+    # close a loop, that is if one of the parents already depends on name
+    def createsCycle( self, name, parentNames ):
+        below = self.downstream( [name] )
+        for parent in parentNames:
+            if parent == name or parent in below:
+                return True
+        return False
+
+
+    # the given nodes grouped in levels: the nodes of a level only depend on
+    # nodes of the previous levels. Nodes in a cycle are put in the last level
+    # returns ( levels, cyclic )
+    def topologicalLevels( self, names=None ):
+        if names is None:
+            names = set( self.parents.keys() )
+        inDegree = {}
+        for name in names:
+            inDegree[name] = len( [ p for p in self.parents.get(name,()) if p in names ] )
+        levels = []
+        current = sorted( [ n for n in names if inDegree[n] == 0 ] )
+        while current:
+            levels.append( current )
+            following = []
+            for name in current:
+                for child in self.children.get( name, () ):
+                    if child in inDegree:
+                        inDegree[child] -= 1
+                        if inDegree[child] == 0:
+                            following.append( child )
+            current = sorted( following )
+        cyclic = sorted( [ n for n in names if inDegree[n] > 0 ] )
+        return ( levels, cyclic )
+
+
+
+"""
+    +-----------------------------------------------+
+    |      update only what needs to be updated     |
+    +-----------------------------------------------+
+"""
+# the objects of doc that FreeCAD has to recompute after the attached objects
+# solved: those depending on them and on the changed objects, found through
+# their InList, and the changed objects themselves. The solved ones are left out
+def restToRecompute( doc, solved, changed ):
+    rest = {}
+    stack = [ doc.getObject(name) for name in list(solved) + list(changed) ]
+    for obj in stack:
+        if obj and obj.Name not in solved:
+            rest[ obj.Name ] = obj
+    while stack:
+        obj = stack.pop()
+        if obj is None:
+            continue
+        for user in obj.InList:
+            if user.Document == doc and user.Name not in solved and user.Name not in rest:
+                rest[ user.Name ] = user
+                stack.append( user )
+    return list( rest.values() )
+
+
+# recomputes the dirty attached objects of doc and everything depending on them,
+# in topological order. If nothing is dirty, the whole graph is solved in order
+# objects in native solver mode are evaluated in one batch per level. The
+# other objects depending on them, or changed, are then recomputed by FreeCAD
+# in its own dependency order, all of them if full, without the solved ones
+# returns the list of the recomputed attached object names
+def updateAssembly( doc=None, graph=None, full=False ):
+    if doc is None:
+        doc = App.ActiveDocument
+    if not doc:
+        return []
+    if graph is None:
+        graph = getGraph( doc )
+    dirty = set()
+    if not full:
+        dirty = graph.collectDirty()
+    if dirty:
+        affected = graph.downstream( dirty )
+    else:
+        affected = set( graph.parents.keys() )
+    ( levels, cyclic ) = graph.topologicalLevels( affected )
+    if cyclic:
+        FCC.PrintWarning( 'Circular attachments found for: '+', '.join(cyclic)+'\n' )
+        levels.append( cyclic )
+    # recompute the attached objects level by level
+    ordered = []
+    for level in levels:
+        objs = [ o for o in [ doc.getObject(name) for name in level ] if o ]
+        nativeSolver.solveObjects( objs )
+        for obj in objs:
+            Profiler.recompute( obj )
+            ordered.append( obj.Name )
+    # and let FreeCAD order the rest: features, sketches, containers
+    with Profiler.section( 'updateAssembly: rest of '+doc.Name ):
+        solved = set( ordered )
+        if full:
+            rest = [ o for o in doc.Objects if o.Name not in solved ]
+        else:
+            rest = restToRecompute( doc, solved, [ n for n in dirty if n not in graph.parents ] )
+        if rest:
+            # the solved objects they depend on aren't touched, they're not recomputed again
+            for obj in rest:
+                obj.touch()
+            doc.recompute( rest )
+    graph.markUpdated()
+    FCC.PrintMessage( 'Assembly updated: '+str(len(ordered))+' of '+str(len(graph.parents))+' objects recomputed\n' )
+    return ordered
+
+
+
+"""
+    +-----------------------------------------------+
+    |   keep the graphs up to date while editing    |
+    +-----------------------------------------------+
+"""
+# the properties that change the edges of the attachment graph
+graphProperties = ( 'AttachedTo', 'AttachedBy', 'ExpressionEngine', 'LinkedObject' )
+
+
+# the properties whose changes don't count as a modification of the document
+ignoredProperties = ( 'SolveStamp', 'BomCache' )
+
+# the properties whose changes don't need a recompute of the object
+viewProperties = ( 'Visibility', 'Label', 'Label2' )
+
+
+class AttachmentObserver():
+
+    def __init__( self ):
+        # docName -> AttachmentGraph, built the first time it's asked for
+        self.graphs = {}
+        # docName -> number of changes to the document since it was opened
+        self.revisions = {}
+        # docName -> revision when the document was last loaded or saved
+        self.savedRevisions = {}
+        # docName -> names of the objects changed since the last recompute
+        # or update, so that they aren't searched for in all the objects
+        self.changed = {}
+
+    def touchDocument( self, doc ):
+        self.revisions[ doc.Name ] = self.revisions.get( doc.Name, 0 ) + 1
+
+    # whether the document has been changed since it was loaded or saved
+    def isModified( self, doc ):
+        return self.revisions.get( doc.Name, 0 ) != self.savedRevisions.get( doc.Name, 0 )
+
+    def revision( self, doc ):
+        return self.revisions.get( doc.Name, 0 )
+
+    def changedObjects( self, doc ):
+        return self.changed.get( doc.Name, set() )
+
+    def getGraph( self, doc ):
+        graph = self.graphs.get( doc.Name )
+        if graph is None or graph.doc != doc:
+            graph = AttachmentGraph( doc )
+            self.graphs[ doc.Name ] = graph
+        return graph
+
+    def slotCreatedObject( self, obj ):
+        self.touchDocument( obj.Document )
+        self.changed.setdefault( obj.Document.Name, set() ).add( obj.Name )
+        graph = self.graphs.get( obj.Document.Name )
+        if graph:
+            if isAttachable( obj ):
+                graph.addNode( obj )
+            # the objects that were referring to it before it existed
+            for name in graph.waiting.pop( obj.Name, () ):
+                child = graph.doc.getObject( name )
+                if child:
+                    graph.addNode( child )
+
+    def slotDeletedObject( self, obj ):
+        self.touchDocument( obj.Document )
+        self.changedObjects( obj.Document ).discard( obj.Name )
+        graph = self.graphs.get( obj.Document.Name )
+        if graph:
+            graph.removeNode( obj.Name )
+
+    def slotChangedObject( self, obj, prop ):
+        if not hasattr(obj,'Document') or not obj.Document:
+            return
+        if prop not in ignoredProperties:
+            self.touchDocument( obj.Document )
+            if prop not in viewProperties:
+                self.changed.setdefault( obj.Document.Name, set() ).add( obj.Name )
+        if prop in graphProperties:
+            graph = self.graphs.get( obj.Document.Name )
+            if graph and isAttachable( obj ):
+                graph.addNode( obj )
+
+    # the objects recomputed by FreeCAD are up to date
+    def slotRecomputedDocument( self, doc ):
+        self.changed.pop( doc.Name, None )
+
+    def slotFinishRestoreDocument( self, doc ):
+        self.savedRevisions[ doc.Name ] = self.revisions.get( doc.Name, 0 )
+        self.changed.pop( doc.Name, None )
+
+    def slotStartSaveDocument( self, doc, fileName ):
+        persistStamp( doc )
+
+    def slotFinishSaveDocument( self, doc, fileName ):
+        self.savedRevisions[ doc.Name ] = self.revisions.get( doc.Name, 0 )
+
+    def slotDeletedDocument( self, doc ):
+        self.graphs.pop( doc.Name, None )
+        self.revisions.pop( doc.Name, None )
+        self.savedRevisions.pop( doc.Name, None )
+        self.changed.pop( doc.Name, None )
+        solveStamps.pop( doc.Name, None )
+        pendingStamps.pop( doc.Name, None )
+
+
+
+# the observer shared by all commands, None if it isn't started
+observer = None
+
+
+def startObserver():
+    global observer
+    if observer is None:
+        observer = AttachmentObserver()
+        App.addDocumentObserver( observer )
+    return observer
+
+
+def stopObserver():
+    global observer
+    if observer is not None:
+        App.removeDocumentObserver( observer )
+        observer = None
+
+
+# the attachment graph of doc, kept up to date by the observer if it's running
+def getGraph( doc ):
+    if observer is not None:
+        return observer.getGraph( doc )
+    return AttachmentGraph( doc )
+
+
+# the objects of doc sorted so that each comes after the ones it's attached to
+def topologicalOrder( doc ):
+    return getGraph( doc ).sortedNodes()[0]
+
+
+
+"""
+    +-----------------------------------------------+
+    |   update nested assemblies, leaves first      |
+    +-----------------------------------------------+
+"""
+# docName -> ( revision after the solve, upstream stamps, stamp ) of the solves
+# done in this session, for documents that haven't been saved since
+solveStamps = {}
+
+# docName -> stamp of the last solve, not yet written in the Model
+pendingStamps = {}
+
+# fileName -> ( mtime, size, hash ) to avoid reading unchanged files again
+fileHashes = {}
+
+# properties of the saved file that change at every save, that store the stamp
+# or the BOM cache of bomEngine, or the visibility of the objects, which is
+# saved with them but doesn't change their placement or their parts
+volatileProperty = re.compile( r'<Property name="(SolveStamp|BomCache|LastModifiedDate|LastModifiedBy|Visibility)".*?</Property>', re.DOTALL )
+
+
+# the entries of a saved file holding the document itself, not its view
+def hashedEntry( name ):
+    return name == 'Document.xml' or name.lower().endswith( ( '.brp', '.brep' ) )
+
+
+# hash of the content of the saved file of a document: Document.xml without
+# the properties that change at every save, and the geometry. GuiDocument.xml
+# and the thumbnail are left out, a document saved again with only another
+# camera, visibility or tree state keeps its hash. None if it has never been saved
+def contentHash( doc ):
+    fileName = doc.FileName
+    if not fileName or not os.path.isfile( fileName ):
+        return None
+    stat = os.stat( fileName )
+    cached = fileHashes.get( fileName )
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    sha = hashlib.sha1()
+    try:
+        with zipfile.ZipFile( fileName ) as archive:
+            for name in sorted( archive.namelist() ):
+                if not hashedEntry( name ):
+                    continue
+                data = archive.read( name )
+                if name == 'Document.xml':
+                    data = volatileProperty.sub( '', data.decode('utf-8') ).encode('utf-8')
+                sha.update( name.encode('utf-8') )
+                sha.update( data )
+    except ( OSError, zipfile.BadZipFile ):
+        return None
+    fileHashes[ fileName ] = ( stat.st_mtime, stat.st_size, sha.hexdigest() )
+    return sha.hexdigest()
+
+
+# the content hash of the saved file if the document hasn't been changed since,
+# else its revision in this session. None if the changes aren't followed
+def documentStamp( doc ):
+    if observer is None:
+        return None
+    if not observer.isModified( doc ):
+        content = contentHash( doc )
+        if content:
+            return content
+    return 'unsaved:'+doc.Name+':'+str( observer.revision(doc) )
+
+
+# the open documents that doc links to or has expressions pointing into
+def linkedDocuments( doc ):
+    graph = getGraph( doc )
+    docs = []
+    for docName, users in sorted( graph.docUsers.items() ):
+        linkedDoc = App.listDocuments().get( docName )
+        if users and linkedDoc and linkedDoc != doc:
+            docs.append( linkedDoc )
+    return docs
+
+
+# the tree of nested documents under doc, the leaves first and doc last
+def documentsBottomUp( doc ):
+    ordered = []
+    visited = set()
+    def visit( d ):
+        visited.add( d.Name )
+        for linkedDoc in linkedDocuments( d ):
+            if linkedDoc.Name not in visited:
+                visit( linkedDoc )
+        ordered.append( d )
+    visit( doc )
+    return ordered
+
+
+# the stamp of the last solve, the one not saved yet else the one in the file
+def getStamp( doc ):
+    if doc.Name in pendingStamps:
+        return pendingStamps[ doc.Name ]
+    model = doc.getObject('Model')
+    if model and hasattr(model,'SolveStamp'):
+        return model.SolveStamp
+    return None
+
+
+# the stamp is kept in memory, it's only written in the Model when the
+# document is saved so that solving doesn't change the document
+def setStamp( doc, stamp ):
+    pendingStamps[ doc.Name ] = stamp
+
+
+# writes the stamp of the last solve in the Model, without touching it
+def persistStamp( doc ):
+    stamp = pendingStamps.pop( doc.Name, None )
+    model = doc.getObject('Model')
+    if stamp is None or not model or model.TypeId != 'App::Part':
+        return
+    if not hasattr(model,'SolveStamp'):
+        model.addProperty( 'App::PropertyString', 'SolveStamp', 'Assembly' )
+        model.setEditorMode( 'SolveStamp', 1 )
+    if model.SolveStamp != stamp:
+        model.SolveStamp = stamp
+        model.purgeTouched()
+
+
+# updates the documents nested in doc, starting with the leaves. A document is
+# skipped if its file and those of its linked documents didn't change since it
+# was last solved. Returns the names of the documents that were updated
+def updateNested( doc=None ):
+    if doc is None:
+        doc = App.ActiveDocument
+    if not doc:
+        return []
+    # docName -> stamp of the documents already processed
+    stamps = {}
+    updated = []
+    for subDoc in documentsBottomUp( doc ):
+        linkedDocs = linkedDocuments( subDoc )
+        upstream = ';'.join( [ d.Name+':'+str(stamps.get(d.Name)) for d in linkedDocs ] )
+        modified = observer is not None and observer.isModified( subDoc )
+        # the top document is always updated, as asked by the user
+        hasTouched = subDoc == doc or len( [ o for o in subDoc.Objects if isTouched(o) ] ) > 0
+        # not changed since a solve in this session
+        session = solveStamps.get( subDoc.Name )
+        if session and observer is not None and session[0] == observer.revision(subDoc) \
+                and session[1] == upstream and not hasTouched:
+            stamps[ subDoc.Name ] = session[2]
+            continue
+        content = contentHash( subDoc )
+        if modified or content is None:
+            # the saved file isn't what is in memory
+            content = 'unsaved:'+subDoc.Name+':'+str( observer.revision(subDoc) if observer else 0 )
+        stamp = hashlib.sha1( (content+'|'+upstream).encode('utf-8') ).hexdigest()
+        # not changed since the last solve, saved in the file
+        if stamp == getStamp( subDoc ) and not hasTouched:
+            stamps[ subDoc.Name ] = stamp
+            continue
+        # the objects using a linked document that has just been updated
+        graph = getGraph( subDoc )
+        for linkedDoc in linkedDocs:
+            if linkedDoc.Name in updated:
+                graph.dirty.update( graph.docUsers.get( linkedDoc.Name, () ) )
+        if subDoc.getObject('Model'):
+            updateAssembly( subDoc, graph )
+        elif hasTouched:
+            Profiler.recompute( subDoc )
+        setStamp( subDoc, stamp )
+        stamps[ subDoc.Name ] = stamp
+        if observer is not None:
+            solveStamps[ subDoc.Name ] = ( observer.revision(subDoc), upstream, stamp )
+        updated.append( subDoc.Name )
+    skipped = len(stamps) - len(updated)
+    if skipped:
+        FCC.PrintMessage( str(skipped)+' unchanged document(s) skipped\n' )
+    return updated
@@ -9,9 +9,13 @@ import math, re, os
 from PySide import QtGui, QtCore
 import FreeCADGui as Gui
 import FreeCAD as App
+from FreeCAD import Console as FCC
 import Part
 
 import libAsm4 as Asm4
+import solverEngine
+import nativeSolver
+import recomputeProfiler as Profiler
 
 
 
@@ -36,13 +40,62 @@ class updateAssembly:
     +-----------------------------------------------+
     """
     def Activated(self):
-        # find every Part in the document ...
-        for obj in App.ActiveDocument.Objects:
-            # ... and update it
-            if obj.TypeId == 'App::Part':
-                obj.recompute('True')
-        #App.ActiveDocument.recompute()
+        # update the nested sub-assemblies first, and in each document
+        # recompute only the modified objects and those depending on them
+        with Profiler.section('updateAssembly'):
+            solverEngine.updateNested( App.ActiveDocument )
+
+
+
+"""
+    +-----------------------------------------------+
+    |  switch links between the ExpressionEngine    |
+    |           and the native solver               |
+    +-----------------------------------------------+
+"""
+class convertSolverMode:
+
+    def __init__(self, native):
+        self.native = native
+        if native:
+            self.menutext = "Use native solver"
+            self.tooltip  = "Evaluate the attachments of the selected links (or of the whole Model)\n"+ \
+                            "directly, without the ExpressionEngine"
+        else:
+            self.menutext = "Use ExpressionEngine solver"
+            self.tooltip  = "Restore the Placement expressions of the selected links (or of the whole Model)"
+
+    def GetResources(self):
+        return {"MenuText": self.menutext,
+                "ToolTip": self.tooltip,
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_Solver.svg')
+                }
+
+    def IsActive(self):
+        if Asm4.checkModel():
+            return(True)
+        return(False)
+
+    def Activated(self):
+        doc = App.ActiveDocument
+        # the selected objects, or all the attached objects of the document
+        objs = Gui.Selection.getSelection()
+        if not objs:
+            objs = [ o for o in doc.Objects if hasattr(o,'AssemblyType') and o.AssemblyType=='Asm4EE' ]
+        converted = 0
+        for obj in objs:
+            if self.native:
+                if nativeSolver.convertToNative(obj):
+                    converted += 1
+            else:
+                if nativeSolver.convertToExpression(obj):
+                    converted += 1
+        FCC.PrintMessage( str(converted)+' object(s) converted\n' )
+        solverEngine.updateAssembly( doc, full=True )
+
 
 
 # add the command to the workbench
 Gui.addCommand( 'Asm4_updateAssembly', updateAssembly() )
+Gui.addCommand( 'Asm4_nativeSolver',     convertSolverMode(True)  )
+Gui.addCommand( 'Asm4_expressionSolver', convertSolverMode(False) )
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# visibilityEngine.py
+#
+# shows and hides many objects in one batch:
+#
+#   import visibilityEngine
+#   datums = visibilityEngine.datumsIn( App.ActiveDocument.Model )
+#   visibilityEngine.setVisibility( datums, True )
+#
+# the objects to change are all collected first, those already in the asked
+# state are left alone, and the others are changed in one pass during which
+# neither the main window nor the 3D view are redrawn
+#
+# the visibility of all the objects in a container can be saved as a named
+# snapshot in the Model, and restored in one batch:
+#
+#   visibilityEngine.captureSnapshot( model, 'placement work' )
+#   visibilityEngine.restoreSnapshot( model, 'placement work' )
+
+
+
+import hashlib
+
+import FreeCADGui as Gui
+import FreeCAD as App
+
+import libAsm4 as Asm4
+
+
+
+"""
+    +-----------------------------------------------+
+    |        no repaint during a batch of changes   |
+    +-----------------------------------------------+
+"""
+# the main window isn't repainted by Qt, and the 3D view doesn't render
+# its Coin scene graph at each change: its render manager redraws by itself
+# when a node changes, which setUpdatesEnabled doesn't stop
+class SuspendedRedraw():
+
+    def __enter__( self ):
+        self.mainWindow = Gui.getMainWindow()
+        self.wasEnabled = self.mainWindow.updatesEnabled()
+        self.mainWindow.setUpdatesEnabled( False )
+        self.renderManager = renderManager()
+        if self.renderManager:
+            self.wasAutoRedraw = self.renderManager.isAutoRedraw()
+            self.renderManager.setAutoRedraw( False )
+        return self
+
+    def __exit__( self, excType, excValue, traceback ):
+        if self.renderManager:
+            self.renderManager.setAutoRedraw( self.wasAutoRedraw )
+        self.mainWindow.setUpdatesEnabled( self.wasEnabled )
+        if Gui.ActiveDocument and hasattr(Gui.ActiveDocument.ActiveView,'redraw'):
+            Gui.ActiveDocument.ActiveView.redraw()
+        return False
+
+
+# the SoRenderManager of the active 3D view, None if there is none
+def renderManager():
+    try:
+        return Gui.ActiveDocument.ActiveView.getViewer().getSoRenderManager()
+    except Exception:
+        return None
+
+
+
+"""
+    +-----------------------------------------------+
+    |       collect the objects, then change them   |
+    +-----------------------------------------------+
+"""
+# the datums in container and in all its children, a part linked
+# several times is only walked into once
+def datumsIn( container ):
+    datums = []
+    for ( path, obj, placement ) in Asm4.walkAssembly( container, unique=True ):
+        if obj.TypeId in Asm4.datumTypes:
+            datums.append( obj )
+    return datums
+
+
+# the objects whose visibility isn't the one asked for
+def toChange( objects, show ):
+    changes = []
+    for obj in objects:
+        if obj.ViewObject is not None and obj.ViewObject.Visibility != show:
+            changes.append( obj )
+    return changes
+
+
+# shows or hides all the objects in one batch, returns the number changed
+def setVisibility( objects, show ):
+    return setVisibilities( [ ( obj, show ) for obj in objects ] )
+
+
+# applies the ( obj, show ) pairs in one batch, returns the number changed
+def setVisibilities( states ):
+    shown  = toChange( [ obj for ( obj, show ) in states if show ],     True )
+    hidden = toChange( [ obj for ( obj, show ) in states if not show ], False )
+    if shown or hidden:
+        with SuspendedRedraw():
+            # ViewObject.show() and hide() are much faster than obj.Visibility
+            for obj in shown:
+                obj.ViewObject.show()
+            for obj in hidden:
+                obj.ViewObject.hide()
+    return len(shown) + len(hidden)
+
+
+
+"""
+    +-----------------------------------------------+
+    |         snapshots of the visibility           |
+    +-----------------------------------------------+
+"""
+# the property of the Model holding the snapshots of its document:
+#   'snapshot.<name>' -> '<doc>#<container> <order id> <bits>'
+#   'order.<id>'      -> the keys 'doc#obj' of the objects, one per line
+# the objects are sorted by key, so the order doesn't depend on the tree, and
+# the snapshots of the same objects share it. The bits are one per object,
+# 1 if it's visible, packed 8 per byte and written in hexadecimal
+snapshotProperty = 'VisibilitySnapshots'
+
+# the snapshot taken by Show LCS, if enabled with the boolean parameter
+# AutoSnapshot in Preferences/Mod/Assembly4. It's dropped once restored
+autoSnapshot = 'Before Show LCS'
+
+
+def autoSnapshotEnabled():
+    return App.ParamGet('User parameter:BaseApp/Preferences/Mod/Assembly4').GetBool('AutoSnapshot', False)
+
+
+def isVisible( obj ):
+    if obj.ViewObject is not None:
+        return obj.ViewObject.Visibility
+    return obj.Visibility
+
+
+# the objects in container and in all its children, sorted by key
+def snapshotObjects( container ):
+    objects = { container.Document.Name+'#'+container.Name: container }
+    for ( path, obj, placement ) in Asm4.walkAssembly( container, unique=True ):
+        objects[ obj.Document.Name+'#'+obj.Name ] = obj
+    return sorted( objects.items() )
+
+
+def encodeBits( states ):
+    data = bytearray( (len(states)+7) // 8 )
+    for i, state in enumerate( states ):
+        if state:
+            data[i>>3] |= 1 << (i&7)
+    return data.hex()
+
+
+def decodeBits( text, count ):
+    data = bytes.fromhex( text )
+    return [ bool( (data[i>>3] >> (i&7)) & 1 ) for i in range(count) ]
+
+
+def getSnapshots( model ):
+    if hasattr(model,snapshotProperty):
+        return dict( getattr(model,snapshotProperty) )
+    return {}
+
+
+# stores the snapshots in the Model, the orders no snapshot uses are dropped
+def setSnapshots( model, snapshots ):
+    used = set( value.split(' ')[1] for name, value in snapshots.items() if name.startswith('snapshot.') )
+    for name in list( snapshots ):
+        if name.startswith('order.') and name[6:] not in used:
+            del snapshots[name]
+    if not hasattr(model,snapshotProperty):
+        model.addProperty( 'App::PropertyMap', snapshotProperty, 'Assembly' )
+        model.setEditorMode( snapshotProperty, 2 )
+    setattr( model, snapshotProperty, snapshots )
+    model.purgeTouched()
+
+
+# the names of the snapshots of the document of model
+def snapshotNames( model ):
+    return sorted( name[9:] for name in getSnapshots( model ) if name.startswith('snapshot.') )
+
+
+# the 'doc#container' a snapshot was taken of
+def snapshotContainer( model, name ):
+    value = getSnapshots( model ).get( 'snapshot.'+name )
+    if value:
+        return value.split(' ')[0]
+    return None
+
+
+# saves the visibility of all the objects in container, the Model by default,
+# or only of the given objects of container
+def captureSnapshot( model, name, container=None, objects=None ):
+    if container is None:
+        container = model
+    if objects is None:
+        objects = snapshotObjects( container )
+    else:
+        objects = sorted( { obj.Document.Name+'#'+obj.Name: obj for obj in objects }.items() )
+    keys = '\n'.join( key for ( key, obj ) in objects )
+    orderId = hashlib.sha1( keys.encode('utf-8') ).hexdigest()[:12]
+    bits = encodeBits( [ isVisible(obj) for ( key, obj ) in objects ] )
+    snapshots = getSnapshots( model )
+    snapshots[ 'order.'+orderId ] = keys
+    snapshots[ 'snapshot.'+name ] = container.Document.Name+'#'+container.Name+' '+orderId+' '+bits
+    setSnapshots( model, snapshots )
+    return len( objects )
+
+
+# sets the visibility of the objects of a snapshot in one batch, the objects
+# deleted since, or in documents that aren't open, are skipped
+# returns the number of objects changed, None if there is no such snapshot
+def restoreSnapshot( model, name ):
+    snapshots = getSnapshots( model )
+    value = snapshots.get( 'snapshot.'+name )
+    if not value:
+        return None
+    ( container, orderId, bits ) = value.split(' ')
+    keys = snapshots.get( 'order.'+orderId, '' ).split('\n')
+    docs = App.listDocuments()
+    states = []
+    for key, visible in zip( keys, decodeBits( bits, len(keys) ) ):
+        ( docName, separator, objName ) = key.partition('#')
+        doc = docs.get( docName )
+        obj = doc.getObject( objName ) if doc else None
+        if obj is not None:
+            states.append( ( obj, visible ) )
+    if name == autoSnapshot:
+        deleteSnapshot( model, name )
+    return setVisibilities( states )
+
+
+def deleteSnapshot( model, name ):
+    snapshots = getSnapshots( model )
+    if snapshots.pop( 'snapshot.'+name, None ):
+        setSnapshots( model, snapshots )
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# visibilitySnapshotsCmd.py
+#
+# saves the visibility of the objects of the assembly as named snapshots,
+# and restores them in one batch
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import visibilityEngine
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class visibilitySnapshotsCmd():
+    def __init__(self):
+        super(visibilitySnapshotsCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Visibility Snapshots",
+                "ToolTip": "Save the visibility of all the objects of the assembly, or of the selected part,\n"+ \
+                           "and restore it later in one go",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_showLCS.svg')
+                }
+
+    def IsActive(self):
+        if Asm4.checkModel():
+            return True
+        return False
+
+    def Activated(self):
+        Gui.Control.showDialog( visibilitySnapshotsUI() )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class visibilitySnapshotsUI():
+
+    def __init__(self):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Asm4_showLCS.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Visibility Snapshots')
+        self.model = Asm4.checkModel()
+        # the selected part or sub-assembly, else the whole Model
+        self.container = self.model
+        link = Asm4.getSelectedLink()
+        if link:
+            self.container = link.LinkedObject
+        elif Asm4.getSelectedContainer():
+            self.container = Asm4.getSelectedContainer()
+        self.drawUI()
+        self.fillSnapshots()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Close)
+
+    def reject(self):
+        self.finish()
+
+
+    def fillSnapshots(self):
+        self.names = visibilityEngine.snapshotNames( self.model )
+        self.snapshotList.clear()
+        for name in self.names:
+            container = visibilityEngine.snapshotContainer( self.model, name )
+            self.snapshotList.addItem( name+'   ('+container+')' )
+
+
+    def selectedName(self):
+        row = self.snapshotList.currentRow()
+        if 0 <= row < len(self.names):
+            return self.names[row]
+        return None
+
+
+    def onCapture(self):
+        name = self.nameEntry.text().strip()
+        if not name:
+            Asm4.warningBox('Please enter a name for the snapshot')
+            return
+        if name in self.names and not Asm4.confirmBox('Replace the snapshot "'+name+'"?'):
+            return
+        count = visibilityEngine.captureSnapshot( self.model, name, self.container )
+        FCC.PrintMessage('Visibility of '+str(count)+' objects saved in "'+name+'"\n')
+        self.fillSnapshots()
+
+
+    def onRestore(self, item=None):
+        name = self.selectedName()
+        if name:
+            count = visibilityEngine.restoreSnapshot( self.model, name )
+            FCC.PrintMessage('Snapshot "'+name+'" restored, '+str(count)+' objects changed\n')
+            # the snapshot of Show LCS is dropped once restored
+            self.fillSnapshots()
+
+
+    def onDelete(self):
+        name = self.selectedName()
+        if name:
+            visibilityEngine.deleteSnapshot( self.model, name )
+            self.fillSnapshots()
+
+
+    def onItemClicked( self, item ):
+        name = self.selectedName()
+        if name:
+            self.nameEntry.setText( name )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        self.formLayout = QtGui.QFormLayout()
+        self.formLayout.addRow(QtGui.QLabel('Objects in :'),QtGui.QLabel(Asm4.nameLabel(self.container)))
+        self.nameEntry = QtGui.QLineEdit()
+        self.formLayout.addRow(QtGui.QLabel('Snapshot :'),self.nameEntry)
+        self.mainLayout.addLayout(self.formLayout)
+
+        self.snapshotList = QtGui.QListWidget()
+        self.snapshotList.setMinimumHeight(200)
+        self.mainLayout.addWidget(self.snapshotList)
+
+        self.buttonsLayout = QtGui.QHBoxLayout()
+        self.CaptureButton = QtGui.QPushButton('Capture')
+        self.RestoreButton = QtGui.QPushButton('Restore')
+        self.DeleteButton  = QtGui.QPushButton('Delete')
+        self.buttonsLayout.addWidget(self.CaptureButton)
+        self.buttonsLayout.addWidget(self.RestoreButton)
+        self.buttonsLayout.addStretch()
+        self.buttonsLayout.addWidget(self.DeleteButton)
+        self.mainLayout.addLayout(self.buttonsLayout)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.snapshotList.itemClicked.connect( self.onItemClicked )
+        self.snapshotList.itemDoubleClicked.connect( self.onRestore )
+        self.CaptureButton.clicked.connect( self.onCapture )
+        self.RestoreButton.clicked.connect( self.onRestore )
+        self.DeleteButton.clicked.connect( self.onDelete )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_visibilitySnapshots', visibilitySnapshotsCmd() )
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# coding: utf-8
+#
+# LGPL
+# Copyright HUBERT Zoltán
+#
+# whereAttachedCmd.py
+#
+# lists the links, fasteners and datums attached to the selected LCS
+
+
+
+import os
+
+from PySide import QtGui, QtCore
+import FreeCADGui as Gui
+import FreeCAD as App
+from FreeCAD import Console as FCC
+
+import libAsm4 as Asm4
+import modelIndex
+import selectionCache
+
+
+
+"""
+    +-----------------------------------------------+
+    |                  The command                  |
+    +-----------------------------------------------+
+"""
+class whereAttachedCmd():
+    def __init__(self):
+        super(whereAttachedCmd,self).__init__()
+
+    def GetResources(self):
+        return {"MenuText": "Where Attached",
+                "ToolTip": "Show the objects attached to the selected LCS, datum or link",
+                "Pixmap" : os.path.join( Asm4.iconPath , 'Asm4_CoordinateSystem.svg')
+                }
+
+    def IsActive(self):
+        if App.ActiveDocument and selectionCache.snapshot().single:
+            return True
+        return False
+
+    def Activated(self):
+        selectedObj = Gui.Selection.getSelection()[0]
+        Gui.Control.showDialog( whereAttachedUI(selectedObj) )
+
+
+
+"""
+    +-----------------------------------------------+
+    |    The UI and functions in the Task panel     |
+    +-----------------------------------------------+
+"""
+class whereAttachedUI():
+
+    def __init__(self, selectedObj):
+        self.base = QtGui.QWidget()
+        self.form = self.base
+        iconFile = os.path.join( Asm4.iconPath , 'Asm4_CoordinateSystem.svg')
+        self.form.setWindowIcon(QtGui.QIcon( iconFile ))
+        self.form.setWindowTitle('Where Attached')
+        self.selectedObj = selectedObj
+        self.drawUI()
+        self.fillList()
+
+
+    def finish(self):
+        Gui.Control.closeDialog()
+
+    def getStandardButtons(self):
+        return int(QtGui.QDialogButtonBox.Close)
+
+    def reject(self):
+        self.finish()
+
+
+    # the objects attached to the selected one
+    def fillList(self):
+        self.dependentsList.clear()
+        self.dependents = []
+        for docName, objName in modelIndex.whereAttached( self.selectedObj ):
+            doc = App.listDocuments().get( docName )
+            obj = doc.getObject( objName ) if doc else None
+            if obj:
+                self.dependents.append( obj )
+                text = Asm4.nameLabel(obj)
+                if doc != self.selectedObj.Document:
+                    text = docName+'#'+text
+                if hasattr(obj,'ViewObject') and obj.ViewObject:
+                    self.dependentsList.addItem( QtGui.QListWidgetItem( obj.ViewObject.Icon, text ) )
+                else:
+                    self.dependentsList.addItem( text )
+        if not self.dependents:
+            self.dependentsList.addItem( 'Nothing is attached to this object' )
+
+
+    # highlight the object clicked in the list
+    def onItemClicked( self, item ):
+        row = self.dependentsList.currentRow()
+        if row < len(self.dependents):
+            obj = self.dependents[row]
+            Gui.Selection.clearSelection()
+            parent = obj.getParentGeoFeatureGroup()
+            if parent:
+                Gui.Selection.addSelection( obj.Document.Name, parent.Name, obj.Name+'.' )
+            else:
+                Gui.Selection.addSelection( obj.Document.Name, obj.Name )
+
+
+    # defines the UI, only static elements
+    def drawUI(self):
+        self.mainLayout = QtGui.QVBoxLayout(self.form)
+
+        self.formLayout = QtGui.QFormLayout()
+        self.objName = QtGui.QLineEdit()
+        self.objName.setReadOnly(True)
+        self.objName.setText( self.selectedObj.Document.Name+'#'+Asm4.nameLabel(self.selectedObj) )
+        self.formLayout.addRow(QtGui.QLabel('Selected :'),self.objName)
+        self.mainLayout.addLayout(self.formLayout)
+
+        self.mainLayout.addWidget(QtGui.QLabel("Attached to it :"))
+        self.dependentsList = QtGui.QListWidget()
+        self.dependentsList.setMinimumHeight(200)
+        self.mainLayout.addWidget(self.dependentsList)
+
+        self.form.setLayout(self.mainLayout)
+
+        # Actions
+        self.dependentsList.itemClicked.connect( self.onItemClicked )
+
+
+
+"""
+    +-----------------------------------------------+
+    |       add the command to the workbench        |
+    +-----------------------------------------------+
+"""
+Gui.addCommand( 'Asm4_whereAttached', whereAttachedCmd() )